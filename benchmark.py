@@ -0,0 +1,625 @@
+#!/usr/bin/env python
+# 交互式反馈性能基准脚本
+# 在无界面(offscreen)模式下让反馈窗口显示后立即自动提交，测量各种启动方式和完整往返的耗时
+
+import os
+import sys
+import json
+import math
+import time
+import asyncio
+import argparse
+import statistics
+import subprocess
+import tempfile
+
+def _summarize(samples: list[float]) -> dict:
+    return {
+        "runs": len(samples),
+        "mean_ms": round(statistics.mean(samples) * 1000, 1),
+        "min_ms": round(min(samples) * 1000, 1),
+        "max_ms": round(max(samples) * 1000, 1),
+    }
+
+def _measure_launches(runs: int) -> dict:
+    """多次调用launch_feedback_ui，记录到窗口显示的时间和完整往返时间"""
+    from server import launch_feedback_ui
+
+    time_to_window = []
+    round_trip = []
+    phases = {}
+    for _ in range(runs):
+        start = time.time()
+        result = asyncio.run(launch_feedback_ui("基准测试提示", ["选项A", "选项B", "选项C"]))
+        end = time.time()
+        if result.get("shown_at"):
+            time_to_window.append(result["shown_at"] - start)
+        round_trip.append(end - start)
+        # UI进程记录的各启动阶段，script_start换算为从发起请求到脚本开始执行的耗时（进程创建和解释器启动）
+        trace = dict(result.get("startup_trace") or {})
+        if "script_start" in trace:
+            phases.setdefault("interpreter", []).append(trace.pop("script_start") - start)
+        for name, offset_ms in trace.items():
+            phases.setdefault(name, []).append(offset_ms / 1000)
+    results = {
+        "time_to_window": _summarize(time_to_window) if time_to_window else None,
+        "round_trip": _summarize(round_trip),
+    }
+    for name, samples in phases.items():
+        results[f"trace/{name}"] = _summarize(samples)
+    return results
+
+def _start_daemon(timeout: float = 30.0) -> subprocess.Popen:
+    from feedback_protocol import read_daemon_state
+
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    proc = subprocess.Popen(
+        [sys.executable, "-u", os.path.join(script_dir, "feedback_daemon.py")],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        state = read_daemon_state()
+        if state and state.get("pid") == proc.pid:
+            return proc
+        if proc.poll() is not None:
+            break
+        time.sleep(0.05)
+    proc.kill()
+    raise RuntimeError("反馈UI守护进程启动失败（可能已有其他守护进程在运行）")
+
+def bench_startup(runs: int) -> dict:
+    """比较每次启动新进程与常驻UI进程两种方式的窗口显示耗时"""
+    results = {}
+
+    os.environ["INTERACTIVE_FEEDBACK_DAEMON"] = "0"
+    os.environ["INTERACTIVE_FEEDBACK_STARTUP_TRACE"] = "1"
+    results["spawn"] = _measure_launches(runs)
+    os.environ.pop("INTERACTIVE_FEEDBACK_STARTUP_TRACE")
+
+    os.environ["INTERACTIVE_FEEDBACK_DAEMON"] = "1"
+    daemon = _start_daemon()
+    try:
+        # 第一次请求会使用预先创建好的窗口，之后的请求复用同一个窗口
+        results["daemon"] = _measure_launches(runs)
+    finally:
+        daemon.terminate()
+        daemon.wait(timeout=10)
+    return results
+
+# 常见截图分辨率
+SCREENSHOT_SIZES = [(1280, 720), (1920, 1080), (2560, 1440), (3840, 2160)]
+
+def _synthetic_screenshot(width: int, height: int) -> bytes:
+    """生成类似IDE截图的PNG（色块、文字行），比随机噪声更接近真实截图的压缩特性"""
+    from PySide6.QtCore import QRect, QBuffer, QIODevice
+    from PySide6.QtGui import QGuiApplication, QImage, QPainter, QColor, QFont
+
+    QGuiApplication.instance() or QGuiApplication([])
+    image = QImage(width, height, QImage.Format_RGB32)
+    image.fill(QColor(30, 30, 30))
+    painter = QPainter(image)
+    painter.fillRect(QRect(0, 0, width // 6, height), QColor(45, 45, 48))
+    painter.fillRect(QRect(0, 0, width, 32), QColor(60, 60, 60))
+    painter.setFont(QFont("monospace", 11))
+    colors = [QColor(220, 220, 170), QColor(86, 156, 214), QColor(206, 145, 120), QColor(106, 153, 85)]
+    for row, y in enumerate(range(50, height, 20)):
+        painter.setPen(colors[row % len(colors)])
+        painter.drawText(width // 6 + 20, y, f"{row:4d}  def function_{row}(argument, value={row * 7}):  # 注释 {row}")
+    painter.end()
+
+    buffer = QBuffer()
+    buffer.open(QIODevice.WriteOnly)
+    image.save(buffer, "PNG")
+    return bytes(buffer.data())
+
+def bench_images(runs: int) -> dict:
+    """测量不同分辨率截图在各输出格式下的处理耗时和编码后大小"""
+    from image_pipeline import ImagePipelineConfig, process_image
+
+    results = {}
+    for width, height in SCREENSHOT_SIZES:
+        original = _synthetic_screenshot(width, height)
+        for image_format in ("png", "jpeg", "webp"):
+            config = ImagePipelineConfig(format=image_format)
+            durations = []
+            for _ in range(runs):
+                start = time.perf_counter()
+                encoded = process_image(original, config)
+                durations.append(time.perf_counter() - start)
+            results[f"{width}x{height}/{image_format}"] = {
+                "duration": _summarize(durations),
+                "original_bytes": len(original),
+                "encoded_bytes": encoded.encoded_size if encoded else None,
+                "encoded_dimensions": f"{encoded.width}x{encoded.height}" if encoded else None,
+            }
+    return results
+
+def _percentiles(samples: list[float]) -> dict:
+    """按最近秩法计算p50/p95/p99（毫秒），样本较少时p95/p99即为最大值"""
+    ordered = sorted(samples)
+
+    def rank(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))] * 1000, 1)
+
+    return {"runs": len(ordered), "p50_ms": rank(0.50), "p95_ms": rank(0.95), "p99_ms": rank(0.99)}
+
+# 往返场景：在基准场景上每次只改变一个维度
+ROUNDTRIP_BASE = {"prompt_chars": 200, "options": 3, "images": 0}
+ROUNDTRIP_SCENARIOS = {
+    "baseline": {},
+    "long_prompt": {"prompt_chars": 20000},
+    "huge_prompt": {"prompt_chars": 500000},
+    "no_options": {"options": 0},
+    "many_options": {"options": 30},
+    "one_image": {"images": 1},
+    "four_images": {"images": 4},
+}
+
+def _roundtrip_images(count: int) -> list[str]:
+    """在临时图片存储中准备count张不同的1080p截图"""
+    from image_store import ImageStore
+
+    store = ImageStore.from_env()
+    paths = []
+    for index in range(count):
+        # 不同的尺寸让每张截图的内容哈希不同
+        paths.append(store.put(_synthetic_screenshot(1920 - index * 16, 1080), "png"))
+    return paths
+
+async def _roundtrip_once(request: dict) -> dict:
+    """通过UI子进程完成一次请求，拆分各阶段耗时"""
+    import server
+
+    start = time.time()
+    result_data = await server._launch_subprocess(request)
+    received = time.time()
+    trace = result_data.get("startup_trace") or {}
+    script_start = trace.get("script_start", start)
+
+    encode_start = time.perf_counter()
+    result = await asyncio.to_thread(server._attach_images, result_data)
+    encode_duration = time.perf_counter() - encode_start
+
+    contents = server._build_tool_result(result)
+    response_bytes = sum(len(content.text if content.type == "text" else content.data) for content in contents)
+    return {
+        "spawn": script_start - start,
+        "window_construction": (trace.get("window_shown", 0) - trace.get("create_ui_start", 0)) / 1000,
+        "result_handoff": received - (script_start + trace.get("submitted", 0) / 1000),
+        "image_encoding": encode_duration,
+        "response_bytes": response_bytes,
+    }
+
+async def _tool_call_once(arguments: dict) -> float:
+    """通过FastMCP客户端（进程内传输）调用interactive_feedback工具，返回总耗时"""
+    from fastmcp import Client
+    from server import mcp
+
+    async with Client(mcp) as client:
+        start = time.perf_counter()
+        await client.call_tool("interactive_feedback", arguments)
+        return time.perf_counter() - start
+
+def bench_roundtrip(runs: int) -> dict:
+    """端到端测量一次interactive_feedback调用：进程启动、窗口创建、结果回传、图片编码和响应大小"""
+    import tempfile
+    from feedback_protocol import make_message
+
+    os.environ["INTERACTIVE_FEEDBACK_DAEMON"] = "0"
+    results = {}
+    with tempfile.TemporaryDirectory() as image_dir:
+        os.environ["INTERACTIVE_FEEDBACK_IMAGE_DIR"] = image_dir
+        for name, overrides in ROUNDTRIP_SCENARIOS.items():
+            scenario = {**ROUNDTRIP_BASE, **overrides}
+            prompt = ("请检查以下修改并给出反馈。" * (scenario["prompt_chars"] // 12 + 1))[:scenario["prompt_chars"]]
+            options = [f"选项{index}" for index in range(scenario["options"])]
+            image_paths = _roundtrip_images(scenario["images"])
+            os.environ["INTERACTIVE_FEEDBACK_AUTO_SUBMIT_IMAGES"] = os.pathsep.join(image_paths)
+
+            request = make_message("request", prompt=prompt, predefined_options=options, pending=0, startup_trace=True)
+            phases = [asyncio.run(_roundtrip_once(request)) for _ in range(runs)]
+            totals = [
+                asyncio.run(_tool_call_once({"message": prompt, **({"predefined_options": options} if options else {})}))
+                for _ in range(runs)
+            ]
+            response_sizes = sorted(phase["response_bytes"] for phase in phases)
+            results[name] = {
+                "scenario": scenario,
+                **{
+                    metric: _percentiles([phase[metric] for phase in phases])
+                    for metric in ("spawn", "window_construction", "result_handoff", "image_encoding")
+                },
+                "tool_call_total": _percentiles(totals),
+                "response_bytes": {"min": response_sizes[0], "max": response_sizes[-1]},
+            }
+        os.environ.pop("INTERACTIVE_FEEDBACK_AUTO_SUBMIT_IMAGES")
+        os.environ.pop("INTERACTIVE_FEEDBACK_IMAGE_DIR")
+    return results
+
+def _print_roundtrip_table(results: dict):
+    metrics = ("spawn", "window_construction", "result_handoff", "image_encoding", "tool_call_total")
+    print(f"{'场景':<14}{'指标':<22}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}")
+    for name, item in results.items():
+        for metric in metrics:
+            summary = item[metric]
+            print(f"{name:<14}{metric:<22}{summary['p50_ms']:>10}{summary['p95_ms']:>10}{summary['p99_ms']:>10}")
+        print(f"{name:<14}{'response_bytes':<22}{item['response_bytes']['max']:>10}")
+
+# 图片交接测试的截图分辨率，8K截图的原始PNG有数MB
+HANDOFF_SIZES = [(1920, 1080), (3840, 2160), (7680, 4320)]
+
+def bench_handoff(runs: int) -> dict:
+    """比较服务端读取界面图片的方式(file/mmap/shm)：服务端处理结果中图片的延迟和Python堆的峰值内存。
+    图片限制放宽到原样透传，只比较读取和base64编码；shm另外记录界面写入共享内存段的耗时，它在界面的工作线程中完成"""
+    import tempfile
+    import tracemalloc
+    import server
+    from image_handoff import SharedImages, new_segment_prefix
+    from image_store import ImageStore
+
+    os.environ.update({
+        "INTERACTIVE_FEEDBACK_IMAGE_MAX_DIM": "8192",
+        "INTERACTIVE_FEEDBACK_IMAGE_MAX_BYTES": str(64 * 1024 * 1024),
+        "INTERACTIVE_FEEDBACK_RESPONSE_MAX_BYTES": str(64 * 1024 * 1024),
+    })
+    results = {}
+    with tempfile.TemporaryDirectory() as image_dir:
+        os.environ["INTERACTIVE_FEEDBACK_IMAGE_DIR"] = image_dir
+        for width, height in HANDOFF_SIZES:
+            data = _synthetic_screenshot(width, height)
+            path = ImageStore.from_env().put(data, "png")
+            for mode in ("file", "mmap", "shm"):
+                os.environ["INTERACTIVE_FEEDBACK_IMAGE_HANDOFF"] = mode
+                durations, publish, peaks = [], [], []
+                for _ in range(runs):
+                    result = {"interactive_feedback": "", "image_paths": [path]}
+                    if mode == "shm":
+                        start = time.perf_counter()
+                        shared = SharedImages(new_segment_prefix())
+                        shared.publish(path, data)
+                        result = shared.hand_off(result)
+                        publish.append(time.perf_counter() - start)
+                    tracemalloc.start()
+                    start = time.perf_counter()
+                    server._attach_images(result)
+                    durations.append(time.perf_counter() - start)
+                    peaks.append(tracemalloc.get_traced_memory()[1])
+                    tracemalloc.stop()
+                results[f"{width}x{height}/{mode}"] = {
+                    "image_bytes": len(data),
+                    "server": _percentiles(durations),
+                    "ui_publish": _percentiles(publish) if publish else None,
+                    "peak_python_bytes": max(peaks),
+                }
+        os.environ.pop("INTERACTIVE_FEEDBACK_IMAGE_DIR")
+        os.environ.pop("INTERACTIVE_FEEDBACK_IMAGE_HANDOFF")
+    return results
+
+def _print_handoff_table(results: dict):
+    print(f"{'场景':<20}{'图片(KB)':>10}{'p50(ms)':>10}{'p95(ms)':>10}{'峰值内存(KB)':>14}{'界面写入p50(ms)':>16}")
+    for name, item in results.items():
+        publish = item["ui_publish"]["p50_ms"] if item["ui_publish"] else "-"
+        print(f"{name:<20}{round(item['image_bytes'] / 1024, 1):>10}{item['server']['p50_ms']:>10}"
+              f"{item['server']['p95_ms']:>10}{round(item['peak_python_bytes'] / 1024, 1):>14}{publish:>16}")
+
+# 负载测试：同时连接的模拟客户端数，每个客户端依次调用runs次
+LOAD_CLIENT_COUNTS = [1, 8, 32, 64]
+# 负载测试服务端的窗口数和队列上限，客户端较多时队列会满，用于观察拒绝的比例
+LOAD_SERVER_ENV = {
+    "INTERACTIVE_FEEDBACK_MAX_WINDOWS": "4",
+    "INTERACTIVE_FEEDBACK_MAX_QUEUE": "32",
+    "INTERACTIVE_FEEDBACK_MAX_QUEUE_PER_CLIENT": "2",
+}
+
+def _free_port() -> int:
+    import socket
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def _start_http_server(port: int, timeout: float = 30.0) -> subprocess.Popen:
+    """以streamable-http传输启动server.py，等待端口可以连接"""
+    import socket
+
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    env = {
+        **os.environ,
+        # 默认使用终端界面的自动提交：不启动Qt，测量的是服务端和队列而不是窗口创建
+        "INTERACTIVE_FEEDBACK_BACKEND": os.environ.get("INTERACTIVE_FEEDBACK_BACKEND", "tui"),
+        "INTERACTIVE_FEEDBACK_DAEMON": "0",
+        "INTERACTIVE_FEEDBACK_CACHE_TTL": "0",
+        **LOAD_SERVER_ENV,
+    }
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(script_dir, "server.py"), "--transport", "streamable-http", "--port", str(port)],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("HTTP服务端启动超时")
+
+async def _load_client(url: str, client_index: int, calls: int, latencies: list, rejected: list):
+    """一个模拟客户端：建立自己的MCP会话，依次提出calls个不同的问题"""
+    from fastmcp import Client
+    from fastmcp.exceptions import ToolError
+
+    async with Client(url) as client:
+        for call_index in range(calls):
+            start = time.perf_counter()
+            try:
+                await client.call_tool("interactive_feedback", {"message": f"客户端{client_index}的第{call_index}个问题"})
+                latencies.append(time.perf_counter() - start)
+            except ToolError:
+                rejected.append(time.perf_counter() - start)
+
+async def _load_scenario(url: str, clients: int, calls: int) -> dict:
+    from fastmcp import Client
+
+    latencies, rejected = [], []
+    start = time.perf_counter()
+    await asyncio.gather(*(_load_client(url, index, calls, latencies, rejected) for index in range(clients)))
+    elapsed = time.perf_counter() - start
+    async with Client(url) as client:
+        scheduler = json.loads((await client.read_resource("feedback://scheduler"))[0].text)
+    return {
+        "clients": clients,
+        "calls": clients * calls,
+        "completed": len(latencies),
+        "rejected": len(rejected),
+        "throughput_per_s": round(len(latencies) / elapsed, 1),
+        "latency": _percentiles(latencies) if latencies else None,
+        "rejection_latency": _percentiles(rejected) if rejected else None,
+        "scheduler_wait_p95_s": scheduler["wait_seconds"]["p95"],
+    }
+
+def bench_load(runs: int) -> dict:
+    """一个streamable-http服务端同时服务多个模拟客户端：调用延迟、吞吐量和队列满时拒绝的请求数"""
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}/mcp/"
+    server_process = _start_http_server(port)
+    try:
+        return {
+            f"{clients}_clients": asyncio.run(_load_scenario(url, clients, runs))
+            for clients in LOAD_CLIENT_COUNTS
+        }
+    finally:
+        server_process.terminate()
+        server_process.wait()
+
+def _print_load_table(results: dict):
+    print(f"{'客户端':<8}{'调用':>6}{'完成':>6}{'拒绝':>6}{'吞吐(/s)':>10}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}")
+    for item in results.values():
+        latency = item["latency"] or {"p50_ms": "-", "p95_ms": "-", "p99_ms": "-"}
+        print(
+            f"{item['clients']:<8}{item['calls']:>6}{item['completed']:>6}{item['rejected']:>6}"
+            f"{item['throughput_per_s']:>10}{latency['p50_ms']:>10}{latency['p95_ms']:>10}{latency['p99_ms']:>10}"
+        )
+
+OPTION_COUNTS = [10, 100, 1000, 10000]
+# 逐字输入的筛选查询，模拟用户边输入边筛选
+OPTION_FILTER_QUERY = "test_ui"
+# 旧的每个选项一个复选框的网格布局超过此数量时太慢，不再测量
+LEGACY_GRID_MAX_OPTIONS = 1000
+
+# 历史记录场景：数据库中的记录数；每次写入是一次调用，其中四分之一是3个问题的批量提问
+HISTORY_RECORD_COUNTS = [1000, 10000, 30000]
+HISTORY_QUERIES = {
+    "rare": "#4242 登录",  # 只有个别记录匹配
+    "common_words": "button timeout",  # 大部分记录匹配
+    "short_term": "缓存",  # 少于3个字符，不能使用trigram索引
+    "empty": "",  # 最近的回答
+}
+_HISTORY_WORDS = ("按钮 颜色 蓝色 登录 页面 数据库 迁移 测试 失败 日志 性能 缓存 接口 超时 部署 重构 "
+                  "button color login database migration cache timeout deploy refactor test").split()
+
+def _history_item(rnd, index: int) -> dict:
+    return {
+        "prompt": f"{' '.join(rnd.choices(_HISTORY_WORDS, k=40))} #{index}",
+        "predefined_options": ["已解决当前问题", "进一步优化程序", "还有一些问题需要修复"],
+        "selected_options": ["进一步优化程序"],
+        "interactive_feedback": " ".join(rnd.choices(_HISTORY_WORDS, k=25)),
+        "image_paths": [],
+    }
+
+def bench_history(runs: int) -> dict:
+    """反馈历史的写入吞吐量，以及不同记录数下搜索和读取会话的延迟"""
+    import random
+    import tempfile
+    from feedback_history import FeedbackHistory
+
+    results = {}
+    for count in HISTORY_RECORD_COUNTS:
+        rnd = random.Random(count)
+        with tempfile.TemporaryDirectory() as directory:
+            history = FeedbackHistory(os.path.join(directory, "history.sqlite3"), max_records=0, max_age=0)
+            inserted, calls, session_ids = 0, 0, []
+            start = time.perf_counter()
+            while inserted < count:
+                items = [_history_item(rnd, inserted + i) for i in range(3 if calls % 4 == 3 else 1)]
+                session_ids.append(f"s{calls}")
+                inserted += history.record(session_ids[-1], "bench#1", "answered", items)
+                calls += 1
+            elapsed = time.perf_counter() - start
+
+            scenario = {
+                "insert": {
+                    "records": inserted,
+                    "calls": calls,
+                    "records_per_second": round(inserted / elapsed),
+                    "mean_call_ms": round(elapsed / calls * 1000, 3),
+                },
+                "database_bytes": history.stats()["database_bytes"],
+            }
+            for name, query in HISTORY_QUERIES.items():
+                durations, matches = [], 0
+                for _ in range(max(runs, 20)):
+                    start = time.perf_counter()
+                    matches = len(history.search(query, 10))
+                    durations.append(time.perf_counter() - start)
+                scenario[f"search/{name}"] = {**_percentiles(durations), "results": matches}
+            durations = []
+            for _ in range(max(runs, 20)):
+                session_id = rnd.choice(session_ids)
+                start = time.perf_counter()
+                history.session(session_id)
+                durations.append(time.perf_counter() - start)
+            scenario["get_session"] = _percentiles(durations)
+            history.close()
+        results[str(count)] = scenario
+    return results
+
+def _print_history_table(results: dict):
+    print(f"{'记录数':<10}{'写入(条/秒)':>14}{'每次写入(ms)':>14}{'数据库(MB)':>12}")
+    for count, scenario in results.items():
+        insert = scenario["insert"]
+        print(f"{count:<10}{insert['records_per_second']:>14}{insert['mean_call_ms']:>14}"
+              f"{round(scenario['database_bytes'] / 1024 / 1024, 1):>12}")
+    print()
+    print(f"{'记录数':<10}{'操作':<24}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}{'结果数':>8}")
+    for count, scenario in results.items():
+        for name, item in scenario.items():
+            if isinstance(item, dict) and "p50_ms" in item:
+                print(f"{count:<10}{name:<24}{item['p50_ms']:>10}{item['p95_ms']:>10}{item['p99_ms']:>10}"
+                      f"{item.get('results', '-'):>8}")
+
+def _legacy_checkbox_grid(options: list[str]) -> float:
+    """按旧实现为每个选项创建QCheckBox并放入3列网格，返回创建和布局的耗时，作为对比基准"""
+    from PySide6.QtWidgets import QApplication, QWidget, QGridLayout, QCheckBox, QScrollArea
+
+    start = time.perf_counter()
+    scroll_area = QScrollArea()
+    scroll_area.setWidgetResizable(True)
+    container = QWidget()
+    grid_layout = QGridLayout(container)
+    for i, option in enumerate(options):
+        grid_layout.addWidget(QCheckBox(option), i // 3, i % 3)
+    scroll_area.setWidget(container)
+    scroll_area.setMaximumHeight(200)
+    scroll_area.show()
+    QApplication.processEvents()
+    duration = time.perf_counter() - start
+    scroll_area.close()
+    scroll_area.deleteLater()
+    return duration
+
+def bench_options(runs: int) -> dict:
+    """测量不同选项数量下反馈窗口的创建耗时和增量筛选耗时"""
+    from PySide6.QtWidgets import QApplication
+    from feedback_ui import FeedbackUI
+
+    app = QApplication.instance() or QApplication([])
+    results = {}
+    for count in OPTION_COUNTS:
+        options = [f"tests/test_{['ui', 'server', 'store', 'pipeline'][i % 4]}_{i}.py::test_case_{i}" for i in range(count)]
+        construction = []
+        filtering = []
+        legacy = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            ui = FeedbackUI("基准测试提示", options)
+            ui.show()
+            app.processEvents()
+            construction.append(time.perf_counter() - start)
+
+            # 逐个字符输入查询，每次按键的筛选耗时
+            for length in range(1, len(OPTION_FILTER_QUERY) + 1):
+                start = time.perf_counter()
+                ui.option_list.filter_edit.setText(OPTION_FILTER_QUERY[:length])
+                app.processEvents()
+                filtering.append(time.perf_counter() - start)
+            matches = ui.option_list.model.rowCount()
+            ui.feedback_result = None
+            ui.close()
+            ui.deleteLater()
+            app.processEvents()
+
+            if count <= LEGACY_GRID_MAX_OPTIONS:
+                legacy.append(_legacy_checkbox_grid(options))
+        results[str(count)] = {
+            "construction": _summarize(construction),
+            "filter_keystroke": _summarize(filtering),
+            "filter_matches": matches,
+            "legacy_checkbox_grid": _summarize(legacy) if legacy else None,
+        }
+    return results
+
+def _print_options_table(results: dict):
+    print(f"{'选项数':<10}{'指标':<24}{'平均(ms)':>10}{'最小(ms)':>10}{'最大(ms)':>10}")
+    for count, item in results.items():
+        for name in ("construction", "filter_keystroke", "legacy_checkbox_grid"):
+            summary = item[name]
+            if summary:
+                print(f"{count:<10}{name:<24}{summary['mean_ms']:>10}{summary['min_ms']:>10}{summary['max_ms']:>10}")
+
+def _print_image_table(results: dict):
+    print(f"{'场景':<20}{'原始(KB)':>10}{'编码后(KB)':>12}{'尺寸':>12}{'平均(ms)':>10}")
+    for name, item in results.items():
+        encoded_kb = round(item["encoded_bytes"] / 1024, 1) if item["encoded_bytes"] else "-"
+        print(f"{name:<20}{round(item['original_bytes'] / 1024, 1):>10}{encoded_kb:>12}"
+              f"{item['encoded_dimensions'] or '-':>12}{item['duration']['mean_ms']:>10}")
+
+def _print_table(results: dict):
+    print(f"{'模式':<10}{'指标':<28}{'平均(ms)':>10}{'最小(ms)':>10}{'最大(ms)':>10}")
+    for mode, metrics in results.items():
+        for name, summary in metrics.items():
+            if summary:
+                print(f"{mode:<10}{name:<28}{summary['mean_ms']:>10}{summary['min_ms']:>10}{summary['max_ms']:>10}")
+
+SUITES = {
+    "startup": (bench_startup, _print_table),
+    "images": (bench_images, _print_image_table),
+    "roundtrip": (bench_roundtrip, _print_roundtrip_table),
+    "options": (bench_options, _print_options_table),
+    "load": (bench_load, _print_load_table),
+    "history": (bench_history, _print_history_table),
+    "handoff": (bench_handoff, _print_handoff_table),
+}
+
+def main():
+    parser = argparse.ArgumentParser(description="交互式反馈性能基准测试")
+    parser.add_argument("suite", choices=sorted(SUITES), help="要运行的基准测试")
+    parser.add_argument("--runs", type=int, default=5, help="每个场景的运行次数")
+    parser.add_argument("--show", action="store_true", help="在真实显示器上显示窗口（默认使用offscreen）")
+    parser.add_argument("--json", action="store_true", help="以JSON格式输出结果")
+    parser.add_argument("--output", help="把JSON结果（附带运行环境信息）写入文件，便于比较不同版本")
+    args = parser.parse_args()
+
+    if not args.show:
+        os.environ["QT_QPA_PLATFORM"] = "offscreen"
+    # 窗口显示后立即自动提交
+    os.environ["INTERACTIVE_FEEDBACK_AUTO_SUBMIT_MS"] = "0"
+
+    run_suite, print_table = SUITES[args.suite]
+    # 服务端（包括load启动的HTTP服务端）把回答写入临时的历史数据库，不写入用户的反馈历史
+    with tempfile.TemporaryDirectory() as history_dir:
+        os.environ["INTERACTIVE_FEEDBACK_HISTORY_DB"] = os.path.join(history_dir, "history.sqlite3")
+        results = run_suite(args.runs)
+
+    if args.output:
+        report = {
+            "suite": args.suite,
+            "runs": args.runs,
+            "python": sys.version.split()[0],
+            "platform": sys.platform,
+            "timestamp": time.time(),
+            "results": results,
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+    else:
+        print_table(results)
+
+if __name__ == "__main__":
+    main()
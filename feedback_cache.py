@@ -0,0 +1,110 @@
+# Interactive Feedback MCP 回答缓存
+# AI经常在几分钟内重复提出完全相同的问题（相同的提示和预定义选项），有时还来自并行的工具调用。
+# 相同的问题正在等待回答时，新的调用合并到同一个窗口并共享回答；
+# 回答之后在有效期内再次提问时，窗口中会提供“使用上次的回答”，也可以配置为直接返回上次的回答。
+import re
+import time
+import asyncio
+import hashlib
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+class _Flight:
+    """正在进行的请求，所有等待者都取消后才取消请求本身"""
+    __slots__ = ("task", "waiters", "owner")
+
+    def __init__(self, task: asyncio.Task, owner: Any = None):
+        self.task = task
+        self.waiters = 0
+        self.owner = owner  # 发起请求时传入的owner，决定其他调用能否加入
+
+class AnswerCache:
+    def __init__(self, ttl: float = 600.0, max_entries: int = 128):
+        self.ttl = ttl  # 回答的有效期（秒），0表示不缓存回答，但仍合并进行中的相同请求
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple[float, dict]]" = OrderedDict()
+        self._in_flight: dict[str, _Flight] = {}
+        self._hits = 0
+        self._misses = 0
+        self._coalesced = 0
+        self._evictions = 0
+
+    @staticmethod
+    def key(prompt: str, predefined_options: Optional[List[str]] = None) -> str:
+        """按规范化后的提示和选项计算缓存键：忽略首尾空白和连续空白的差异，选项顺序有意义"""
+        def normalize(text: str) -> str:
+            return re.sub(r"\s+", " ", text).strip()
+
+        digest = hashlib.sha256(normalize(prompt).encode("utf-8"))
+        for option in predefined_options or []:
+            digest.update(b"\0" + normalize(option).encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[dict]:
+        """返回有效期内的上次回答，附带answered_at时间戳；不存在或已过期时返回None"""
+        entry = self._entries.get(key)
+        if entry is not None and time.time() - entry[0] > self.ttl:
+            del self._entries[key]
+            self._evictions += 1
+            entry = None
+        if entry is None:
+            self._misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self._hits += 1
+        answered_at, answer = entry
+        return {**answer, "answered_at": answered_at}
+
+    def put(self, key: str, answer: dict):
+        """保存回答，超出条目上限时淘汰最久未使用的回答"""
+        if self.ttl <= 0:
+            return
+        self._entries[key] = (time.time(), answer)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._evictions += 1
+
+    def coalesce(self, key: str, job: Callable[[], Awaitable[T]], owner: Any = None,
+                 can_join: Optional[Callable[[Any], bool]] = None) -> Tuple[Awaitable[T], Any]:
+        """相同键的请求正在进行且can_join(它的owner)为真时等待它的结果，否则执行job；
+        返回(等待结果的awaitable, 所等待请求的owner)。加入和发起请求都在调用时完成，不需要等待awaitable开始执行"""
+        flight = self._in_flight.get(key)
+        if flight is not None and (can_join is None or can_join(flight.owner)):
+            self._coalesced += 1
+        else:
+            flight = _Flight(asyncio.ensure_future(job()), owner)
+            # 已有不能加入的相同请求时，新的请求单独进行，不供其他调用加入
+            if key not in self._in_flight:
+                self._in_flight[key] = flight
+                flight.task.add_done_callback(lambda _task: self._in_flight.pop(key, None))
+        flight.waiters += 1
+        return self._wait(flight), flight.owner
+
+    @staticmethod
+    async def _wait(flight: _Flight):
+        try:
+            # shield：一个调用被取消不影响其他仍在等待同一回答的调用
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if not flight.task.done() and flight.waiters == 1:
+                flight.task.cancel()
+            raise
+        finally:
+            flight.waiters -= 1
+
+    def stats(self) -> dict:
+        lookups = self._hits + self._misses
+        return {
+            "ttl_seconds": self.ttl,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": round(self._hits / lookups, 3) if lookups else None,
+            "coalesced": self._coalesced,
+            "in_flight": len(self._in_flight),
+            "evictions": self._evictions,
+        }
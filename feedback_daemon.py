@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+# Interactive Feedback MCP 常驻UI进程
+# 保持QApplication常驻并预先创建好反馈窗口，通过本地套接字接收server.py的反馈请求，
+# 省去每次调用时解释器启动、PySide6导入和QApplication创建的开销。
+# 未运行此进程时，server.py会自动退回到每次启动feedback_ui.py的方式。
+import os
+import sys
+import signal
+import socket
+import secrets
+import argparse
+
+from PySide6.QtWidgets import QApplication
+from PySide6.QtCore import Signal, QObject, QTimer
+from PySide6.QtNetwork import QTcpServer, QTcpSocket, QHostAddress, QAbstractSocket
+
+from feedback_ui import FeedbackUI
+from feedback_protocol import (
+    ProtocolError, encode_frame, pop_frame, make_message, expect_message,
+    read_daemon_state, write_daemon_state, remove_daemon_state,
+)
+
+class FeedbackSession(QObject):
+    """一次反馈请求：把窗口的结果写回发起请求的连接"""
+    done = Signal(object)  # 发送自身，通知守护进程回收窗口
+
+    def __init__(self, connection: QTcpSocket, ui: FeedbackUI, buffer: bytearray, parent=None):
+        super().__init__(parent)
+        self.connection = connection
+        self.ui = ui
+        self.buffer = buffer  # request之后已收到的数据
+        ui.finished.connect(self._on_finished)
+        connection.disconnected.connect(self._on_disconnected)
+        connection.readyRead.connect(self._on_ready_read)
+        self._on_ready_read()
+
+    def _on_ready_read(self):
+        # request之后只接受cancel（等待超时，返回草稿并关闭窗口）和update（更新提示）消息
+        self.buffer.extend(self.connection.readAll().data())
+        try:
+            while (message := pop_frame(self.buffer)) is not None:
+                if message.get("type") == "cancel":
+                    self.ui.cancel()
+                elif message.get("type") == "update":
+                    self.ui.apply_update(message)
+        except ProtocolError:
+            self.connection.abort()
+
+    def _on_finished(self, result):
+        self.ui.finished.disconnect(self._on_finished)
+        self.connection.disconnected.disconnect(self._on_disconnected)
+        self.connection.readyRead.disconnect(self._on_ready_read)
+        if self.connection.state() == QAbstractSocket.ConnectedState:
+            self.connection.write(encode_frame(make_message("result", result=result)))
+            self.connection.disconnectFromHost()
+        self.done.emit(self)
+
+    def _on_disconnected(self):
+        # 调用方已放弃等待（例如工具调用被取消），关闭对应的窗口
+        self.ui.close()
+
+class FeedbackDaemon(QObject):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.token = secrets.token_hex(16)
+        self.server = QTcpServer(self)
+        self.server.newConnection.connect(self._on_new_connection)
+        self.idle_windows = []  # 空闲的、可复用的反馈窗口
+        self.sessions = set()
+
+    def start(self) -> bool:
+        if not self.server.listen(QHostAddress.LocalHost, 0):
+            return False
+        write_daemon_state(self.server.serverPort(), os.getpid(), self.token)
+        # 提前创建好一个窗口，第一次请求也无需等待窗口构建
+        QTimer.singleShot(0, self._prebuild_window)
+        return True
+
+    def stop(self):
+        self.server.close()
+        remove_daemon_state(os.getpid())
+
+    def _prebuild_window(self):
+        if not self.idle_windows:
+            self.idle_windows.append(FeedbackUI(""))
+
+    def _on_new_connection(self):
+        while self.server.hasPendingConnections():
+            connection = self.server.nextPendingConnection()
+            buffer = bytearray()
+            connection.readyRead.connect(lambda c=connection, b=buffer: self._on_ready_read(c, b))
+            connection.disconnected.connect(connection.deleteLater)
+
+    def _on_ready_read(self, connection: QTcpSocket, buffer: bytearray):
+        buffer.extend(connection.readAll().data())
+        try:
+            request = pop_frame(buffer)
+            if request is None:
+                return
+            expect_message(request, "request")
+        except ProtocolError:
+            connection.abort()
+            return
+        # 每个连接只处理一个请求
+        connection.readyRead.disconnect()
+        if not secrets.compare_digest(str(request.get("token", "")), self.token):
+            connection.abort()
+            return
+        self._show_request(connection, request, buffer)
+
+    def _show_request(self, connection: QTcpSocket, request: dict, buffer: bytearray):
+        ui = self.idle_windows.pop() if self.idle_windows else FeedbackUI("")
+        ui.load_request(
+            request.get("prompt", ""),
+            request.get("predefined_options") or None,
+            int(request.get("pending", 0)),
+            request.get("previous_answer"),
+            request.get("client") or "",
+            request.get("questions"),
+            request.get("segment_prefix") or "",
+        )
+
+        session = FeedbackSession(connection, ui, buffer, self)
+        session.done.connect(self._on_session_done)
+        self.sessions.add(session)
+
+        ui.show()
+        ui.raise_()
+        ui.activateWindow()
+
+    def _on_session_done(self, session: FeedbackSession):
+        self.sessions.discard(session)
+        self.idle_windows.append(session.ui)
+        session.deleteLater()
+
+def daemon_running() -> bool:
+    """检查是否已有可连接的常驻UI进程"""
+    state = read_daemon_state()
+    if not state:
+        return False
+    try:
+        with socket.create_connection(("127.0.0.1", state["port"]), timeout=0.5):
+            return True
+    except OSError:
+        return False
+
+def main():
+    parser = argparse.ArgumentParser(description="运行常驻的反馈UI进程")
+    parser.parse_args()
+
+    if daemon_running():
+        print("反馈UI守护进程已在运行")
+        sys.exit(0)
+
+    app = QApplication.instance() or QApplication()
+    app.setStyle("Fusion")
+    # 窗口关闭后继续常驻等待下一个请求
+    app.setQuitOnLastWindowClosed(False)
+
+    daemon = FeedbackDaemon()
+    if not daemon.start():
+        print(f"无法监听本地端口: {daemon.server.errorString()}")
+        sys.exit(1)
+    app.aboutToQuit.connect(daemon.stop)
+
+    # Qt事件循环期间Python无法处理信号，定时唤醒解释器以便响应Ctrl+C和终止信号
+    signal.signal(signal.SIGINT, lambda *_: app.quit())
+    signal.signal(signal.SIGTERM, lambda *_: app.quit())
+    wakeup_timer = QTimer()
+    wakeup_timer.timeout.connect(lambda: None)
+    wakeup_timer.start(500)
+
+    sys.exit(app.exec())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+#!/usr/bin/env python
+# Interactive Feedback MCP 反馈历史
+# 回答返回给AI之后就丢失了，AI在新的会话中经常重复提出用户以前回答过的问题。
+# 每次调用的问题、预定义选项、用户的选择、回答文本以及图片和文件路径只追加写入本地SQLite数据库，
+# FTS5全文索引使用trigram分词，中文不需要分词也能按任意片段检索，数万条记录中的查询在毫秒级完成。
+# 一次工具调用是一个会话(session)，批量提问的每个问题是会话中的一条记录。
+# 超出保留条数或保留天数的旧记录在每写入COMPACT_INTERVAL条记录后删除。
+#
+# 命令行用法：
+#   python feedback_history.py stats          查看历史统计
+#   python feedback_history.py compact        立即执行清理并优化索引
+#   python feedback_history.py search 关键词   搜索历史记录
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import threading
+from typing import List, Optional
+
+DEFAULT_HISTORY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "feedback_history.sqlite3")
+
+# 每写入这么多条记录检查一次保留上限
+COMPACT_INTERVAL = 1000
+# trigram分词只能索引至少3个字符的片段，更短的关键词改为在匹配结果中用LIKE过滤
+_TRIGRAM_LENGTH = 3
+# 搜索结果中提示和回答的最大长度，完整内容用session()读取
+SNIPPET_CHARS = 300
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    id INTEGER PRIMARY KEY,
+    session_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    client TEXT NOT NULL,
+    outcome TEXT NOT NULL,
+    prompt TEXT NOT NULL,
+    options TEXT NOT NULL,
+    selected_options TEXT NOT NULL,
+    feedback TEXT NOT NULL,
+    image_paths TEXT NOT NULL,
+    file_paths TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS records_session ON records(session_id, position);
+CREATE INDEX IF NOT EXISTS records_created ON records(created_at);
+CREATE VIRTUAL TABLE IF NOT EXISTS records_fts USING fts5(
+    prompt, feedback, content='records', content_rowid='id', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS records_insert AFTER INSERT ON records BEGIN
+    INSERT INTO records_fts(rowid, prompt, feedback) VALUES (new.id, new.prompt, new.feedback);
+END;
+CREATE TRIGGER IF NOT EXISTS records_delete AFTER DELETE ON records BEGIN
+    INSERT INTO records_fts(records_fts, rowid, prompt, feedback) VALUES ('delete', old.id, old.prompt, old.feedback);
+END;
+"""
+
+_COLUMNS = ("r.id, r.session_id, r.position, r.created_at, r.client, r.outcome, r.prompt, r.options, "
+            "r.selected_options, r.feedback, r.image_paths, r.file_paths")
+
+def _escape_like(term: str) -> str:
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+def _shorten(text: str, limit: int) -> str:
+    return text if len(text) <= limit else text[:limit] + "…"
+
+class FeedbackHistory:
+    def __init__(self, path: str = DEFAULT_HISTORY_PATH, max_records: int = 100000,
+                 max_age: float = 365 * 24 * 3600):
+        self.path = path
+        self.max_records = max_records  # 保留的记录数上限，0表示不限
+        self.max_age = max_age  # 记录的保留时间（秒），0表示不限
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._since_compact = 0
+
+    @classmethod
+    def from_env(cls) -> "FeedbackHistory":
+        """从INTERACTIVE_FEEDBACK_HISTORY_*环境变量读取数据库路径和保留上限"""
+        return cls(
+            path=os.environ.get("INTERACTIVE_FEEDBACK_HISTORY_DB", DEFAULT_HISTORY_PATH),
+            max_records=int(os.environ.get("INTERACTIVE_FEEDBACK_HISTORY_MAX_RECORDS", "100000")),
+            max_age=float(os.environ.get("INTERACTIVE_FEEDBACK_HISTORY_MAX_AGE_DAYS", "365")) * 24 * 3600,
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        """第一次读写时才打开数据库，需在锁内调用；服务端在不同线程中访问同一个连接"""
+        if self._conn is None:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            # WAL：写入不阻塞其他进程（例如命令行）读取；NORMAL在WAL模式下断电只可能丢失最后的事务
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def record(self, session_id: str, client: str, outcome: str, items: List[dict],
+               created_at: Optional[float] = None) -> int:
+        """追加一次调用的记录，items中每项是一个问题：prompt、predefined_options、selected_options、
+        interactive_feedback、image_paths、file_paths；返回写入的记录数"""
+        created_at = time.time() if created_at is None else created_at
+        rows = [
+            (
+                session_id, position, created_at, client, outcome,
+                item.get("prompt", ""),
+                json.dumps(item.get("predefined_options") or [], ensure_ascii=False),
+                json.dumps(item.get("selected_options") or [], ensure_ascii=False),
+                item.get("interactive_feedback", ""),
+                json.dumps(item.get("image_paths") or [], ensure_ascii=False),
+                json.dumps(item.get("file_paths") or [], ensure_ascii=False),
+            )
+            for position, item in enumerate(items)
+        ]
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute("BEGIN")
+                conn.executemany(
+                    "INSERT INTO records (session_id, position, created_at, client, outcome, prompt, options, "
+                    "selected_options, feedback, image_paths, file_paths) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+            self._since_compact += len(rows)
+            if self._since_compact >= COMPACT_INTERVAL:
+                self._since_compact = 0
+                self._evict(conn)
+        return len(rows)
+
+    def search(self, query: str, limit: int = 10, client: str = "") -> List[dict]:
+        """按关键词搜索提示和回答，所有关键词都须出现，最新的记录在前；结果中的提示和回答截断为SNIPPET_CHARS个字符。
+        不按bm25相关度排序：常见词匹配大部分记录时需要为每条匹配计算得分，数万条记录时要上百毫秒，
+        而按rowid倒序时FTS5可以在找到limit条后停止；用户的偏好会变化，最近的回答通常也最有参考价值"""
+        terms = query.split()
+        indexed = [term for term in terms if len(term) >= _TRIGRAM_LENGTH]
+        conditions, params = [], []
+        for term in terms:
+            if len(term) < _TRIGRAM_LENGTH:
+                conditions.append("(r.prompt LIKE ? ESCAPE '\\' OR r.feedback LIKE ? ESCAPE '\\')")
+                params += [f"%{_escape_like(term)}%"] * 2
+        if client:
+            # 客户端标识是“名称#序号”，只给名称时匹配该客户端的所有连接
+            conditions.append("(r.client = ? OR r.client LIKE ? ESCAPE '\\')")
+            params += [client, f"{_escape_like(client)}#%"]
+
+        if indexed:
+            match = " AND ".join('"' + term.replace('"', '""') + '"' for term in indexed)
+            sql = f"SELECT {_COLUMNS} FROM records_fts JOIN records r ON r.id = records_fts.rowid WHERE records_fts MATCH ?"
+            params.insert(0, match)
+            order = "ORDER BY records_fts.rowid DESC"
+        else:
+            sql = f"SELECT {_COLUMNS} FROM records r WHERE 1"
+            order = "ORDER BY r.id DESC"
+        where = "".join(f" AND {condition}" for condition in conditions)
+        with self._lock:
+            rows = self._connect().execute(f"{sql}{where} {order} LIMIT ?", (*params, max(1, limit))).fetchall()
+        return [self._row_to_dict(row, SNIPPET_CHARS) for row in rows]
+
+    def session(self, session_id: str) -> List[dict]:
+        """按顺序返回一个会话的全部记录，不存在时返回空列表"""
+        with self._lock:
+            rows = self._connect().execute(
+                f"SELECT {_COLUMNS} FROM records r WHERE r.session_id = ? ORDER BY r.position", (session_id,)
+            ).fetchall()
+        return [self._row_to_dict(row) for row in rows]
+
+    @staticmethod
+    def _row_to_dict(row: sqlite3.Row, limit: Optional[int] = None) -> dict:
+        prompt, feedback = row["prompt"], row["feedback"]
+        if limit is not None:
+            prompt, feedback = _shorten(prompt, limit), _shorten(feedback, limit)
+        return {
+            "session_id": row["session_id"],
+            "position": row["position"],
+            "answered_at": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(row["created_at"])),
+            "client": row["client"],
+            "outcome": row["outcome"],
+            "prompt": prompt,
+            "predefined_options": json.loads(row["options"]),
+            "selected_options": json.loads(row["selected_options"]),
+            "interactive_feedback": feedback,
+            "image_paths": json.loads(row["image_paths"]),
+            "file_paths": json.loads(row["file_paths"]),
+        }
+
+    def _evict(self, conn: sqlite3.Connection) -> int:
+        """删除超出保留时间和保留条数的最旧记录，需在锁内调用"""
+        removed = 0
+        with conn:
+            conn.execute("BEGIN")
+            if self.max_age > 0:
+                removed += conn.execute(
+                    "DELETE FROM records WHERE created_at < ?", (time.time() - self.max_age,)
+                ).rowcount
+            if self.max_records > 0:
+                removed += conn.execute(
+                    "DELETE FROM records WHERE id <= (SELECT id FROM records ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                    (self.max_records,),
+                ).rowcount
+        return removed
+
+    def compact(self) -> dict:
+        """立即删除超出上限的记录，合并全文索引的段并回收数据库文件空间"""
+        with self._lock:
+            conn = self._connect()
+            removed = self._evict(conn)
+            conn.execute("INSERT INTO records_fts(records_fts) VALUES ('optimize')")
+            conn.execute("VACUUM")
+        return {"records_removed": removed}
+
+    def stats(self) -> dict:
+        with self._lock:
+            conn = self._connect()
+            records, sessions, oldest, newest = conn.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT session_id), MIN(created_at), MAX(created_at) FROM records"
+            ).fetchone()
+        return {
+            "path": self.path,
+            "records": records,
+            "sessions": sessions,
+            "oldest": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(oldest)) if oldest else None,
+            "newest": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(newest)) if newest else None,
+            "database_bytes": sum(
+                os.path.getsize(path) for path in (self.path, f"{self.path}-wal") if os.path.exists(path)
+            ),
+            "max_records": self.max_records,
+            "max_age_seconds": self.max_age,
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description="管理反馈历史数据库")
+    parser.add_argument("command", choices=["stats", "compact", "search"], help="stats查看统计，compact立即清理，search搜索")
+    parser.add_argument("query", nargs="*", help="search的关键词")
+    parser.add_argument("--limit", type=int, default=10, help="search返回的最大记录数")
+    args = parser.parse_args()
+
+    history = FeedbackHistory.from_env()
+    if args.command == "search":
+        print(json.dumps(history.search(" ".join(args.query), args.limit), ensure_ascii=False, indent=2))
+        sys.exit(0)
+    if args.command == "compact":
+        print(json.dumps(history.compact(), ensure_ascii=False, indent=2))
+    print(json.dumps(history.stats(), ensure_ascii=False, indent=2))
+    sys.exit(0)
+
+if __name__ == "__main__":
+    main()
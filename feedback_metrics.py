@@ -0,0 +1,217 @@
+# Interactive Feedback MCP 指标与调用追踪
+# 每次interactive_feedback调用记录一个span：排队、启动界面、首次绘制、用户停留时间、响应大小、图片数和结果。
+# 汇总为计数器和直方图，另有读取时才计算的仪表值（如正在运行的界面子进程的总内存），
+# 通过metrics://feedback资源以JSON或Prometheus文本格式读取；
+# 设置INTERACTIVE_FEEDBACK_TRACE_FILE时每个span另外追加一行JSON到该文件。
+# INTERACTIVE_FEEDBACK_METRICS=0时span为空操作，调用路径上只剩一次方法调用的开销。
+import os
+import json
+import time
+import threading
+from bisect import bisect_left
+from collections import deque
+from typing import Callable, Dict, Optional, Tuple
+
+# 直方图的桶上限
+_SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+_DWELL_BUCKETS = (1.0, 5.0, 15.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0, 3600.0)
+_BYTES_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+_COUNT_BUCKETS = (0, 1, 2, 4, 8, 16)
+_RSS_BUCKETS = tuple(size * 1024 * 1024 for size in (32, 64, 128, 256, 512, 1024, 2048, 4096))
+_CPU_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 600.0)
+
+# 直方图名称 -> (说明, 桶上限)
+HISTOGRAMS: Dict[str, Tuple[str, tuple]] = {
+    "queue_wait_seconds": ("排队等待窗口名额的时间", _DWELL_BUCKETS),
+    "spawn_seconds": ("从开始启动界面到窗口显示的时间", _SECONDS_BUCKETS),
+    "first_paint_seconds": ("从开始启动界面到窗口首次绘制的时间", _SECONDS_BUCKETS),
+    "dwell_seconds": ("窗口显示后用户停留的时间", _DWELL_BUCKETS),
+    "call_seconds": ("整个工具调用的时间", _DWELL_BUCKETS),
+    "prompt_bytes": ("提示文本的UTF-8字节数", _BYTES_BUCKETS),
+    "response_bytes": ("返回给客户端的内容字节数", _BYTES_BUCKETS),
+    "images": ("每次回答附带的图片数", _COUNT_BUCKETS),
+    "child_peak_rss_bytes": ("反馈界面子进程的峰值常驻内存", _RSS_BUCKETS),
+    "child_cpu_seconds": ("反馈界面子进程消耗的CPU时间", _CPU_BUCKETS),
+}
+
+# 最近的span保留在内存中，JSON格式一并返回
+RECENT_SPANS = 50
+
+class _Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # 最后一个是+Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> list:
+        total, result = 0, []
+        for count in self.counts:
+            total += count
+            result.append(total)
+        return result
+
+class Span:
+    """一次工具调用的记录，阶段时间用time.time()，结束时交给FeedbackMetrics汇总"""
+    __slots__ = ("metrics", "started_at", "fields", "marks")
+
+    def __init__(self, metrics: "FeedbackMetrics", **fields):
+        self.metrics = metrics
+        self.started_at = time.time()
+        self.fields = fields
+        self.marks: Dict[str, float] = {}
+
+    def mark(self, name: str, at: Optional[float] = None):
+        """记录阶段发生的时间，同一阶段只记录第一次"""
+        self.marks.setdefault(name, time.time() if at is None else at)
+
+    def set(self, **fields):
+        self.fields.update(fields)
+
+    def finish(self, outcome: str, **fields):
+        self.fields.update(fields)
+        self.metrics._record(self, outcome)
+
+class _NullSpan:
+    """禁用指标时使用的空操作span"""
+    __slots__ = ()
+
+    def mark(self, name: str, at: Optional[float] = None):
+        pass
+
+    def set(self, **fields):
+        pass
+
+    def finish(self, outcome: str, **fields):
+        pass
+
+NULL_SPAN = _NullSpan()
+
+class FeedbackMetrics:
+    def __init__(self, enabled: bool = True, trace_file: Optional[str] = None):
+        self.enabled = enabled
+        self.trace_file = trace_file
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self._calls: Dict[Tuple[str, str], int] = {}  # (结果, 界面) -> 次数
+        self._histograms = {name: _Histogram(buckets) for name, (_, buckets) in HISTOGRAMS.items()}
+        self._recent = deque(maxlen=RECENT_SPANS)
+        self._in_flight = 0
+        self._gauges: Dict[str, Tuple[str, Callable[[], float]]] = {}  # 名称 -> (说明, 读取函数)
+
+    @classmethod
+    def from_env(cls) -> "FeedbackMetrics":
+        return cls(
+            enabled=os.environ.get("INTERACTIVE_FEEDBACK_METRICS", "1") != "0",
+            trace_file=os.environ.get("INTERACTIVE_FEEDBACK_TRACE_FILE") or None,
+        )
+
+    def add_gauge(self, name: str, description: str, read: Callable[[], float]):
+        """登记一个仪表值，导出指标时调用read读取当前值"""
+        self._gauges[name] = (description, read)
+
+    def _read_gauges(self) -> Dict[str, float]:
+        return {name: read() for name, (_, read) in self._gauges.items()}
+
+    def span(self, **fields):
+        if not self.enabled:
+            return NULL_SPAN
+        with self._lock:
+            self._in_flight += 1
+        return Span(self, **fields)
+
+    def _record(self, span: Span, outcome: str):
+        ended_at = time.time()
+        marks = span.marks
+        launched = marks.get("launched")
+        shown = marks.get("shown")
+        durations = {
+            "call_seconds": ended_at - span.started_at,
+            "queue_wait_seconds": launched - span.started_at if launched else None,
+            "spawn_seconds": shown - launched if launched and shown else None,
+            "first_paint_seconds": marks["painted"] - launched if launched and "painted" in marks else None,
+            "dwell_seconds": marks["answered"] - shown if shown and "answered" in marks else None,
+        }
+        record = {
+            "started_at": round(span.started_at, 6),
+            "outcome": outcome,
+            **span.fields,
+            **{name: round(value, 6) for name, value in durations.items() if value is not None},
+        }
+        with self._lock:
+            self._in_flight -= 1
+            key = (outcome, str(span.fields.get("backend", "")))
+            self._calls[key] = self._calls.get(key, 0) + 1
+            for name, histogram in self._histograms.items():
+                value = record.get(name)
+                if isinstance(value, (int, float)) and value >= 0:
+                    histogram.observe(value)
+            self._recent.append(record)
+        if self.trace_file:
+            self._write_trace(record)
+
+    def _write_trace(self, record: dict):
+        try:
+            with open(self.trace_file, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        except OSError:
+            # 追踪文件不可写不影响工具调用
+            pass
+
+    def to_json(self) -> dict:
+        gauges = self._read_gauges()
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "uptime_seconds": round(time.time() - self.started_at, 3),
+                "in_flight": self._in_flight,
+                "gauges": gauges,
+                "calls": [
+                    {"outcome": outcome, "backend": backend, "count": count}
+                    for (outcome, backend), count in sorted(self._calls.items())
+                ],
+                "histograms": {
+                    name: {
+                        "count": histogram.count,
+                        "sum": round(histogram.sum, 6),
+                        "mean": round(histogram.sum / histogram.count, 6) if histogram.count else None,
+                        "buckets": dict(zip([*map(str, histogram.buckets), "+Inf"], histogram.cumulative())),
+                    }
+                    for name, histogram in self._histograms.items()
+                },
+                "recent": list(self._recent),
+            }
+
+    def to_prometheus(self) -> str:
+        """Prometheus文本格式(0.0.4)"""
+        gauges = self._read_gauges()
+        lines = [
+            "# HELP interactive_feedback_calls_total 按结果和界面统计的interactive_feedback调用次数",
+            "# TYPE interactive_feedback_calls_total counter",
+        ]
+        with self._lock:
+            for (outcome, backend), count in sorted(self._calls.items()):
+                lines.append(f'interactive_feedback_calls_total{{outcome="{outcome}",backend="{backend}"}} {count}')
+            lines += [
+                "# HELP interactive_feedback_in_flight 正在等待回答的调用数",
+                "# TYPE interactive_feedback_in_flight gauge",
+                f"interactive_feedback_in_flight {self._in_flight}",
+            ]
+            for name, value in gauges.items():
+                metric = f"interactive_feedback_{name}"
+                lines += [f"# HELP {metric} {self._gauges[name][0]}", f"# TYPE {metric} gauge", f"{metric} {value:g}"]
+            for name, histogram in self._histograms.items():
+                metric = f"interactive_feedback_{name}"
+                lines += [f"# HELP {metric} {HISTOGRAMS[name][0]}", f"# TYPE {metric} histogram"]
+                for bound, total in zip([*histogram.buckets, "+Inf"], histogram.cumulative()):
+                    lines.append(f'{metric}_bucket{{le="{bound}"}} {total}')
+                lines.append(f"{metric}_sum {histogram.sum:g}")
+                lines.append(f"{metric}_count {histogram.count}")
+        return "\n".join(lines) + "\n"
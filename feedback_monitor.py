@@ -0,0 +1,114 @@
+# Interactive Feedback MCP 反馈界面子进程的资源监控
+# 每个反馈界面子进程在等待回答期间定期用psutil采样常驻内存(RSS)和CPU时间，记录每次调用的峰值内存和CPU时间；
+# 超出配置的内存或CPU时间上限时结束子进程（例如粘贴了超大图片或界面陷入死循环），调用以错误结束。
+# 正在运行的子进程的总内存和CPU时间作为指标导出，用于估算同时运行多个会话的主机需要的资源。
+import os
+import time
+import asyncio
+from dataclasses import dataclass
+from typing import Optional, Set
+
+import psutil
+
+class ResourceLimitError(Exception):
+    """反馈界面子进程超出资源上限，已被结束"""
+
+@dataclass
+class ResourceLimits:
+    max_rss_bytes: int = 2048 * 1024 * 1024  # 常驻内存上限，0表示不限
+    max_cpu_seconds: float = 600.0  # 累计CPU时间（用户态+内核态）上限，0表示不限
+    interval: float = 0.5  # 采样间隔（秒）
+
+    @classmethod
+    def from_env(cls) -> "ResourceLimits":
+        """从INTERACTIVE_FEEDBACK_CHILD_*环境变量读取上限，未设置的项使用默认值"""
+        defaults = cls()
+        return cls(
+            max_rss_bytes=int(float(os.environ.get(
+                "INTERACTIVE_FEEDBACK_CHILD_MAX_RSS_MB", defaults.max_rss_bytes / 1024 / 1024
+            )) * 1024 * 1024),
+            max_cpu_seconds=float(os.environ.get("INTERACTIVE_FEEDBACK_CHILD_MAX_CPU_SECONDS", defaults.max_cpu_seconds)),
+            interval=float(os.environ.get("INTERACTIVE_FEEDBACK_CHILD_SAMPLE_SECONDS", defaults.interval)),
+        )
+
+# 正在监控的子进程
+_active: Set["ChildMonitor"] = set()
+
+class ChildMonitor:
+    """在事件循环中定期采样一个子进程，记录峰值内存和CPU时间，超出上限时结束进程"""
+
+    def __init__(self, pid: int, limits: ResourceLimits):
+        self.pid = pid
+        self.limits = limits
+        self.started_at = time.monotonic()
+        self.rss = 0
+        self.peak_rss = 0
+        self.cpu_seconds = 0.0
+        self.samples = 0
+        self.exceeded: Optional[str] = None  # 超出上限时的说明
+        self._process: Optional[psutil.Process] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        try:
+            self._process = psutil.Process(self.pid)
+        except psutil.Error:
+            # 进程已经退出，没有可采样的数据
+            return
+        _active.add(self)
+        self._task = asyncio.ensure_future(self._run())
+
+    async def _run(self):
+        while self.sample() and self.exceeded is None:
+            await asyncio.sleep(self.limits.interval)
+
+    def sample(self) -> bool:
+        """采样一次，进程已退出时返回False"""
+        if self._process is None:
+            return False
+        try:
+            with self._process.oneshot():
+                rss = self._process.memory_info().rss
+                cpu_times = self._process.cpu_times()
+        except psutil.Error:
+            return False
+        self.samples += 1
+        self.rss = rss
+        self.peak_rss = max(self.peak_rss, rss)
+        self.cpu_seconds = cpu_times.user + cpu_times.system
+        if self.exceeded is None:
+            if self.limits.max_rss_bytes and rss > self.limits.max_rss_bytes:
+                self.exceeded = (f"反馈界面占用内存{rss / 1024 / 1024:.0f}MB，"
+                                 f"超过上限{self.limits.max_rss_bytes / 1024 / 1024:.0f}MB，已被结束")
+            elif self.limits.max_cpu_seconds and self.cpu_seconds > self.limits.max_cpu_seconds:
+                self.exceeded = (f"反馈界面占用CPU时间{self.cpu_seconds:.1f}秒，"
+                                 f"超过上限{self.limits.max_cpu_seconds:g}秒，已被结束")
+            if self.exceeded is not None:
+                try:
+                    self._process.kill()
+                except psutil.Error:
+                    pass
+        return True
+
+    def stop(self) -> dict:
+        """停止采样，返回这次调用中子进程的资源使用情况"""
+        _active.discard(self)
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+        usage = {
+            "child_peak_rss_bytes": self.peak_rss,
+            "child_cpu_seconds": round(self.cpu_seconds, 3),
+            "child_lifetime_seconds": round(time.monotonic() - self.started_at, 3),
+        }
+        if self.exceeded is not None:
+            usage["child_limit_exceeded"] = self.exceeded
+        return usage
+
+def active_usage() -> dict:
+    """正在运行的反馈界面子进程数、当前总内存和累计CPU时间（最近一次采样）"""
+    monitors = list(_active)
+    return {
+        "children": len(monitors),
+        "children_rss_bytes": sum(monitor.rss for monitor in monitors),
+        "children_cpu_seconds": round(sum(monitor.cpu_seconds for monitor in monitors), 3),
+    }
@@ -0,0 +1,199 @@
+# Interactive Feedback MCP 进程间约定
+# server.py、feedback_ui.py与常驻UI进程(feedback_daemon.py)共享的常量和辅助函数
+# 注意：此模块不能导入Qt或fastmcp，服务端和UI进程都会加载它
+#
+# 消息格式：每条消息是一个帧，由4字节大端无符号长度前缀和UTF-8编码的JSON对象组成。
+# 每个JSON对象都带有"version"和"type"字段：
+#   request  服务端 -> UI   {"prompt", "predefined_options", "pending", "previous_answer", "client"}
+#            previous_answer是有效期内相同问题的上次回答（FeedbackResult的字段加answered_at），没有时为null
+#            client是提问的客户端标识（客户端名称#序号），UI显示在标题中
+#            可选的questions是批量提问[{"prompt", "predefined_options"}]，此时prompt和predefined_options是第一个问题，
+#            UI在同一个窗口中逐个显示这些问题，结果的answers按顺序给出每个问题的回答
+#            可选的segment_prefix表示使用共享内存交接图片（见image_handoff.py），UI把图片另外写入以它开头的段
+#   cancel   服务端 -> UI   {}  在request之后发送：等待超时，UI关闭窗口并立即返回已输入的草稿
+#   update   服务端 -> UI   {"question", "summary"?, "append"?, "options"?}  在request之后发送：更新正在显示的提示，
+#            question是问题下标（单个问题时为0），summary替换提示，append追加到提示末尾，options是追加的预定义选项；
+#            用户已输入的回答和已勾选的选项保持不变，新的提示用updated_prompt计算
+#   result   UI -> 服务端   {"result": FeedbackResult}
+#            file_paths是附加的非图片文件（如日志片段），服务端读取其文本内容，每个文件最多ATTACHMENT_MAX_BYTES字节
+#            image_segments是写入了共享内存段的图片{"图片路径": {"name", "size"}}，服务端读取后删除这些段
+# 子进程模式下UI在stdin遇到EOF时（服务端已退出）直接关闭窗口并退出。
+# 子进程模式下通过feedback_ui.py --stdio的stdin/stdout传输，守护进程模式下通过本地TCP连接传输。
+import os
+import json
+import struct
+import getpass
+import tempfile
+from typing import TYPE_CHECKING, BinaryIO, List, NotRequired, Optional, TypedDict
+
+if TYPE_CHECKING:
+    # 只用于类型注解，UI进程运行时不导入asyncio
+    import asyncio
+
+PROTOCOL_VERSION = 1
+
+_HEADER = struct.Struct(">I")
+# 单帧上限，防止损坏的长度前缀导致分配超大内存
+MAX_FRAME_SIZE = 256 * 1024 * 1024
+
+# 附加的非图片文件的大小上限：UI拒绝添加更大的文件，服务端读取时也最多读取这么多字节
+ATTACHMENT_MAX_BYTES = int(float(os.environ.get("INTERACTIVE_FEEDBACK_ATTACHMENT_MAX_KB", "256")) * 1024)
+
+# 拖入、选择或在终端中附加的图片文件的大小上限，超过时不读取
+ATTACH_IMAGE_MAX_BYTES = int(float(os.environ.get("INTERACTIVE_FEEDBACK_ATTACH_IMAGE_MAX_MB", "50")) * 1024 * 1024)
+
+class ProtocolError(Exception):
+    pass
+
+class BatchAnswer(TypedDict):
+    """批量提问中一个问题的回答"""
+    interactive_feedback: str
+    image_paths: List[str]
+    file_paths: NotRequired[List[str]]
+    selected_options: NotRequired[List[str]]
+
+class FeedbackResult(TypedDict):
+    """result消息中的反馈结果，所有界面后端返回相同的结构"""
+    interactive_feedback: str
+    image_paths: List[str]
+    file_paths: NotRequired[List[str]]  # 附加的非图片文件
+    selected_options: NotRequired[List[str]]  # 选中的预定义选项，已合并在interactive_feedback中，单独给出便于记录历史
+    shown_at: Optional[float]  # 界面首次显示的时间戳，用于测量启动耗时
+    painted_at: NotRequired[Optional[float]]  # 窗口首次绘制的时间戳，终端界面没有此字段
+    startup_trace: NotRequired[dict]  # 启用--startup-trace时各启动阶段距脚本开始执行的毫秒数
+    cancelled: NotRequired[bool]  # 因收到cancel消息而返回，内容是用户尚未提交的草稿
+    answers: NotRequired[List[BatchAnswer]]  # 批量提问时每个问题的回答，顺序与questions相同
+    image_segments: NotRequired[dict]  # 图片路径 -> 共享内存段{"name", "size"}，只在请求带有segment_prefix时出现
+
+def updated_prompt(prompt: str, update: dict) -> str:
+    """按update消息计算新的提示：先用summary替换，再把append追加到末尾，与原有内容之间换行"""
+    if update.get("summary") is not None:
+        prompt = update["summary"]
+    append = update.get("append")
+    if append:
+        prompt = f"{prompt}\n{append}" if prompt and not prompt.endswith("\n") else prompt + append
+    return prompt
+
+def new_options(options: List[str], added: List[str]) -> List[str]:
+    """added中尚未出现在options里的选项，保持顺序并去掉重复"""
+    seen = set(options)
+    result = []
+    for option in added:
+        if option not in seen:
+            seen.add(option)
+            result.append(option)
+    return result
+
+def encode_frame(message: dict) -> bytes:
+    payload = json.dumps(message, ensure_ascii=False).encode("utf-8")
+    if len(payload) > MAX_FRAME_SIZE:
+        raise ProtocolError(f"消息过大: {len(payload)}字节")
+    return _HEADER.pack(len(payload)) + payload
+
+def _decode_payload(payload: bytes) -> dict:
+    try:
+        message = json.loads(payload)
+    except ValueError as e:
+        raise ProtocolError(f"无法解析消息: {e}") from e
+    if not isinstance(message, dict):
+        raise ProtocolError("消息必须是JSON对象")
+    if message.get("version") != PROTOCOL_VERSION:
+        raise ProtocolError(f"不支持的协议版本: {message.get('version')}")
+    return message
+
+def _check_length(length: int):
+    if length > MAX_FRAME_SIZE:
+        raise ProtocolError(f"消息过大: {length}字节")
+
+def read_frame(stream: BinaryIO) -> Optional[dict]:
+    """从阻塞的二进制流读取一帧，在帧开始之前遇到EOF时返回None"""
+    header = stream.read(_HEADER.size)
+    if not header:
+        return None
+    if len(header) < _HEADER.size:
+        raise ProtocolError("帧头不完整")
+    (length,) = _HEADER.unpack(header)
+    _check_length(length)
+    payload = stream.read(length)
+    if len(payload) < length:
+        raise ProtocolError("帧内容不完整")
+    return _decode_payload(payload)
+
+async def read_frame_async(reader: "asyncio.StreamReader") -> Optional[dict]:
+    """从asyncio流读取一帧，在帧开始之前遇到EOF时返回None"""
+    # UI进程不需要asyncio，在此处导入以免拖慢UI启动
+    import asyncio
+
+    try:
+        header = await reader.readexactly(_HEADER.size)
+    except asyncio.IncompleteReadError as e:
+        if not e.partial:
+            return None
+        raise ProtocolError("帧头不完整") from e
+    (length,) = _HEADER.unpack(header)
+    _check_length(length)
+    try:
+        payload = await reader.readexactly(length)
+    except asyncio.IncompleteReadError as e:
+        raise ProtocolError("帧内容不完整") from e
+    return _decode_payload(payload)
+
+def pop_frame(buffer: bytearray) -> Optional[dict]:
+    """从累积的接收缓冲区中取出一个完整的帧，数据不足时返回None"""
+    if len(buffer) < _HEADER.size:
+        return None
+    (length,) = _HEADER.unpack_from(buffer)
+    _check_length(length)
+    if len(buffer) < _HEADER.size + length:
+        return None
+    payload = bytes(buffer[_HEADER.size:_HEADER.size + length])
+    del buffer[:_HEADER.size + length]
+    return _decode_payload(payload)
+
+def open_stdin() -> BinaryIO:
+    """--stdio模式下读取请求和控制消息的流。
+    后台线程会一直阻塞在读取上，使用stdin的独立副本，避免解释器退出时与sys.stdin争用缓冲区锁"""
+    return os.fdopen(os.dup(0), "rb")
+
+def make_message(message_type: str, **fields) -> dict:
+    return {"version": PROTOCOL_VERSION, "type": message_type, **fields}
+
+def expect_message(message: Optional[dict], message_type: str) -> dict:
+    if message is None:
+        raise ProtocolError(f"连接已关闭，未收到{message_type}消息")
+    if message.get("type") != message_type:
+        raise ProtocolError(f"期望{message_type}消息，收到{message.get('type')}")
+    return message
+
+# 常驻UI进程把监听端口、进程号和访问令牌写入此文件，按用户区分避免冲突
+DAEMON_STATE_FILE = os.path.join(
+    tempfile.gettempdir(), f"interactive_feedback_daemon_{getpass.getuser()}.json"
+)
+
+def read_daemon_state() -> Optional[dict]:
+    """读取常驻UI进程的状态文件，不存在或损坏时返回None"""
+    try:
+        with open(DAEMON_STATE_FILE, "r", encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(state, dict) or "port" not in state or "token" not in state:
+        return None
+    return state
+
+def write_daemon_state(port: int, pid: int, token: str) -> None:
+    """原子地写入状态文件，仅当前用户可读"""
+    tmp_path = f"{DAEMON_STATE_FILE}.{pid}.tmp"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump({"port": port, "pid": pid, "token": token}, f)
+    os.replace(tmp_path, DAEMON_STATE_FILE)
+
+def remove_daemon_state(pid: int) -> None:
+    """删除状态文件，但只删除属于指定进程的那一份"""
+    state = read_daemon_state()
+    if state and state.get("pid") == pid:
+        try:
+            os.unlink(DAEMON_STATE_FILE)
+        except OSError:
+            pass
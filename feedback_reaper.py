@@ -0,0 +1,107 @@
+# Interactive Feedback MCP 反馈界面子进程回收
+# MCP客户端崩溃或被强制结束时，服务端来不及关闭它启动的反馈界面，置顶的窗口会一直留在屏幕上。
+# 每个子进程启动时在登记目录中写一个登记文件，记录子进程和启动它的服务端；
+# 服务端启动时结束服务端已不存在的子进程，正常退出时结束自己的子进程。
+# 进程号会被系统复用，所以同时记录进程的创建时间，两者都一致才认为是同一个进程。
+import os
+import json
+import getpass
+import tempfile
+from typing import List, Optional
+
+import psutil
+
+REGISTRY_DIR = os.path.join(tempfile.gettempdir(), f"interactive_feedback_children_{getpass.getuser()}")
+
+# 比较创建时间的容差（秒），psutil在部分平台上的创建时间精度有限
+_CREATE_TIME_TOLERANCE = 1.0
+
+def _create_time(pid: int) -> Optional[float]:
+    try:
+        return psutil.Process(pid).create_time()
+    except (psutil.NoSuchProcess, psutil.AccessDenied):
+        return None
+
+def _same_process(pid: int, create_time: Optional[float]) -> Optional[psutil.Process]:
+    """进程仍在运行且创建时间与登记时一致时返回进程对象"""
+    try:
+        process = psutil.Process(pid)
+        if create_time is None or abs(process.create_time() - create_time) > _CREATE_TIME_TOLERANCE:
+            return None
+        return process
+    except (psutil.NoSuchProcess, psutil.AccessDenied):
+        return None
+
+def _entry_path(pid: int) -> str:
+    return os.path.join(REGISTRY_DIR, f"{pid}.json")
+
+def register_child(pid: int) -> None:
+    """登记由当前服务端启动的反馈界面子进程"""
+    entry = {
+        "pid": pid,
+        "create_time": _create_time(pid),
+        "server_pid": os.getpid(),
+        "server_create_time": _create_time(os.getpid()),
+    }
+    try:
+        os.makedirs(REGISTRY_DIR, exist_ok=True)
+        with open(_entry_path(pid), "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+    except OSError:
+        # 无法登记只影响异常退出后的清理，不影响显示窗口
+        pass
+
+def unregister_child(pid: int) -> None:
+    try:
+        os.unlink(_entry_path(pid))
+    except OSError:
+        pass
+
+def _read_entries() -> List[dict]:
+    try:
+        names = os.listdir(REGISTRY_DIR)
+    except OSError:
+        return []
+    entries = []
+    for name in names:
+        if not name.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(REGISTRY_DIR, name), "r", encoding="utf-8") as f:
+                entries.append(json.load(f))
+        except (OSError, ValueError):
+            # 写了一半的登记文件，删除后忽略
+            try:
+                os.unlink(os.path.join(REGISTRY_DIR, name))
+            except OSError:
+                pass
+    return entries
+
+def _kill(entry: dict) -> bool:
+    process = _same_process(entry.get("pid", 0), entry.get("create_time"))
+    unregister_child(entry.get("pid", 0))
+    if process is None:
+        return False
+    try:
+        process.kill()
+        process.wait(timeout=3)
+    except (psutil.NoSuchProcess, psutil.TimeoutExpired):
+        pass
+    return True
+
+def reap_orphans() -> int:
+    """结束启动它们的服务端已经不存在的反馈界面，返回结束的进程数"""
+    reaped = 0
+    for entry in _read_entries():
+        if _same_process(entry.get("server_pid", 0), entry.get("server_create_time")) is None:
+            reaped += _kill(entry)
+    return reaped
+
+def reap_own_children() -> int:
+    """结束当前服务端启动的、仍在运行的反馈界面，返回结束的进程数"""
+    reaped = 0
+    own_create_time = _create_time(os.getpid())
+    for entry in _read_entries():
+        if entry.get("server_pid") == os.getpid() and entry.get("server_create_time") == own_create_time:
+            reaped += _kill(entry)
+    return reaped
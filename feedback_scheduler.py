@@ -0,0 +1,138 @@
+# Interactive Feedback MCP 反馈请求调度
+# 多个并发的interactive_feedback调用在此排队，同一时间只显示有限个反馈窗口，
+# 避免置顶窗口互相堆叠、抢夺焦点。按优先级从高到低、同优先级先来先服务的顺序显示。
+# 多个客户端共用一个服务端（HTTP传输）时，同优先级的请求在各客户端之间轮流显示，
+# 队列满时立即拒绝新的请求，而不是无限排队。
+import time
+import heapq
+import asyncio
+import itertools
+import statistics
+from collections import Counter, deque
+from typing import Awaitable, Callable, TypeVar
+
+T = TypeVar("T")
+
+class QueueFullError(Exception):
+    """排队的请求已达上限"""
+
+class _Ticket:
+    __slots__ = ("priority", "turn", "seq", "client", "enqueued_at", "future")
+
+    def __init__(self, priority: int, turn: int, seq: int, client: str, future: asyncio.Future):
+        self.priority = priority
+        self.turn = turn  # 进入队列时同一客户端已在排队的请求数
+        self.seq = seq
+        self.client = client
+        self.enqueued_at = time.monotonic()
+        self.future = future
+
+    def __lt__(self, other: "_Ticket") -> bool:
+        # 优先级高的排在前面；同优先级时各客户端轮流，每个客户端自己的请求按进入队列的顺序
+        return (-self.priority, self.turn, self.seq) < (-other.priority, other.turn, other.seq)
+
+class FeedbackScheduler:
+    def __init__(self, max_active: int = 1, history_size: int = 200, max_queue: int = 0, max_queue_per_client: int = 0):
+        self.max_active = max(1, max_active)
+        self.max_queue = max_queue  # 所有客户端排队请求数的上限，0表示不限
+        self.max_queue_per_client = max_queue_per_client  # 每个客户端排队请求数的上限，0表示不限
+        self._active = 0
+        self._queue: list[_Ticket] = []
+        self._seq = itertools.count()
+        self._wait_times = deque(maxlen=history_size)  # 最近请求的排队时间（秒）
+        self._served = 0
+        self._rejected = 0
+        self._queued_by_client: Counter = Counter()
+        self._active_by_client: Counter = Counter()
+
+    @property
+    def pending(self) -> int:
+        """排队中（尚未显示窗口）的请求数"""
+        return sum(self._queued_by_client.values())
+
+    async def run(self, job: Callable[[], Awaitable[T]], priority: int = 0, client: str = "") -> T:
+        """排队等待空闲的窗口名额后执行job，返回job的结果；队列已满时抛出QueueFullError"""
+        wait_time = await self._acquire(priority, client)
+        self._wait_times.append(wait_time)
+        self._served += 1
+        self._active_by_client[client] += 1
+        try:
+            return await job()
+        finally:
+            self._active_by_client[client] -= 1
+            if not self._active_by_client[client]:
+                del self._active_by_client[client]
+            self._release()
+
+    async def _acquire(self, priority: int, client: str) -> float:
+        if self._active < self.max_active and not self.pending:
+            self._active += 1
+            return 0.0
+
+        if self.max_queue and self.pending >= self.max_queue:
+            self._rejected += 1
+            raise QueueFullError(f"反馈队列已满（{self.pending}个请求在排队），请稍后再试")
+        if self.max_queue_per_client and self._queued_by_client[client] >= self.max_queue_per_client:
+            self._rejected += 1
+            raise QueueFullError(f"当前客户端已有{self._queued_by_client[client]}个问题在排队，请等待用户回答后再提问")
+
+        ticket = _Ticket(
+            priority, self._queued_by_client[client], next(self._seq), client,
+            asyncio.get_running_loop().create_future(),
+        )
+        heapq.heappush(self._queue, ticket)
+        self._queued_by_client[client] += 1
+        try:
+            await ticket.future
+        except asyncio.CancelledError:
+            if ticket.future.done() and not ticket.future.cancelled():
+                # 名额已在取消前转交给本请求，需要归还
+                self._release()
+            else:
+                # 仍在排队：留在堆中由_release跳过，这里只更新计数
+                ticket.future.cancel()
+                self._dequeued(ticket)
+            raise
+        return time.monotonic() - ticket.enqueued_at
+
+    def _dequeued(self, ticket: _Ticket):
+        self._queued_by_client[ticket.client] -= 1
+        if not self._queued_by_client[ticket.client]:
+            del self._queued_by_client[ticket.client]
+
+    def _release(self):
+        # 把名额直接转交给队列中下一个仍在等待的请求
+        while self._queue:
+            ticket = heapq.heappop(self._queue)
+            if not ticket.future.done():
+                self._dequeued(ticket)
+                ticket.future.set_result(None)
+                return
+        self._active -= 1
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        waits = sorted(self._wait_times)
+        queued = sorted(ticket for ticket in self._queue if not ticket.future.done())
+        return {
+            "max_active": self.max_active,
+            "max_queue": self.max_queue,
+            "max_queue_per_client": self.max_queue_per_client,
+            "active": self._active,
+            "served": self._served,
+            "rejected": self._rejected,
+            "clients": {
+                client: {"active": self._active_by_client[client], "queued": self._queued_by_client[client]}
+                for client in sorted(set(self._active_by_client) | set(self._queued_by_client))
+            },
+            "queued": [
+                {"client": ticket.client, "priority": ticket.priority, "waiting_seconds": round(now - ticket.enqueued_at, 3)}
+                for ticket in queued
+            ],
+            "wait_seconds": {
+                "samples": len(waits),
+                "p50": round(statistics.median(waits), 3) if waits else None,
+                "p95": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))], 3) if waits else None,
+                "max": round(waits[-1], 3) if waits else None,
+            },
+        }
@@ -0,0 +1,139 @@
+# Interactive Feedback MCP 打开中的反馈会话
+# AI在等待回答期间想显示进度或补充问题时，不必结束当前调用再重新提问（新的进程和新的窗口）：
+# 每次调用的session_id在此登记，update_feedback_prompt通过它把update消息推送给已经打开的界面，
+# 界面替换或追加提示文本、追加预定义选项，用户已输入的回答和勾选保持不变。
+# 调用还在排队时，更新直接修改将要发送的请求；请求已发出、界面还在启动时，更新暂存并在连接建立后依次发送。
+# 相同的问题合并到同一个窗口时（见feedback_cache.py），后加入的调用的会话转发到发起请求的会话，
+# 两个session_id的更新都推送到这个窗口，历史也都记录窗口中的问题。
+import time
+from typing import Dict, List, Optional
+
+from feedback_protocol import encode_frame, make_message, new_options, updated_prompt
+
+class SessionClosedError(Exception):
+    """反馈界面已经关闭，或会话不存在"""
+
+class LiveSession:
+    """一次调用的反馈界面。questions是界面正在显示的内容[{"prompt", "predefined_options"}]，更新时同步修改，
+    调用结束时按它记录历史，记录的是用户最后看到的问题"""
+
+    def __init__(self, session_id: str, client: str, questions: List[dict]):
+        self.session_id = session_id
+        self.client = client
+        self.questions = [
+            {"prompt": question["prompt"], "predefined_options": list(question.get("predefined_options") or [])}
+            for question in questions
+        ]
+        self.state = "queued"  # queued -> launching -> open -> closed
+        self.created_at = time.time()
+        self.updates = 0
+        self._writer = None
+        self._backlog: List[bytes] = []  # 请求已发出、连接建立之前收到的更新
+        self.shared: Optional["LiveSession"] = None  # 合并到的会话，窗口由它打开
+        self.holders = 1  # 使用此会话窗口的调用数，都结束后才断开
+
+    def join(self, leader: "LiveSession"):
+        """此调用合并到leader打开的窗口：更新转发给leader，questions与leader共用"""
+        self.shared = leader
+        self.questions = leader.questions
+        leader.holders += 1
+
+    def launching(self):
+        """请求已按当前的questions生成，之后的更新需要作为update消息发送"""
+        self.state = "launching"
+
+    def attach(self, writer):
+        """请求已写入writer（子进程的stdin或守护进程的连接），发送暂存的更新"""
+        self._writer = writer
+        self.state = "open"
+        for frame in self._backlog:
+            writer.write(frame)
+        self._backlog = []
+
+    def detach(self):
+        """界面已交回结果或已被结束"""
+        self._writer = None
+        self._backlog = []
+        self.state = "closed"
+
+    async def update(self, question: int = 0, summary: Optional[str] = None, append: str = "",
+                     options: Optional[List[str]] = None) -> dict:
+        """修改第question个问题（下标从0开始）的提示和选项，界面已打开时推送update消息；返回更新后的问题"""
+        if self.state == "closed" or (self.shared is not None and self.shared.state == "closed"):
+            raise SessionClosedError(f"反馈窗口已关闭: {self.session_id}")
+        if self.shared is not None:
+            return await self.shared.update(question, summary, append, options)
+        target = self.questions[question]
+        update = {"question": question}
+        if summary is not None:
+            update["summary"] = summary
+        if append:
+            update["append"] = append
+        added = new_options(target["predefined_options"], options or [])
+        if added:
+            update["options"] = added
+        target["prompt"] = updated_prompt(target["prompt"], update)
+        target["predefined_options"] += added
+        self.updates += 1
+
+        frame = encode_frame(make_message("update", **update))
+        if self._writer is not None:
+            self._writer.write(frame)
+            try:
+                await self._writer.drain()
+            except (OSError, RuntimeError) as e:
+                raise SessionClosedError(f"反馈窗口已关闭: {self.session_id}") from e
+        elif self.state == "launching":
+            self._backlog.append(frame)
+        return target
+
+    def describe(self) -> dict:
+        session = self.shared or self
+        prompt = self.questions[0]["prompt"]
+        info = {
+            "session_id": self.session_id,
+            "client": self.client,
+            "state": session.state,
+            "questions": len(self.questions),
+            "prompt": prompt if len(prompt) <= 100 else prompt[:100] + "…",
+            "updates": session.updates,
+            "age_seconds": round(time.time() - self.created_at, 1),
+        }
+        if self.shared is not None:
+            info["shared_with"] = self.shared.session_id
+        return info
+
+class SessionRegistry:
+    def __init__(self):
+        self._sessions: Dict[str, LiveSession] = {}
+
+    def open(self, session_id: str, client: str, questions: List[dict]) -> LiveSession:
+        session = self._sessions[session_id] = LiveSession(session_id, client, questions)
+        return session
+
+    def close(self, session: LiveSession):
+        # 合并到同一个窗口的其他调用仍在等待时不断开，它们的更新还要推送到窗口
+        target = session.shared or session
+        target.holders -= 1
+        if target.holders == 0:
+            target.detach()
+        self._sessions.pop(session.session_id, None)
+
+    def find(self, session_id: str = "", client: str = "") -> LiveSession:
+        """按session_id查找会话；session_id为空时返回该客户端唯一的会话，没有或有多个时抛出SessionClosedError"""
+        if session_id:
+            session = self._sessions.get(session_id)
+            if session is None:
+                raise SessionClosedError(f"没有打开的反馈窗口: {session_id}")
+            return session
+        candidates = [session for session in self._sessions.values() if session.client == client]
+        if not candidates:
+            raise SessionClosedError("没有打开的反馈窗口")
+        if len(candidates) > 1:
+            raise SessionClosedError(
+                "有多个打开的反馈窗口，请指定session_id：" + "、".join(session.session_id for session in candidates)
+            )
+        return candidates[0]
+
+    def stats(self) -> dict:
+        return {"sessions": [session.describe() for session in self._sessions.values()]}
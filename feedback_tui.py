@@ -0,0 +1,407 @@
+# Interactive Feedback MCP 终端界面
+# 在没有图形界面的主机（例如通过SSH连接）上代替feedback_ui.py收集反馈。
+# 与feedback_ui.py使用相同的--stdio帧协议：stdin/stdout留给server.py传输请求和结果，
+# 与用户的交互通过控制终端(/dev/tty，Windows上为CONIN$/CONOUT$)进行。
+# 注意：此模块不能导入Qt
+import os
+import sys
+import json
+import shlex
+import time
+import argparse
+import threading
+from typing import BinaryIO, List, Optional, TextIO
+
+from feedback_protocol import ATTACH_IMAGE_MAX_BYTES, ATTACHMENT_MAX_BYTES, BatchAnswer, FeedbackResult, ProtocolError, encode_frame, read_frame, make_message, expect_message, open_stdin, new_options, updated_prompt
+from image_pipeline import detect_format
+from image_store import ImageStore
+
+# 单独一行输入此文本结束反馈
+END_OF_INPUT = "."
+# 附加图片的命令前缀
+ATTACH_COMMAND = ":img"
+# 附加日志等文本文件的命令前缀
+ATTACH_FILE_COMMAND = ":file"
+# 直接提交上次对相同问题的回答
+REUSE_COMMAND = ":reuse"
+
+def _open_terminal() -> tuple[TextIO, TextIO]:
+    """打开控制终端的输入和输出，stdin/stdout被帧协议占用时仍能与用户交互"""
+    if os.name == "nt":
+        return (open("CONIN$", "r", encoding="utf-8", errors="replace"),
+                open("CONOUT$", "w", encoding="utf-8", errors="replace"))
+    return (open("/dev/tty", "r", encoding="utf-8", errors="replace"),
+            open("/dev/tty", "w", encoding="utf-8", errors="replace"))
+
+class TerminalFeedback:
+    def __init__(self, tty_in: TextIO, tty_out: TextIO, prompt: str,
+                 predefined_options: Optional[List[str]] = None, pending_count: int = 0,
+                 previous_answer: Optional[dict] = None, client: str = ""):
+        self.tty_in = tty_in
+        self.tty_out = tty_out
+        self.prompt = prompt
+        self.predefined_options = predefined_options or []
+        self.pending_count = pending_count
+        self.previous_answer = previous_answer  # 有效期内相同问题的上次回答
+        self.client = client  # 提问的客户端，多个客户端共用服务端时显示在标题中
+        self.position = ""  # 批量提问时当前问题的序号，例如“问题 1/3”
+        self.image_paths: List[str] = []
+        self.file_paths: List[str] = []
+        # 已选择的选项和已输入的行，等待超时时作为草稿返回
+        self.selected_options: List[str] = []
+        self.draft_lines: List[str] = []
+        self.shown_at: Optional[float] = None
+        self._image_store = None
+        # 终端支持时使用粗体标题，遵循NO_COLOR约定
+        self._bold = tty_out.isatty() and not os.environ.get("NO_COLOR")
+
+    @property
+    def image_store(self) -> ImageStore:
+        """附加的图片与图形界面一样保存到图片存储中，第一次附加图片时才打开"""
+        if self._image_store is None:
+            self._image_store = ImageStore.from_env()
+        return self._image_store
+
+    def _write(self, text: str = ""):
+        self.tty_out.write(text + "\n")
+        self.tty_out.flush()
+
+    def _heading(self, text: str):
+        self._write(f"\033[1m{text}\033[0m" if self._bold else text)
+
+    def _read_line(self, prompt: str = "") -> Optional[str]:
+        """读取一行输入，遇到EOF(Ctrl-D)时返回None"""
+        self.tty_out.write(prompt)
+        self.tty_out.flush()
+        line = self.tty_in.readline()
+        if not line:
+            return None
+        return line.rstrip("\r\n")
+
+    def _show_request(self):
+        title = f"交互式反馈 - {self.client}" if self.client else "交互式反馈"
+        if self.position:
+            title += f"（{self.position}）"
+        if self.pending_count > 0:
+            title += f"（还有{self.pending_count}个问题等待回答）"
+        self._write()
+        self._heading(f"===== {title} =====")
+        self._write(self.prompt)
+        if self.predefined_options:
+            self._write()
+            self._heading("可选项：")
+            for index, option in enumerate(self.predefined_options, 1):
+                self._write(f"  [{index}] {option}")
+        if self.previous_answer:
+            minutes = int((time.time() - self.previous_answer.get("answered_at", time.time())) // 60)
+            self._write()
+            self._heading(f"上次的回答（{f'{minutes}分钟前' if minutes > 0 else '刚才'}，输入 {REUSE_COMMAND} 直接使用）：")
+            self._write(self.previous_answer.get("interactive_feedback", ""))
+            for image_path in self.previous_answer.get("image_paths") or []:
+                self._write(f"  图片: {image_path}")
+
+    def apply_update(self, update: dict, announce: bool = True):
+        """服务端推送的update消息：更新提示和选项，announce时在终端中显示变化；已输入的内容不受影响"""
+        added = new_options(self.predefined_options, update.get("options") or [])
+        self.prompt = updated_prompt(self.prompt, update)
+        first_number = len(self.predefined_options) + 1
+        self.predefined_options = self.predefined_options + added
+        if not announce:
+            return
+        self._write()
+        if update.get("summary") is not None:
+            self._heading("===== 提示已更新 =====")
+            self._write(self.prompt)
+        elif update.get("append"):
+            self._heading("===== 提示追加 =====")
+            self._write(update["append"])
+        if added:
+            self._heading("新增选项：")
+            for index, option in enumerate(added, first_number):
+                self._write(f"  [{index}] {option}")
+
+    def _select_options(self) -> List[str]:
+        """按编号多选预定义选项，直接回车跳过"""
+        while True:
+            line = self._read_line("选择选项（输入编号，用逗号或空格分隔，直接回车跳过）：")
+            if not line or not line.strip():
+                return []
+            try:
+                numbers = [int(part) for part in line.replace(",", " ").replace("，", " ").split()]
+            except ValueError:
+                self._write("请输入选项编号")
+                continue
+            if all(1 <= number <= len(self.predefined_options) for number in numbers):
+                # 按选项原本的顺序返回，重复的编号只算一次
+                return [option for index, option in enumerate(self.predefined_options, 1) if index in numbers]
+            self._write(f"编号必须在1到{len(self.predefined_options)}之间")
+
+    def attach_image(self, path: str) -> Optional[str]:
+        """把图片文件保存到图片存储中，返回错误说明，成功时返回None"""
+        path = os.path.expanduser(path)
+        try:
+            if os.path.getsize(path) > ATTACH_IMAGE_MAX_BYTES:
+                return f"文件超过{ATTACH_IMAGE_MAX_BYTES / (1024 * 1024):g}MB"
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError as e:
+            return f"无法读取文件: {e.strerror or e}"
+        image_format = detect_format(data)
+        if image_format is None:
+            return "不是支持的图片格式（PNG、JPEG或WebP）"
+        stored_path = self.image_store.put(data, image_format)
+        if stored_path in self.image_paths:
+            return "这张图片已经添加到反馈中"
+        self.image_paths.append(stored_path)
+        return None
+
+    def attach_file(self, path: str) -> Optional[str]:
+        """附加日志片段等文本文件，服务端返回时读取其内容；返回错误说明，成功时返回None"""
+        path = os.path.abspath(os.path.expanduser(path))
+        try:
+            if os.path.getsize(path) > ATTACHMENT_MAX_BYTES:
+                return f"文件超过{ATTACHMENT_MAX_BYTES // 1024}KB，请只附加相关的片段"
+            with open(path, "rb") as f:
+                head = f.read(8192)
+        except OSError as e:
+            return f"无法读取文件: {e.strerror or e}"
+        if b"\0" in head:
+            return "不是文本文件"
+        if path in self.file_paths:
+            return "这个文件已经添加到反馈中"
+        self.file_paths.append(path)
+        return None
+
+    def _read_feedback(self) -> Optional[str]:
+        """读取多行反馈，其间可以用:img和:file命令附加图片和文本文件；输入:reuse时返回None"""
+        self._write()
+        self._heading("输入反馈：")
+        self._write(f"（可输入多行，单独一行输入 {END_OF_INPUT} 或按Ctrl-D结束；"
+                    f"输入 {ATTACH_COMMAND} 路径 附加图片，{ATTACH_FILE_COMMAND} 路径 附加日志等文本文件）")
+        lines = self.draft_lines
+        while True:
+            line = self._read_line("> ")
+            if line is None or line.strip() == END_OF_INPUT:
+                break
+            if self.previous_answer and line.strip() == REUSE_COMMAND:
+                return None
+            command = next((c for c in (ATTACH_COMMAND, ATTACH_FILE_COMMAND) if line.startswith(c + " ")), None)
+            if command:
+                try:
+                    paths = shlex.split(line[len(command):], posix=os.name != "nt")
+                except ValueError as e:
+                    self._write(f"无法解析路径: {e}")
+                    continue
+                attach, kind = (self.attach_image, "图片") if command == ATTACH_COMMAND else (self.attach_file, "文件")
+                for path in paths:
+                    error = attach(path.strip("\"'"))
+                    self._write(f"无法附加 {path}: {error}" if error else f"已附加{kind} {path}")
+                continue
+            lines.append(line)
+        return "\n".join(lines).strip()
+
+    def _compose(self, feedback_text: str) -> str:
+        # 与图形界面相同：选中的选项和文本反馈之间用空行分隔
+        final_feedback_parts = []
+        if self.selected_options:
+            final_feedback_parts.append("; ".join(self.selected_options))
+        if feedback_text:
+            final_feedback_parts.append(feedback_text)
+        return "\n\n".join(final_feedback_parts)
+
+    def draft(self) -> FeedbackResult:
+        """用户尚未提交的草稿：已选择的选项、已输入的行和已附加的图片"""
+        return FeedbackResult(
+            interactive_feedback=self._compose("\n".join(self.draft_lines).strip()),
+            image_paths=list(self.image_paths),
+            file_paths=list(self.file_paths),
+            selected_options=list(self.selected_options),
+            shown_at=self.shown_at,
+            cancelled=True,
+        )
+
+    def run(self) -> FeedbackResult:
+        self._show_request()
+        shown_at = self.shown_at = time.time()
+        try:
+            if self.predefined_options:
+                self.selected_options = self._select_options()
+            feedback_text = self._read_feedback()
+        except KeyboardInterrupt:
+            # 与关闭窗口相同，返回空反馈
+            self._write()
+            return FeedbackResult(interactive_feedback="", image_paths=[], shown_at=shown_at)
+        if feedback_text is None:
+            # 使用上次的回答，已被清理的图片不再附带
+            self._write("已使用上次的回答")
+            return FeedbackResult(
+                interactive_feedback=self.previous_answer.get("interactive_feedback", ""),
+                image_paths=[path for path in self.previous_answer.get("image_paths") or [] if os.path.exists(path)],
+                file_paths=[path for path in self.previous_answer.get("file_paths") or [] if os.path.exists(path)],
+                shown_at=shown_at,
+            )
+
+        self._write("反馈已发送")
+        return FeedbackResult(
+            interactive_feedback=self._compose(feedback_text),
+            image_paths=self.image_paths,
+            file_paths=self.file_paths,
+            selected_options=self.selected_options,
+            shown_at=shown_at,
+        )
+
+class TerminalBatch:
+    """批量提问：在同一个终端会话中依次收集每个问题的回答"""
+
+    def __init__(self, tty_in: TextIO, tty_out: TextIO, questions: List[dict], pending_count: int = 0, client: str = ""):
+        self.sessions = [
+            TerminalFeedback(tty_in, tty_out, question.get("prompt", ""), question.get("predefined_options") or None,
+                             pending_count, None, client)
+            for question in questions
+        ]
+        for index, session in enumerate(self.sessions, 1):
+            session.position = f"问题 {index}/{len(self.sessions)}"
+        self.answers: List[BatchAnswer] = []
+        self.shown_at: Optional[float] = None
+
+    def _write(self, text: str = ""):
+        self.sessions[0]._write(text)
+
+    def apply_update(self, update: dict):
+        # 只显示当前问题的更新，其他问题的更新在显示该问题时一并可见
+        index = int(update.get("question", 0))
+        if 0 <= index < len(self.sessions):
+            self.sessions[index].apply_update(update, announce=index == len(self.answers))
+
+    def draft(self) -> FeedbackResult:
+        """已回答的问题和当前问题的草稿，尚未显示的问题为空回答"""
+        answers = list(self.answers)
+        for session in self.sessions[len(answers):]:
+            draft = session.draft()
+            answers.append(BatchAnswer(
+                interactive_feedback=draft["interactive_feedback"], image_paths=draft["image_paths"],
+                file_paths=draft["file_paths"], selected_options=draft["selected_options"],
+            ))
+        return FeedbackResult(interactive_feedback="", image_paths=[], shown_at=self.shown_at, answers=answers, cancelled=True)
+
+    def run(self) -> FeedbackResult:
+        self.shown_at = time.time()
+        for session in self.sessions:
+            result = session.run()
+            self.answers.append(BatchAnswer(
+                interactive_feedback=result["interactive_feedback"], image_paths=result["image_paths"],
+                file_paths=result.get("file_paths") or [], selected_options=result.get("selected_options") or [],
+            ))
+        return FeedbackResult(interactive_feedback="", image_paths=[], shown_at=self.shown_at, answers=self.answers)
+
+def _auto_submit(prompt: str, predefined_options: Optional[List[str]], pending_count: int,
+                 questions: Optional[List[dict]] = None) -> FeedbackResult:
+    """基准测试与无人值守环境下使用：不读取终端，直接提交空反馈和指定的图片（批量提问时附加到第一个问题）"""
+    session = TerminalFeedback(sys.stderr, sys.stderr, prompt, predefined_options, pending_count)
+    auto_submit_images = os.environ.get("INTERACTIVE_FEEDBACK_AUTO_SUBMIT_IMAGES")
+    for image_path in auto_submit_images.split(os.pathsep) if auto_submit_images else []:
+        session.attach_image(image_path)
+    if questions:
+        answers = [BatchAnswer(interactive_feedback="", image_paths=[]) for _ in questions]
+        answers[0]["image_paths"] = session.image_paths
+        return FeedbackResult(interactive_feedback="", image_paths=[], shown_at=time.time(), answers=answers)
+    return FeedbackResult(interactive_feedback="", image_paths=session.image_paths, shown_at=time.time())
+
+_result_lock = threading.Lock()
+_result_sent = False
+
+def _send_result(result: FeedbackResult) -> bool:
+    """把结果帧写到stdout，只写一次；服务端已退出时返回False"""
+    global _result_sent
+    with _result_lock:
+        if _result_sent:
+            return False
+        _result_sent = True
+        try:
+            sys.stdout.buffer.write(encode_frame(make_message("result", result=result)))
+            sys.stdout.buffer.flush()
+        except OSError:
+            return False
+        return True
+
+def _watch_control(stream: BinaryIO, session: "TerminalFeedback | TerminalBatch"):
+    """读取request之后的控制消息。主线程阻塞在终端输入上，收到cancel或输入流结束时由此线程结束进程，
+    收到update时更新提示并在终端中显示"""
+    while True:
+        try:
+            message = read_frame(stream)
+        except (ProtocolError, OSError, ValueError):
+            message = None
+        if message is None:
+            session._write("\n服务端已不再等待，反馈已取消")
+            os._exit(0)
+        if message.get("type") == "cancel":
+            _send_result(session.draft())
+            session._write("\n等待超时，已输入的内容已作为草稿返回")
+            os._exit(0)
+        if message.get("type") == "update":
+            session.apply_update(message)
+
+def feedback_tui(prompt: str, predefined_options: Optional[List[str]] = None, output_file: Optional[str] = None, pending_count: int = 0, previous_answer: Optional[dict] = None, control_stream: Optional[BinaryIO] = None, client: str = "", questions: Optional[List[dict]] = None) -> Optional[FeedbackResult]:
+    if os.environ.get("INTERACTIVE_FEEDBACK_AUTO_SUBMIT_MS"):
+        result = _auto_submit(prompt, predefined_options, pending_count, questions)
+    else:
+        tty_in, tty_out = _open_terminal()
+        with tty_in, tty_out:
+            if questions:
+                session = TerminalBatch(tty_in, tty_out, questions, pending_count, client)
+            else:
+                session = TerminalFeedback(tty_in, tty_out, prompt, predefined_options, pending_count, previous_answer, client)
+            if control_stream is not None:
+                threading.Thread(target=_watch_control, args=(control_stream, session), daemon=True).start()
+            result = session.run()
+
+    if output_file and result:
+        # 确保目录存在
+        os.makedirs(os.path.dirname(output_file) if os.path.dirname(output_file) else ".", exist_ok=True)
+        with open(output_file, "w") as f:
+            json.dump(result, f)
+        return None
+
+    return result
+
+def serve_stdio():
+    """从stdin读取一个请求帧，在终端中收集反馈，并把结果帧写回stdout（供server.py使用）"""
+    stdin = open_stdin()
+    request = expect_message(read_frame(stdin), "request")
+    result = feedback_tui(
+        request.get("prompt", ""),
+        request.get("predefined_options") or None,
+        pending_count=int(request.get("pending", 0)),
+        previous_answer=request.get("previous_answer"),
+        control_stream=stdin,
+        client=request.get("client") or "",
+        questions=request.get("questions"),
+    )
+    _send_result(result)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="在终端中运行反馈界面")
+    parser.add_argument("--prompt", default="我已实现您请求的更改。", help="向用户显示的提示")
+    parser.add_argument("--predefined-options", default="", help="预定义选项的管道分隔列表(|||)")
+    parser.add_argument("--output-file", help="保存反馈结果为JSON的路径")
+    parser.add_argument("--stdio", action="store_true", help="通过stdin/stdout的长度前缀JSON帧接收请求并返回结果")
+    args = parser.parse_args()
+
+    try:
+        if args.stdio:
+            serve_stdio()
+            sys.exit(0)
+
+        predefined_options = [opt for opt in args.predefined_options.split("|||") if opt] if args.predefined_options else None
+        result = feedback_tui(args.prompt, predefined_options, args.output_file)
+    except OSError as e:
+        print(f"无法打开终端: {e}", file=sys.stderr)
+        sys.exit(1)
+    if result:
+        print(f"\n收到反馈：\n{result['interactive_feedback']}")
+        if result['image_paths']:
+            print(f"\n附带图片：\n{', '.join(result['image_paths'])}")
+        if result.get('file_paths'):
+            print(f"\n附带文件：\n{', '.join(result['file_paths'])}")
+    sys.exit(0)
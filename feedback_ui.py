@@ -6,22 +6,51 @@ import os
 import sys
 import json
 import argparse
-import uuid
-from datetime import datetime
-from typing import Optional, TypedDict, List
+import time
+import itertools
+import threading
+from collections import OrderedDict
+from typing import BinaryIO, Optional, List
+
+# 启动耗时记录，在导入Qt之前开始计时
+_startup_marks = {"script_start": time.time()}
+
+def _mark_startup(name: str):
+    # 只记录第一次，常驻进程中重复创建窗口不会覆盖
+    _startup_marks.setdefault(name, time.time())
 
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-    QLabel, QLineEdit, QPushButton, QCheckBox, QTextEdit, QGroupBox,
-    QFrame, QToolButton, QFileDialog, QMessageBox, QGridLayout,
-    QScrollArea
+    QLabel, QPushButton, QTextEdit, QGroupBox,
+    QFrame, QToolButton, QMessageBox,
+    QScrollArea, QFileDialog
+)
+from PySide6.QtCore import (
+    Qt, Signal, QObject, QTimer, QSettings, QBuffer,
+    QRunnable, QThreadPool, QSize
+)
+from PySide6.QtGui import (
+    QIcon, QKeyEvent, QPalette, QColor, QPixmap, QImage, QImageReader, QKeySequence, QShortcut, QTextCursor
 )
-from PySide6.QtCore import Qt, Signal, QObject, QTimer, QSettings, QBuffer, QByteArray, QMimeData
-from PySide6.QtGui import QTextCursor, QIcon, QKeyEvent, QPalette, QColor, QPixmap, QImage, QClipboard, QPainter
 
-class FeedbackResult(TypedDict):
-    interactive_feedback: str
-    image_paths: List[str]
+_mark_startup("qt_imported")
+
+from feedback_protocol import ATTACH_IMAGE_MAX_BYTES, ATTACHMENT_MAX_BYTES, BatchAnswer, FeedbackResult, ProtocolError, encode_frame, read_frame, make_message, expect_message, open_stdin, new_options, updated_prompt
+from image_pipeline import detect_format
+from image_store import ImageStore
+from image_handoff import SharedImages
+from option_list import OptionList
+from prompt_view import PromptView
+
+def startup_trace() -> dict:
+    """返回各启动阶段距脚本开始执行的毫秒数，另附script_start的绝对时间戳用于计算解释器启动耗时"""
+    script_start = _startup_marks["script_start"]
+    trace = {
+        name: round((timestamp - script_start) * 1000, 1)
+        for name, timestamp in sorted(_startup_marks.items(), key=lambda item: item[1])
+    }
+    trace["script_start"] = script_start
+    return trace
 
 def get_dark_mode_palette(app: QApplication):
     darkPalette = app.palette()
@@ -74,26 +103,107 @@ def get_light_mode_palette(app: QApplication):
     lightPalette.setColor(QPalette.PlaceholderText, QColor(180, 180, 180))
     return lightPalette
 
+# 预览缩略图的最大尺寸
+THUMBNAIL_SIZE = QSize(200, 150)
+# 内存中缓存的缩略图数量
+THUMBNAIL_MEMORY_CACHE_SIZE = 64
+
+_thumbnail_cache = OrderedDict()  # 图片路径 -> 缩略图QImage，只在GUI线程中访问
+
+def _read_thumbnail(image_path: str) -> QImage:
+    """按缩略图尺寸解码图片，支持缩放解码的格式（如JPEG）不解码完整图片"""
+    reader = QImageReader(image_path)
+    reader.setAutoTransform(True)
+    size = reader.size()
+    if size.isValid() and (size.width() > THUMBNAIL_SIZE.width() or size.height() > THUMBNAIL_SIZE.height()):
+        reader.setScaledSize(size.scaled(THUMBNAIL_SIZE, Qt.KeepAspectRatio))
+    return reader.read()
+
+def _save_thumbnail_cache(cache_path: Optional[str], image: QImage):
+    if not cache_path or os.path.exists(cache_path):
+        return
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        if image.save(tmp_path, "PNG"):
+            os.replace(tmp_path, cache_path)
+    except OSError:
+        pass
+
+class _ThumbnailSignals(QObject):
+    ready = Signal(str, QImage)  # 图片路径, 缩略图（加载失败时为空图片）
+
+class ThumbnailTask(QRunnable):
+    """在线程池中生成缩略图：优先读取磁盘缓存，否则按缩略图尺寸解码原图，不在GUI线程解码完整图片"""
+
+    def __init__(self, image_path: str, cache_path: Optional[str] = None):
+        super().__init__()
+        self.image_path = image_path
+        self.cache_path = cache_path
+        self.signals = _ThumbnailSignals()
+
+    def run(self):
+        image = QImage()
+        if self.cache_path and os.path.exists(self.cache_path):
+            image = QImage(self.cache_path)
+        if image.isNull():
+            image = _read_thumbnail(self.image_path)
+            if not image.isNull():
+                _save_thumbnail_cache(self.cache_path, image)
+        self.signals.ready.emit(self.image_path, image)
+
 class ImageLabel(QLabel):
     """可以显示图片的标签，支持删除功能"""
     deleted = Signal(str)  # 发送图片路径信号
     
-    def __init__(self, image_path, parent=None):
+    def __init__(self, image_path: Optional[str], parent=None, thumbnail_cache_path: Optional[str] = None,
+                 image: Optional[QImage] = None):
         super().__init__(parent)
-        self.image_path = image_path
+        self.image_path = image_path  # 图片仍在后台保存时为None
         self.setToolTip("点击删除图片")
         self.setCursor(Qt.PointingHandCursor)
         self.setStyleSheet("border: 1px solid gray; margin: 2px;")
-        
-        # 加载图片并调整大小
-        pixmap = QPixmap(image_path)
-        if not pixmap.isNull():
-            pixmap = pixmap.scaled(200, 150, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-            self.setPixmap(pixmap)
-            self.setFixedSize(pixmap.width() + 4, pixmap.height() + 4)
-        else:
+        self.setAlignment(Qt.AlignCenter)
+
+        if image is not None:
+            # 刚粘贴的图片：立即用内存中的图片快速缩放显示，保存完成后再替换为平滑缩放的缩略图
+            self._show_thumbnail(image.scaled(THUMBNAIL_SIZE, Qt.KeepAspectRatio, Qt.FastTransformation))
+            return
+        if image_path is None:
+            # 拖入或选择的文件：后台导入完成后再显示缩略图
+            self.setText("加载中…")
+            self.setFixedSize(THUMBNAIL_SIZE.width(), THUMBNAIL_SIZE.height())
+            return
+
+        cached = _thumbnail_cache.get(image_path)
+        if cached is not None:
+            _thumbnail_cache.move_to_end(image_path)
+            self._show_thumbnail(cached)
+            return
+
+        # 先显示占位符，缩略图在后台线程中生成
+        self.setText("加载中…")
+        self.setFixedSize(THUMBNAIL_SIZE.width(), THUMBNAIL_SIZE.height())
+        task = ThumbnailTask(image_path, thumbnail_cache_path)
+        task.signals.ready.connect(self._on_thumbnail_ready)
+        QThreadPool.globalInstance().start(task)
+
+    def _on_thumbnail_ready(self, image_path: str, image: QImage):
+        if image.isNull():
             self.setText("图片加载失败")
-            self.setFixedSize(200, 150)
+            return
+        _remember_thumbnail(image_path, image)
+        self._show_thumbnail(image)
+
+    def set_saved(self, image_path: str, thumbnail: QImage):
+        """后台保存完成后记录图片路径并换上平滑缩放的缩略图"""
+        self.image_path = image_path
+        _remember_thumbnail(image_path, thumbnail)
+        self._show_thumbnail(thumbnail)
+
+    def _show_thumbnail(self, image: QImage):
+        self.setPixmap(QPixmap.fromImage(image))
+        self.setFixedSize(image.width() + 4, image.height() + 4)
     
     def mousePressEvent(self, event):
         if event.button() == Qt.LeftButton:
@@ -101,13 +211,170 @@ class ImageLabel(QLabel):
                                        "确定要删除这张图片吗？", 
                                        QMessageBox.Yes | QMessageBox.No)
             if reply == QMessageBox.Yes:
-                self.deleted.emit(self.image_path)
+                self.deleted.emit(self.image_path or "")
                 self.deleteLater()
         super().mousePressEvent(event)
 
+def _png_save_quality() -> int:
+    """把INTERACTIVE_FEEDBACK_PNG_COMPRESSION（0-9，越大文件越小、越慢）换算为QImage.save的质量参数"""
+    level = os.environ.get("INTERACTIVE_FEEDBACK_PNG_COMPRESSION")
+    if level is None:
+        return -1  # 使用默认压缩级别
+    level = min(9, max(0, int(level)))
+    return 100 - round(level * 91 / 9)
+
+class _EncodeSignals(QObject):
+    finished = Signal(int, str, QImage)  # 任务编号, 保存后的路径（失败时为空）, 缩略图
+
+class ImageEncodeTask(QRunnable):
+    """在线程池中把粘贴的图片编码为PNG并写入图片存储，同时生成缩略图"""
+
+    def __init__(self, token: int, image: QImage, image_store: ImageStore,
+                 shared_images: Optional[SharedImages] = None):
+        super().__init__()
+        self.token = token
+        self.image = image
+        self.image_store = image_store
+        self.shared_images = shared_images  # 使用共享内存交接图片时另外写入共享内存段
+        self.signals = _EncodeSignals()
+
+    def run(self):
+        buffer = QBuffer()
+        buffer.open(QBuffer.WriteOnly)
+        if not self.image.save(buffer, "PNG", _png_save_quality()):
+            self.signals.finished.emit(self.token, "", QImage())
+            return
+        data = bytes(buffer.data())
+        try:
+            path = self.image_store.put(data, "png")
+        except OSError:
+            self.signals.finished.emit(self.token, "", QImage())
+            return
+        if self.shared_images is not None:
+            self.shared_images.publish(path, data)
+
+        thumbnail = self.image.scaled(THUMBNAIL_SIZE, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        _save_thumbnail_cache(
+            self.image_store.thumbnail_path(path, THUMBNAIL_SIZE.width(), THUMBNAIL_SIZE.height()), thumbnail
+        )
+        self.signals.finished.emit(self.token, path, thumbnail)
+
+class FileLabel(QLabel):
+    """附加的非图片文件，显示文件名和大小，支持删除功能"""
+    deleted = Signal(str)  # 发送文件路径信号
+
+    def __init__(self, file_path: str, parent=None):
+        super().__init__(parent)
+        self.file_path = file_path
+        try:
+            size = _format_size(os.path.getsize(file_path))
+        except OSError:
+            size = "文件不存在"
+        self.setText(f"📄 {os.path.basename(file_path)}\n{size}")
+        self.setToolTip(f"{file_path}\n点击删除文件")
+        self.setWordWrap(True)
+        self.setCursor(Qt.PointingHandCursor)
+        self.setStyleSheet("border: 1px solid gray; margin: 2px; padding: 4px;")
+        self.setAlignment(Qt.AlignCenter)
+        self.setFixedSize(THUMBNAIL_SIZE.width() * 3 // 4, THUMBNAIL_SIZE.height() // 2)
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.LeftButton:
+            reply = QMessageBox.question(self, "确认删除",
+                                       "确定要删除这个文件吗？",
+                                       QMessageBox.Yes | QMessageBox.No)
+            if reply == QMessageBox.Yes:
+                self.deleted.emit(self.file_path)
+                self.deleteLater()
+        super().mousePressEvent(event)
+
+def _format_size(size: int) -> str:
+    if size < 1024:
+        return f"{size} B"
+    if size < 1024 * 1024:
+        return f"{size / 1024:.1f} KB"
+    return f"{size / 1024 / 1024:.1f} MB"
+
+class _ImportSignals(QObject):
+    # 任务编号, 类别（image、file，失败时为空）, 路径（失败时为原因）, 缩略图
+    finished = Signal(int, str, str, QImage)
+
+class FileImportTask(QRunnable):
+    """在线程池中导入拖入或选择的文件，多个文件并行处理。
+    先用QImageReader只读取文件头判断是否为图片：已压缩的PNG/JPEG/WebP原样写入图片存储，不重新编码；
+    其他图片格式解码后编码为PNG；非图片文件只检查大小和是否为文本，服务端返回时读取其内容"""
+
+    def __init__(self, token: int, path: str, image_store: ImageStore, shared_images: Optional[SharedImages] = None):
+        super().__init__()
+        self.token = token
+        self.path = path
+        self.image_store = image_store
+        self.shared_images = shared_images
+        self.signals = _ImportSignals()
+
+    def run(self):
+        try:
+            size = os.path.getsize(self.path)
+            reader = QImageReader(self.path)
+            reader.setAutoTransform(True)
+            if reader.canRead():
+                self._import_image(reader, size)
+            else:
+                self._import_file(size)
+        except (OSError, ValueError) as e:
+            self.signals.finished.emit(self.token, "", f"{os.path.basename(self.path)}: {e}", QImage())
+
+    def _import_image(self, reader: QImageReader, size: int):
+        if size > ATTACH_IMAGE_MAX_BYTES:
+            raise ValueError(f"图片超过{_format_size(ATTACH_IMAGE_MAX_BYTES)}")
+        with open(self.path, "rb") as f:
+            # 只有原样保存的格式才需要读取整个文件，其他格式由QImageReader解码
+            image_format = detect_format(f.read(16))
+            if image_format is not None:
+                f.seek(0)
+                data = f.read()
+        if image_format is not None:
+            path = self.image_store.put(data, "jpg" if image_format == "jpeg" else image_format)
+            thumbnail = _read_thumbnail(path)
+        else:
+            image = reader.read()
+            if image.isNull():
+                raise ValueError(f"无法解码图片: {reader.errorString()}")
+            buffer = QBuffer()
+            buffer.open(QBuffer.WriteOnly)
+            if not image.save(buffer, "PNG", _png_save_quality()):
+                raise ValueError("无法编码为PNG")
+            data = bytes(buffer.data())
+            path = self.image_store.put(data, "png")
+            thumbnail = image.scaled(THUMBNAIL_SIZE, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        if thumbnail.isNull():
+            raise ValueError("无法生成缩略图")
+        if self.shared_images is not None:
+            self.shared_images.publish(path, data)
+        _save_thumbnail_cache(
+            self.image_store.thumbnail_path(path, THUMBNAIL_SIZE.width(), THUMBNAIL_SIZE.height()), thumbnail
+        )
+        self.signals.finished.emit(self.token, "image", path, thumbnail)
+
+    def _import_file(self, size: int):
+        if size > ATTACHMENT_MAX_BYTES:
+            raise ValueError(f"文件超过{_format_size(ATTACHMENT_MAX_BYTES)}，请只附加相关的片段")
+        with open(self.path, "rb") as f:
+            head = f.read(8192)
+        if b"\0" in head:
+            raise ValueError("不支持的文件类型，只能附加图片和文本文件")
+        self.signals.finished.emit(self.token, "file", os.path.abspath(self.path), QImage())
+
+def _remember_thumbnail(image_path: str, image: QImage):
+    _thumbnail_cache[image_path] = image
+    _thumbnail_cache.move_to_end(image_path)
+    while len(_thumbnail_cache) > THUMBNAIL_MEMORY_CACHE_SIZE:
+        _thumbnail_cache.popitem(last=False)
+
 class FeedbackTextEdit(QTextEdit):
-    """支持粘贴图片的文本编辑器"""
+    """支持粘贴图片和拖入文件的文本编辑器"""
     image_pasted = Signal(QImage)
+    files_dropped = Signal(list)  # 拖入或粘贴的本地文件路径
     
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -119,14 +386,19 @@ class FeedbackTextEdit(QTextEdit):
             while parent and not isinstance(parent, FeedbackUI):
                 parent = parent.parent()
             if parent:
-                parent._submit_feedback()
+                parent._advance_or_submit()
         else:
             super().keyPressEvent(event)
     
     def canInsertFromMimeData(self, source):
-        return source.hasImage() or super().canInsertFromMimeData(source)
+        return bool(_local_files(source)) or source.hasImage() or super().canInsertFromMimeData(source)
     
     def insertFromMimeData(self, source):
+        # 从文件管理器拖入或复制的文件按原文件导入，已压缩的图片不需要重新编码
+        files = _local_files(source)
+        if files:
+            self.files_dropped.emit(files)
+            return
         if source.hasImage():
             image = source.imageData()
             if not image.isNull():
@@ -134,16 +406,73 @@ class FeedbackTextEdit(QTextEdit):
                 return
         super().insertFromMimeData(source)
 
+def _local_files(source) -> List[str]:
+    return [url.toLocalFile() for url in source.urls() if url.isLocalFile()] if source.hasUrls() else []
+
+def _combine_feedback(selected_options: List[str], feedback_text: str) -> str:
+    # 合并选中的选项和反馈文本
+    final_feedback_parts = []
+    
+    # 添加选中的选项
+    if selected_options:
+        final_feedback_parts.append("; ".join(selected_options))
+    
+    # 添加用户的文本反馈
+    if feedback_text:
+        final_feedback_parts.append(feedback_text)
+        
+    # 如果两部分都存在，则用换行符连接
+    return "\n\n".join(final_feedback_parts)
+
+class QuestionState:
+    """批量提问中一个问题的内容和已输入的回答，切换问题时保存和恢复"""
+    __slots__ = ("prompt", "options", "checked", "text", "image_paths", "file_paths")
+
+    def __init__(self, prompt: str, options: Optional[List[str]] = None):
+        self.prompt = prompt
+        self.options = options or []
+        self.checked: Optional[List[bool]] = None
+        self.text = ""
+        self.image_paths: List[str] = []
+        self.file_paths: List[str] = []
+
+    def answer(self) -> BatchAnswer:
+        selected_options = [option for option, checked in zip(self.options, self.checked or []) if checked]
+        return BatchAnswer(
+            interactive_feedback=_combine_feedback(selected_options, self.text.strip()),
+            image_paths=list(self.image_paths),
+            file_paths=list(self.file_paths),
+            selected_options=selected_options,
+        )
+
 class FeedbackUI(QMainWindow):
-    def __init__(self, prompt: str, predefined_options: Optional[List[str]] = None):
+    finished = Signal(dict)  # 窗口关闭时发送反馈结果
+
+    def __init__(self, prompt: str, predefined_options: Optional[List[str]] = None, pending_count: int = 0,
+                 previous_answer: Optional[dict] = None, client: str = "", questions: Optional[List[dict]] = None):
         super().__init__()
         self.prompt = prompt
         self.predefined_options = predefined_options or []
+        self.pending_count = pending_count  # 排队等待显示的其他反馈请求数
+        self.previous_answer = previous_answer  # 有效期内相同问题的上次回答，可一键复用
+        self.client = client  # 提问的客户端，多个客户端共用服务端时显示在标题中
         self.uploaded_images = []  # 存储上传图片的路径
+        self.uploaded_files = []  # 附加的非图片文件的路径
+        self._pending_encodes = {}  # 后台保存中的粘贴图片和导入中的文件：任务编号 -> ImageLabel
+        self._encode_tokens = itertools.count()
+        self._submit_requested = False  # 提交时仍有图片在保存，保存完成后自动提交
+        # 批量提问时的各个问题，单个问题时为空列表
+        self.questions: List[QuestionState] = []
+        self.current_question = 0
+        self._switch_requested: Optional[int] = None  # 切换问题时仍有图片在保存，保存完成后再切换
 
         self.feedback_result = None
+        self.shown_at = None
+        self.painted_at = None
+        # 请求带有segment_prefix时保存的图片另外写入共享内存段，窗口关闭时交给服务端
+        self.shared_images: Optional[SharedImages] = None
         
-        self.setWindowTitle("交互式反馈")
+        self._update_window_title()
         script_dir = os.path.dirname(os.path.abspath(__file__))
         
         # 尝试多个可能的图标位置
@@ -159,11 +488,6 @@ class FeedbackUI(QMainWindow):
                 
         self.setWindowFlags(self.windowFlags() | Qt.WindowStaysOnTopHint)
         
-        # 确保images目录存在
-        self.images_dir = os.path.join(script_dir, "images")
-        if not os.path.exists(self.images_dir):
-            os.makedirs(self.images_dir)
-        
         self.settings = QSettings("InteractiveFeedbackMCP", "InteractiveFeedbackMCP")
         
         # 加载主窗口的一般UI设置（几何形状、状态）
@@ -185,24 +509,26 @@ class FeedbackUI(QMainWindow):
         self.is_dark_mode = self.settings.value("isDarkMode", "true") == "true"
         self.settings.endGroup() # 结束 "MainWindow_General" 组
 
-        # 创建主题图标
-        self._create_theme_icons()
+        # 主题切换按钮使用文本图标（日/月），无需预先绘制图片
+        self.moon_text = "🌙"
+        self.sun_text = "☀️"
+
+        # 图片预览区域、图片存储和状态栏在第一次添加图片时才创建
+        self.images_area = None
+        self._image_store = None
+
+        _mark_startup("create_ui_start")
         self._create_ui()
+        self._set_questions(questions)
         self._apply_theme()
+        _mark_startup("create_ui_end")
 
-    def _create_theme_icons(self):
-        """创建主题切换图标（日/月）"""
-        # 创建月亮图标（深色主题）
-        self.moon_icon = QPixmap(32, 32)
-        self.moon_icon.fill(Qt.transparent)
-        
-        # 创建太阳图标（浅色主题）
-        self.sun_icon = QPixmap(32, 32)
-        self.sun_icon.fill(Qt.transparent)
-        
-        # 使用文本作为临时图标
-        self.moon_text = "🌙"
-        self.sun_text = "☀️"
+    @property
+    def image_store(self) -> ImageStore:
+        """粘贴的图片按内容哈希保存到图片存储中，相同的截图只保存一份"""
+        if self._image_store is None:
+            self._image_store = ImageStore.from_env()
+        return self._image_store
 
     def _create_ui(self):
         central_widget = QWidget()
@@ -213,13 +539,33 @@ class FeedbackUI(QMainWindow):
         self.feedback_group = QGroupBox("")
         feedback_layout = QVBoxLayout(self.feedback_group)
 
+        # 批量提问时的问题导航，单个问题时隐藏
+        self.question_nav = QWidget()
+        nav_layout = QHBoxLayout(self.question_nav)
+        nav_layout.setContentsMargins(0, 0, 0, 0)
+        self.prev_question_button = QPushButton("◀ 上一个问题")
+        self.prev_question_button.setToolTip("Ctrl+PgUp")
+        self.prev_question_button.clicked.connect(lambda: self._show_question(self.current_question - 1))
+        self.question_label = QLabel()
+        self.question_label.setAlignment(Qt.AlignCenter)
+        self.next_question_button = QPushButton("下一个问题 ▶")
+        self.next_question_button.setToolTip("Ctrl+PgDown，在文本框中也可按Ctrl+Enter")
+        self.next_question_button.clicked.connect(lambda: self._show_question(self.current_question + 1))
+        nav_layout.addWidget(self.prev_question_button)
+        nav_layout.addWidget(self.question_label, 1)
+        nav_layout.addWidget(self.next_question_button)
+        QShortcut(QKeySequence("Ctrl+PgUp"), self, lambda: self._show_question(self.current_question - 1))
+        QShortcut(QKeySequence("Ctrl+PgDown"), self, lambda: self._show_question(self.current_question + 1))
+        self.question_nav.setVisible(False)
+        feedback_layout.addWidget(self.question_nav)
+
         # 在反馈框内添加标题栏，包含描述和主题切换按钮
         title_bar = QHBoxLayout()
         
-        # 描述标签
-        self.description_label = QLabel(self.prompt)
-        self.description_label.setWordWrap(True)
-        title_bar.addWidget(self.description_label, 1)  # 1表示可伸展比例
+        # 提示文本，较长的提示在高度有限的视图中滚动，长代码块和章节默认折叠
+        self.prompt_view = PromptView()
+        self.prompt_view.set_prompt(self.prompt)
+        title_bar.addWidget(self.prompt_view, 1)  # 1表示可伸展比例
         
         # 创建主题切换图标按钮
         self.theme_button = QToolButton()
@@ -227,122 +573,333 @@ class FeedbackUI(QMainWindow):
         self.theme_button.setText(self.sun_text if self.is_dark_mode else self.moon_text)
         self.theme_button.setFixedSize(32, 32)
         self.theme_button.clicked.connect(self._toggle_theme)
-        title_bar.addWidget(self.theme_button)
+        title_bar.addWidget(self.theme_button, 0, Qt.AlignTop)
         
         feedback_layout.addLayout(title_bar)
 
-        # 添加预定义选项（如果有）
-        self.option_checkboxes = []
-        if self.predefined_options and len(self.predefined_options) > 0:
-            # 创建滚动区域
-            scroll_area = QScrollArea()
-            scroll_area.setWidgetResizable(True)
-            scroll_area.setFrameShape(QFrame.NoFrame)
-            
-            # 创建容器小部件
-            options_container = QWidget()
-            
-            # 使用网格布局
-            grid_layout = QGridLayout(options_container)
-            grid_layout.setContentsMargins(0, 10, 0, 10)
-            grid_layout.setSpacing(10)
-            
-            # 计算合适的列数
-            num_options = len(self.predefined_options)
-            cols = min(3, num_options)  # 最多3列
-            
-            # 添加选项到网格
-            for i, option in enumerate(self.predefined_options):
-                row = i // cols
-                col = i % cols
-                
-                checkbox = QCheckBox(option)
-                self.option_checkboxes.append(checkbox)
-                grid_layout.addWidget(checkbox, row, col)
-            
-            # 设置滚动区域的内容
-            scroll_area.setWidget(options_container)
-            
-            # 设置最大高度，超过此高度将显示滚动条
-            max_height = 200  # 最大高度200像素
-            scroll_area.setMaximumHeight(max_height)
-            
-            feedback_layout.addWidget(scroll_area)
-            
-            # 添加分隔符
-            separator = QFrame()
-            separator.setFrameShape(QFrame.HLine)
-            separator.setFrameShadow(QFrame.Sunken)
-            feedback_layout.addWidget(separator)
+        # 预定义选项区域，内容由_build_options填充，复用窗口时会重建
+        self.options_area = QWidget()
+        self.options_layout = QVBoxLayout(self.options_area)
+        self.options_layout.setContentsMargins(0, 0, 0, 0)
+        self.option_list = OptionList()
+        self.options_layout.addWidget(self.option_list)
+
+        # 添加分隔符
+        separator = QFrame()
+        separator.setFrameShape(QFrame.HLine)
+        separator.setFrameShadow(QFrame.Sunken)
+        self.options_layout.addWidget(separator)
+        self._build_options()
+        feedback_layout.addWidget(self.options_area)
 
         # 自由格式文本反馈
         self.feedback_text = FeedbackTextEdit()
         self.feedback_text.image_pasted.connect(self._handle_pasted_image)
+        self.feedback_text.files_dropped.connect(self._attach_files)
+        # 拖到窗口其他位置的文件同样添加到反馈中
+        self.setAcceptDrops(True)
         font_metrics = self.feedback_text.fontMetrics()
         row_height = font_metrics.height()
         # 计算5行文本的高度 + 一些边距填充
         padding = self.feedback_text.contentsMargins().top() + self.feedback_text.contentsMargins().bottom() + 5 # 5是额外的垂直填充
         self.feedback_text.setMinimumHeight(5 * row_height + padding)
 
-        self.feedback_text.setPlaceholderText("在此处输入您的反馈（按Ctrl+Enter提交）\n您可以直接粘贴截图(Ctrl+V)添加图片")
+        self.feedback_text.setPlaceholderText("在此处输入您的反馈（按Ctrl+Enter提交）\n您可以直接粘贴截图(Ctrl+V)，或拖入图片和日志文件")
         
-        # 图片预览区域
-        self.images_container = QWidget()
-        self.images_layout = QHBoxLayout(self.images_container)
-        self.images_layout.setAlignment(Qt.AlignLeft)
-        self.images_container.setVisible(False)  # 初始隐藏
-        
-        # 提交按钮
+        # 复用上次回答的按钮，只在相同问题有上次回答时显示
+        self.reuse_button = QPushButton()
+        self.reuse_button.clicked.connect(self._reuse_previous_answer)
+        self._update_reuse_button()
+
+        # 提交按钮，左侧是一次选择多个文件的附加按钮
         submit_button = QPushButton("发送反馈")
         submit_button.clicked.connect(self._submit_feedback)
+        attach_button = QPushButton("📎 附加文件…")
+        attach_button.setToolTip("选择图片或日志等文本文件，可多选；也可以直接拖入窗口")
+        attach_button.clicked.connect(self._choose_files)
+        submit_row = QHBoxLayout()
+        submit_row.addWidget(attach_button)
+        submit_row.addWidget(submit_button, 1)
 
         feedback_layout.addWidget(self.feedback_text)
-        feedback_layout.addWidget(self.images_container)
-        feedback_layout.addWidget(submit_button)
+        feedback_layout.addWidget(self.reuse_button)
+        feedback_layout.addLayout(submit_row)
+        self.feedback_layout = feedback_layout
+        self.submit_button = submit_button
 
-        # 设置feedback_group的最小高度
-        self.feedback_group.setMinimumHeight(self.description_label.sizeHint().height() + self.feedback_text.minimumHeight() + submit_button.sizeHint().height() + feedback_layout.spacing() * 2 + feedback_layout.contentsMargins().top() + feedback_layout.contentsMargins().bottom() + 10)
 
         # 添加部件
         layout.addWidget(self.feedback_group)
 
+    def _build_options(self):
+        """根据当前的预定义选项更新选项列表，列表只绘制可见的行，选项数量不影响创建耗时"""
+        self.option_list.set_options(self.predefined_options)
+        self.options_area.setVisible(bool(self.predefined_options))
+
     def _handle_pasted_image(self, image):
         """处理粘贴的图片"""
         if image.isNull():
             return
             
-        # 生成唯一文件名
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        unique_id = str(uuid.uuid4())[:8]
-        filename = f"pasted_image_{timestamp}_{unique_id}.png"
-        filepath = os.path.join(self.images_dir, filename)
-        
-        # 保存图片
-        if image.save(filepath):
-            self._add_image_to_preview(filepath)
-            self.uploaded_images.append(filepath)
-            QMessageBox.information(self, "图片已添加", "截图已成功添加到反馈中")
+        # 立即显示预览，PNG编码和写入在后台线程中进行，不阻塞输入
+        token = next(self._encode_tokens)
+        image_label = ImageLabel(None, image=image)
+        image_label.deleted.connect(lambda _path, token=token: self._discard_pending_image(token))
+        self._pending_encodes[token] = image_label
+        self._ensure_images_area()
+        self.images_layout.addWidget(image_label)
+        self._update_images_area()
+
+        task = ImageEncodeTask(token, image, self.image_store, self.shared_images)
+        task.signals.finished.connect(self._on_image_encoded)
+        QThreadPool.globalInstance().start(task)
+        self._show_encode_status()
+
+    def _choose_files(self):
+        self.settings.beginGroup("MainWindow_General")
+        directory = self.settings.value("attachDirectory", "")
+        paths, _ = QFileDialog.getOpenFileNames(
+            self, "附加文件", directory,
+            "图片和文本文件 (*.png *.jpg *.jpeg *.webp *.gif *.bmp *.txt *.log *.json *.md *.csv);;所有文件 (*)",
+        )
+        if paths:
+            self.settings.setValue("attachDirectory", os.path.dirname(paths[0]))
+        self.settings.endGroup()
+        self._attach_files(paths)
+
+    def dragEnterEvent(self, event):
+        if _local_files(event.mimeData()):
+            event.acceptProposedAction()
+
+    def dropEvent(self, event):
+        files = _local_files(event.mimeData())
+        if files:
+            event.acceptProposedAction()
+            self._attach_files(files)
+
+    def _attach_files(self, paths: List[str]):
+        """添加拖入或选择的文件：每个文件先显示占位符，在线程池中并行导入，完成后按原顺序显示"""
+        for path in paths:
+            if os.path.isdir(path):
+                self.statusBar().showMessage(f"不能附加文件夹: {os.path.basename(path)}", 5000)
+                continue
+            if os.path.abspath(path) in self.uploaded_files:
+                continue
+            token = next(self._encode_tokens)
+            placeholder = ImageLabel(None)
+            placeholder.deleted.connect(lambda _path, token=token: self._discard_pending_image(token))
+            self._pending_encodes[token] = placeholder
+            self._ensure_images_area()
+            self.images_layout.addWidget(placeholder)
+
+            task = FileImportTask(token, path, self.image_store, self.shared_images)
+            task.signals.finished.connect(self._on_file_imported)
+            QThreadPool.globalInstance().start(task)
+        self._update_images_area()
+        self._show_encode_status()
+
+    def _on_file_imported(self, token: int, kind: str, path: str, thumbnail: QImage):
+        if kind == "image":
+            self._on_image_encoded(token, path, thumbnail)
+            return
+        placeholder = self._pending_encodes.pop(token, None)
+        if placeholder is None:
+            # 占位符已被删除或窗口已载入新的请求
+            return
+        if not kind:
+            self.statusBar().showMessage(f"无法添加文件 {path}", 8000)
+        elif path in self.uploaded_files:
+            self.statusBar().showMessage("这个文件已经添加到反馈中", 3000)
+        else:
+            # 用文件标签替换占位符，保持添加时的顺序
+            file_label = FileLabel(path)
+            file_label.deleted.connect(self._remove_file)
+            self.images_layout.insertWidget(self.images_layout.indexOf(placeholder), file_label)
+            self.uploaded_files.append(path)
+            self._show_encode_status()
+        placeholder.deleteLater()
+        self._update_images_area()
+        self._submit_if_ready()
+
+    def _on_image_encoded(self, token: int, image_path: str, thumbnail: QImage):
+        image_label = self._pending_encodes.pop(token, None)
+        if image_label is None:
+            # 预览已被删除或窗口已载入新的请求
+            return
+        if not image_path:
+            image_label.deleteLater()
+            self.statusBar().showMessage("无法保存图片", 5000)
+        elif image_path in self.uploaded_images:
+            image_label.deleteLater()
+            self.statusBar().showMessage("这张截图已经添加到反馈中", 3000)
+        else:
+            image_label.set_saved(image_path, thumbnail)
+            image_label.deleted.connect(self._remove_image)
+            self.uploaded_images.append(image_path)
+            self._show_encode_status()
+        self._update_images_area()
+        self._submit_if_ready()
+
+    def _discard_pending_image(self, token: int):
+        if self._pending_encodes.pop(token, None) is not None:
+            self._update_images_area()
+            self._submit_if_ready()
+
+    def _show_encode_status(self):
+        if self._pending_encodes:
+            self.statusBar().showMessage(f"正在保存{len(self._pending_encodes)}个图片或文件…")
         else:
-            QMessageBox.warning(self, "错误", "无法保存图片")
+            self.statusBar().showMessage("已添加到反馈中", 3000)
+
+    def _submit_if_ready(self):
+        if self._pending_encodes:
+            return
+        if self._submit_requested:
+            self._submit_feedback()
+        elif self._switch_requested is not None:
+            index, self._switch_requested = self._switch_requested, None
+            self._show_question(index)
+
+    def _set_questions(self, questions: Optional[List[dict]]):
+        """设置批量提问的问题列表，当前的prompt和predefined_options是第一个问题"""
+        self.questions = [
+            QuestionState(question.get("prompt", ""), question.get("predefined_options") or None)
+            for question in questions or []
+        ]
+        self.current_question = 0
+        self._switch_requested = None
+        batch = bool(self.questions)
+        self.question_nav.setVisible(batch)
+        self.submit_button.setText(f"发送全部反馈（{len(self.questions)}个问题）" if batch else "发送反馈")
+        if batch:
+            # 批量提问不缓存回答
+            self.reuse_button.setVisible(False)
+            self._update_question_nav()
+        self._update_window_title()
+
+    def _update_question_nav(self):
+        index, count = self.current_question, len(self.questions)
+        answered = sum(
+            1 for state in self.questions if state.answer()["interactive_feedback"] or state.image_paths or state.file_paths
+        )
+        self.question_label.setText(f"问题 {index + 1} / {count}（已回答{answered}个）")
+        self.prev_question_button.setEnabled(index > 0)
+        self.next_question_button.setEnabled(index < count - 1)
+
+    def _save_question(self):
+        """把当前问题的输入保存到QuestionState"""
+        state = self.questions[self.current_question]
+        state.text = self.feedback_text.toPlainText()
+        state.checked = self.option_list.model.checked_states()
+        state.image_paths = self._ordered_image_paths()
+        state.file_paths = self._ordered_file_paths()
+
+    def _show_question(self, index: int):
+        """保存当前问题的输入，切换到第index个问题并恢复它的输入"""
+        if not self.questions or not 0 <= index < len(self.questions) or index == self.current_question:
+            return
+        if self._pending_encodes:
+            # 正在保存的截图和文件属于当前问题，保存完成后再切换
+            self._switch_requested = index
+            self.statusBar().showMessage("正在保存图片或文件，完成后将切换问题…")
+            return
+        self._save_question()
+        self._clear_images()
+        self.current_question = index
+        state = self.questions[index]
+        self.prompt = state.prompt
+        self.predefined_options = state.options
+        self.prompt_view.set_prompt(state.prompt)
+        self.option_list.set_options(state.options, state.checked)
+        self.options_area.setVisible(bool(state.options))
+        self.feedback_text.setPlainText(state.text)
+        self.feedback_text.moveCursor(QTextCursor.End)
+        for image_path in state.image_paths:
+            self.uploaded_images.append(image_path)
+            self._add_image_to_preview(image_path)
+        for file_path in state.file_paths:
+            self.uploaded_files.append(file_path)
+            self._add_file_to_preview(file_path)
+        self._update_question_nav()
+        self.feedback_text.setFocus()
+
+    def _advance_or_submit(self):
+        """Ctrl+Enter：批量提问时先进入下一个问题，最后一个问题时提交全部回答"""
+        if self.questions and self.current_question < len(self.questions) - 1:
+            self._show_question(self.current_question + 1)
+        else:
+            self._submit_feedback()
 
     def _add_image_to_preview(self, image_path):
         """将图片添加到预览区域"""
-        image_label = ImageLabel(image_path)
+        thumbnail_cache_path = self.image_store.thumbnail_path(
+            image_path, THUMBNAIL_SIZE.width(), THUMBNAIL_SIZE.height()
+        )
+        image_label = ImageLabel(image_path, thumbnail_cache_path=thumbnail_cache_path)
         image_label.deleted.connect(self._remove_image)
+        self._ensure_images_area()
         self.images_layout.addWidget(image_label)
-        
-        # 显示图片容器
-        if not self.images_container.isVisible():
-            self.images_container.setVisible(True)
+        self._update_images_area()
+
+    def _add_file_to_preview(self, file_path: str):
+        file_label = FileLabel(file_path)
+        file_label.deleted.connect(self._remove_file)
+        self._ensure_images_area()
+        self.images_layout.addWidget(file_label)
+        self._update_images_area()
+
+    def _ensure_images_area(self):
+        """创建图片预览区域，放在文本框下方"""
+        if self.images_area is not None:
+            return
+        self.images_container = QWidget()
+        self.images_layout = QHBoxLayout(self.images_container)
+        self.images_layout.setAlignment(Qt.AlignLeft)
+        # 图片较多时横向滚动，而不是撑宽窗口
+        self.images_area = QScrollArea()
+        self.images_area.setWidgetResizable(True)
+        self.images_area.setFrameShape(QFrame.NoFrame)
+        self.images_area.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.images_area.setFixedHeight(THUMBNAIL_SIZE.height() + 40)
+        self.images_area.setWidget(self.images_container)
+        self.feedback_layout.insertWidget(self.feedback_layout.indexOf(self.feedback_text) + 1, self.images_area)
+
+    def _update_images_area(self):
+        # 有图片（包括保存中的图片）时显示预览区域，否则隐藏
+        if self.images_area is not None:
+            self.images_area.setVisible(bool(self.uploaded_images or self.uploaded_files or self._pending_encodes))
 
     def _remove_image(self, image_path):
         """从上传列表中移除图片"""
         if image_path in self.uploaded_images:
             self.uploaded_images.remove(image_path)
-            
-            # 如果没有图片了，隐藏容器
-            if not self.uploaded_images:
-                self.images_container.setVisible(False)
+        self._update_images_area()
+
+    def _remove_file(self, file_path):
+        if file_path in self.uploaded_files:
+            self.uploaded_files.remove(file_path)
+        self._update_images_area()
+
+    def _ordered_file_paths(self) -> List[str]:
+        """按预览区域中的显示顺序返回附加的非图片文件路径"""
+        if self.images_area is None:
+            return []
+        widgets = (self.images_layout.itemAt(i).widget() for i in range(self.images_layout.count()))
+        return [
+            widget.file_path for widget in widgets
+            if isinstance(widget, FileLabel) and widget.file_path in self.uploaded_files
+        ]
+
+    def _ordered_image_paths(self) -> List[str]:
+        """按预览区域中的显示顺序返回已保存的图片路径"""
+        paths = []
+        if self.images_area is None:
+            return paths
+        for i in range(self.images_layout.count()):
+            widget = self.images_layout.itemAt(i).widget()
+            if isinstance(widget, ImageLabel) and widget.image_path in self.uploaded_images:
+                paths.append(widget.image_path)
+        return paths
 
     def _toggle_theme(self):
         self.is_dark_mode = not self.is_dark_mode
@@ -363,35 +920,187 @@ class FeedbackUI(QMainWindow):
             app.setPalette(get_light_mode_palette(app))
 
     def _submit_feedback(self):
+        if self._pending_encodes:
+            # 等待后台保存的截图和导入的文件完成后再提交
+            self._submit_requested = True
+            self.statusBar().showMessage("正在保存图片或文件，完成后将自动发送…")
+            return
+
+        _mark_startup("submitted")
+        self.feedback_result = self._collect_feedback()
+        self.close()
+
+    def _collect_feedback(self) -> FeedbackResult:
+        """按当前输入的内容生成反馈结果"""
+        if self.questions:
+            # 批量提问：每个问题的回答在answers中，顶层字段为空
+            self._save_question()
+            return FeedbackResult(
+                interactive_feedback="",
+                image_paths=[],
+                shown_at=self.shown_at,
+                painted_at=self.painted_at,
+                answers=[state.answer() for state in self.questions],
+            )
+
         feedback_text = self.feedback_text.toPlainText().strip()
-        selected_options = []
-        
-        # 获取选中的预定义选项（如果有）
-        if self.option_checkboxes:
-            for i, checkbox in enumerate(self.option_checkboxes):
-                if checkbox.isChecked():
-                    selected_options.append(self.predefined_options[i])
-        
-        # 合并选中的选项和反馈文本
-        final_feedback_parts = []
-        
-        # 添加选中的选项
-        if selected_options:
-            final_feedback_parts.append("; ".join(selected_options))
-        
-        # 添加用户的文本反馈
-        if feedback_text:
-            final_feedback_parts.append(feedback_text)
-            
-        # 如果两部分都存在，则用换行符连接
-        final_feedback = "\n\n".join(final_feedback_parts)
-            
+        # 获取选中的预定义选项（如果有），包括被筛选隐藏的选项
+        selected_options = self.option_list.selected_options()
+
+        return FeedbackResult(
+            interactive_feedback=_combine_feedback(selected_options, feedback_text),
+            image_paths=self._ordered_image_paths(),
+            file_paths=self._ordered_file_paths(),
+            selected_options=selected_options,
+            shown_at=self.shown_at,
+            painted_at=self.painted_at,
+        )
+
+    def apply_update(self, update: dict):
+        """服务端推送的update消息：替换或追加提示文本、追加预定义选项，用户已输入的回答和已勾选的选项保持不变"""
+        index = int(update.get("question", 0))
+        if self.questions:
+            if not 0 <= index < len(self.questions):
+                return
+            state = self.questions[index]
+            prompt, options = state.prompt, state.options
+        elif index == 0:
+            prompt, options = self.prompt, self.predefined_options
+        else:
+            return
+        prompt = updated_prompt(prompt, update)
+        added = new_options(options, update.get("options") or [])
+        options = options + added
+        if self.questions:
+            state.prompt, state.options = prompt, options
+            if state.checked is not None:
+                state.checked = state.checked + [False] * len(added)
+
+        if not self.questions or index == self.current_question:
+            if prompt != self.prompt:
+                self.prompt_view.update_prompt(prompt)
+            self.prompt = prompt
+            self.predefined_options = options
+            if added:
+                self.option_list.add_options(added)
+                self.options_area.setVisible(True)
+            self.statusBar().showMessage("提示已更新", 5000)
+        else:
+            self.statusBar().showMessage(f"问题{index + 1}的提示已更新", 5000)
+        # 窗口不在前台时在任务栏提示用户
+        QApplication.alert(self)
+
+    def cancel(self):
+        """服务端等待超时：不再等待保存中的截图，把已输入的草稿作为结果返回并关闭窗口"""
+        if not self.isVisible():
+            return
+        self._pending_encodes = {}
+        self._submit_requested = False
+        self.feedback_result = FeedbackResult(**self._collect_feedback(), cancelled=True)
+        self.close()
+
+    def _update_reuse_button(self):
+        if not self.previous_answer:
+            self.reuse_button.setVisible(False)
+            return
+        answer = self.previous_answer.get("interactive_feedback", "")
+        minutes = int((time.time() - self.previous_answer.get("answered_at", time.time())) // 60)
+        summary = " ".join(answer.split())
+        if len(summary) > 40:
+            summary = summary[:40] + "…"
+        image_count = len(self.previous_answer.get("image_paths") or [])
+        if image_count:
+            summary += f"（{image_count}张图片）"
+        file_count = len(self.previous_answer.get("file_paths") or [])
+        if file_count:
+            summary += f"（{file_count}个文件）"
+        when = f"{minutes}分钟前" if minutes > 0 else "刚才"
+        self.reuse_button.setText(f"使用上次的回答（{when}）：{summary}")
+        self.reuse_button.setToolTip(answer)
+        self.reuse_button.setVisible(True)
+
+    def _reuse_previous_answer(self):
+        """直接提交上次对相同问题的回答，已被清理的图片不再附带"""
         self.feedback_result = FeedbackResult(
-            interactive_feedback=final_feedback,
-            image_paths=self.uploaded_images.copy()
+            interactive_feedback=self.previous_answer.get("interactive_feedback", ""),
+            image_paths=[path for path in self.previous_answer.get("image_paths") or [] if os.path.exists(path)],
+            file_paths=[path for path in self.previous_answer.get("file_paths") or [] if os.path.exists(path)],
+            shown_at=self.shown_at
         )
         self.close()
 
+    def _update_window_title(self):
+        title = f"交互式反馈 - {self.client}" if self.client else "交互式反馈"
+        if self.questions:
+            title += f"（共{len(self.questions)}个问题）"
+        if self.pending_count > 0:
+            title += f"（还有{self.pending_count}个问题等待回答）"
+        self.setWindowTitle(title)
+
+    def load_request(self, prompt: str, predefined_options: Optional[List[str]] = None, pending_count: int = 0,
+                     previous_answer: Optional[dict] = None, client: str = "", questions: Optional[List[dict]] = None,
+                     segment_prefix: str = ""):
+        """载入新的反馈请求，用于复用已创建好的窗口"""
+        self.shared_images = SharedImages(segment_prefix) if segment_prefix else None
+        self.prompt = prompt
+        self.predefined_options = predefined_options or []
+        self.pending_count = pending_count
+        self.previous_answer = previous_answer
+        self.client = client
+        self._update_reuse_button()
+        self._update_window_title()
+        self.feedback_result = None
+        self.shown_at = None
+        self.painted_at = None
+
+        self.prompt_view.set_prompt(prompt)
+        self._build_options()
+        self.feedback_text.clear()
+
+        # 清空上一次请求留下的图片预览
+        self._pending_encodes = {}
+        self._submit_requested = False
+        self._clear_images()
+        self._set_questions(questions)
+
+    def _clear_images(self):
+        """移除所有图片和文件预览，用于载入新的请求或切换问题"""
+        self.uploaded_images = []
+        self.uploaded_files = []
+        if self.images_area is not None:
+            self.statusBar().clearMessage()
+            while self.images_layout.count():
+                item = self.images_layout.takeAt(0)
+                if item.widget():
+                    item.widget().deleteLater()
+            self.images_area.setVisible(False)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        if self.shown_at is None:
+            self.shown_at = time.time()
+            _mark_startup("window_shown")
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if self.painted_at is None:
+            self.painted_at = time.time()
+            self._schedule_auto_submit()
+        _mark_startup("first_paint")
+
+    def _schedule_auto_submit(self):
+        """基准测试与无界面环境下使用：窗口首次绘制后自动提交，启动追踪中才有首次绘制阶段"""
+        auto_submit_ms = os.environ.get("INTERACTIVE_FEEDBACK_AUTO_SUBMIT_MS")
+        if not auto_submit_ms:
+            return
+        # 基准测试可以指定随反馈一起提交的图片（以os.pathsep分隔的路径）
+        auto_submit_images = os.environ.get("INTERACTIVE_FEEDBACK_AUTO_SUBMIT_IMAGES")
+        for image_path in auto_submit_images.split(os.pathsep) if auto_submit_images else []:
+            if image_path not in self.uploaded_images:
+                self.uploaded_images.append(image_path)
+                self._add_image_to_preview(image_path)
+        QTimer.singleShot(int(auto_submit_ms), self._submit_feedback)
+
     def closeEvent(self, event):
         # 保存主窗口的一般UI设置（几何形状、状态）
         self.settings.beginGroup("MainWindow_General")
@@ -400,27 +1109,75 @@ class FeedbackUI(QMainWindow):
         self.settings.endGroup()
 
         super().closeEvent(event)
+        if self.shared_images is not None:
+            # 结果引用的图片所在的共享内存段交给服务端，其余的段删除
+            self.feedback_result = self.shared_images.hand_off(self.result())
+            self.shared_images = None
+        self.finished.emit(self.result())
 
-    def run(self) -> FeedbackResult:
-        self.show()
-        QApplication.instance().exec()
-
+    def result(self) -> FeedbackResult:
         if not self.feedback_result:
             return FeedbackResult(
                 interactive_feedback="",
-                image_paths=[]
+                image_paths=[],
+                shown_at=self.shown_at,
+                painted_at=self.painted_at,
             )
 
         return self.feedback_result
 
-def feedback_ui(prompt: str, predefined_options: Optional[List[str]] = None, output_file: Optional[str] = None) -> Optional[FeedbackResult]:
+    def run(self) -> FeedbackResult:
+        self.show()
+        QApplication.instance().exec()
+        return self.result()
+
+class ControlReader(QObject):
+    """在后台线程中读取request之后的控制消息；信号在GUI线程中处理"""
+    cancel_requested = Signal()
+    update_received = Signal(dict)
+    closed = Signal()  # 输入流结束：服务端已退出或放弃等待
+
+    def __init__(self, stream: BinaryIO, parent=None):
+        super().__init__(parent)
+        self.stream = stream
+
+    def start(self):
+        threading.Thread(target=self._run, name="feedback-control", daemon=True).start()
+
+    def _run(self):
+        while True:
+            try:
+                message = read_frame(self.stream)
+            except (ProtocolError, OSError, ValueError):
+                message = None
+            if message is None:
+                self.closed.emit()
+                return
+            if message.get("type") == "cancel":
+                self.cancel_requested.emit()
+            elif message.get("type") == "update":
+                self.update_received.emit(message)
+
+def feedback_ui(prompt: str, predefined_options: Optional[List[str]] = None, output_file: Optional[str] = None, pending_count: int = 0, trace: bool = False, previous_answer: Optional[dict] = None, control_stream: Optional[BinaryIO] = None, client: str = "", questions: Optional[List[dict]] = None, segment_prefix: str = "") -> Optional[FeedbackResult]:
     app = QApplication.instance() or QApplication()
+    _mark_startup("qapplication_created")
     
     # 主题将在FeedbackUI构造函数中应用
     app.setStyle("Fusion")
     
-    ui = FeedbackUI(prompt, predefined_options)
+    ui = FeedbackUI(prompt, predefined_options, pending_count, previous_answer, client, questions)
+    if segment_prefix:
+        ui.shared_images = SharedImages(segment_prefix)
+    if control_stream is not None:
+        control = ControlReader(control_stream, ui)
+        control.cancel_requested.connect(ui.cancel)
+        control.update_received.connect(ui.apply_update)
+        # 服务端退出后窗口不再有人等待，直接关闭，避免遗留置顶窗口
+        control.closed.connect(ui.close)
+        control.start()
     result = ui.run()
+    if trace:
+        result = FeedbackResult(**result, startup_trace=startup_trace())
 
     if output_file and result:
         # 确保目录存在
@@ -432,18 +1189,50 @@ def feedback_ui(prompt: str, predefined_options: Optional[List[str]] = None, out
 
     return result
 
+def serve_stdio():
+    """从stdin读取一个请求帧，显示反馈窗口，并把结果帧写回stdout（供server.py使用）"""
+    stdin = open_stdin()
+    request = expect_message(read_frame(stdin), "request")
+    result = feedback_ui(
+        request.get("prompt", ""),
+        request.get("predefined_options") or None,
+        pending_count=int(request.get("pending", 0)),
+        trace=bool(request.get("startup_trace")),
+        previous_answer=request.get("previous_answer"),
+        control_stream=stdin,
+        client=request.get("client") or "",
+        questions=request.get("questions"),
+        segment_prefix=request.get("segment_prefix") or "",
+    )
+    try:
+        sys.stdout.buffer.write(encode_frame(make_message("result", result=result)))
+        sys.stdout.buffer.flush()
+    except OSError:
+        # 服务端已退出，结果无处可写
+        pass
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="运行反馈UI")
     parser.add_argument("--prompt", default="我已实现您请求的更改。", help="向用户显示的提示")
     parser.add_argument("--predefined-options", default="", help="预定义选项的管道分隔列表(|||)")
     parser.add_argument("--output-file", help="保存反馈结果为JSON的路径")
+    parser.add_argument("--stdio", action="store_true", help="通过stdin/stdout的长度前缀JSON帧接收请求并返回结果")
+    parser.add_argument("--startup-trace", action="store_true", help="在结果中附带各启动阶段的耗时")
     args = parser.parse_args()
 
+    if args.stdio:
+        serve_stdio()
+        sys.exit(0)
+
     predefined_options = [opt for opt in args.predefined_options.split("|||") if opt] if args.predefined_options else None
     
-    result = feedback_ui(args.prompt, predefined_options, args.output_file)
+    result = feedback_ui(args.prompt, predefined_options, args.output_file, trace=args.startup_trace)
     if result:
         print(f"\n收到反馈：\n{result['interactive_feedback']}")
         if result['image_paths']:
             print(f"\n附带图片：\n{', '.join(result['image_paths'])}")
+        if result.get('file_paths'):
+            print(f"\n附带文件：\n{', '.join(result['file_paths'])}")
+        if result.get('startup_trace'):
+            print(f"\n启动耗时(ms)：\n{json.dumps(result['startup_trace'], ensure_ascii=False)}")
     sys.exit(0)
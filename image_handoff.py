@@ -0,0 +1,172 @@
+# Interactive Feedback MCP 界面进程到服务端的图片交接
+# 界面把粘贴和导入的图片编码后写入图片存储，服务端返回结果时再读出整个文件、处理并转换为base64，
+# 大截图在服务端要多占一份完整的副本。INTERACTIVE_FEEDBACK_IMAGE_HANDOFF选择服务端读取图片的方式：
+#   file  读取整个文件（默认）
+#   mmap  只读映射图片存储中的文件，直接从映射的页面处理和编码
+#   shm   界面在编码图片的工作线程中另外把字节写入共享内存段(multiprocessing.shared_memory)，
+#         结果中附带每张图片的段名，服务端直接从段中处理和编码，用完后删除该段
+# 图片存储中的文件仍然会写入：历史记录、回答缓存、resource模式和缩略图都按路径引用图片。
+#
+# 共享内存段名以ifb_<服务端进程号>_<调用序号>_开头。界面把结果中引用的段交给服务端，其余的段在窗口关闭时删除；
+# 服务端处理完结果后删除这次调用遗留的段，启动时删除服务端已不存在的段（只有Linux可以列出/dev/shm）。
+# Windows上的共享内存段在最后一个句柄关闭时即被回收，界面进程退出后服务端无法再打开，shm退回为mmap。
+import os
+import sys
+import mmap
+import itertools
+import threading
+from contextlib import contextmanager
+from typing import Dict
+
+import psutil
+
+HANDOFF_MODES = ("file", "mmap", "shm")
+
+SEGMENT_PREFIX = "ifb_"
+# 可以列出共享内存段的目录
+_SHM_DIR = "/dev/shm"
+
+_call_seq = itertools.count(1)
+
+def handoff_mode() -> str:
+    mode = os.environ.get("INTERACTIVE_FEEDBACK_IMAGE_HANDOFF", "file").lower()
+    if mode not in HANDOFF_MODES:
+        raise ValueError(f"不支持的图片交接方式: {mode}")
+    if mode == "shm" and sys.platform == "win32":
+        return "mmap"
+    return mode
+
+def new_segment_prefix() -> str:
+    """一次调用的共享内存段名前缀；macOS上段名不能超过31个字符"""
+    return f"{SEGMENT_PREFIX}{os.getpid()}_{next(_call_seq)}_"
+
+def _unlink(name: str) -> bool:
+    from multiprocessing import shared_memory
+
+    try:
+        segment = shared_memory.SharedMemory(name=name)
+    except (FileNotFoundError, OSError):
+        return False
+    segment.close()
+    segment.unlink()
+    return True
+
+class SharedImages:
+    """界面进程中一个窗口的共享内存段，图片路径 -> 段。publish在工作线程中调用，hand_off和release在主线程中调用"""
+
+    def __init__(self, prefix: str):
+        self.prefix = prefix
+        self._segments: Dict[str, object] = {}
+        self._seq = itertools.count(1)
+        self._lock = threading.Lock()
+        self._closed = False  # 已交给服务端，之后才完成的图片不再写入共享内存
+
+    def publish(self, path: str, data: bytes) -> None:
+        """把一张已写入图片存储的图片复制到新的共享内存段；失败时服务端改为读取文件"""
+        from multiprocessing import shared_memory
+
+        if not data or self._closed:
+            return
+        try:
+            segment = shared_memory.SharedMemory(name=f"{self.prefix}{next(self._seq)}", create=True, size=len(data))
+        except OSError:
+            return
+        segment.buf[:len(data)] = data
+        with self._lock:
+            # 相同内容的图片在图片存储中是同一个路径，只保留一个段
+            if not self._closed and path not in self._segments:
+                self._segments[path] = (segment, len(data))
+                return
+        segment.close()
+        segment.unlink()
+
+    def hand_off(self, result: dict) -> dict:
+        """在结果中附带其引用的图片的段名和大小{"path": {"name", "size"}}，这些段交由服务端删除，其余的段立即删除"""
+        from multiprocessing import resource_tracker
+
+        paths = set(result.get("image_paths") or [])
+        for answer in result.get("answers") or []:
+            paths.update(answer.get("image_paths") or [])
+        handed = {}
+        with self._lock:
+            segments, self._segments = self._segments, {}
+            self._closed = True
+        for path, (segment, size) in segments.items():
+            if path in paths:
+                handed[path] = {"name": segment.name, "size": size}
+                # 不再由本进程的resource_tracker在退出时删除，界面进程退出后段仍然保留到服务端读取
+                resource_tracker.unregister(segment._name, "shared_memory")
+                segment.close()
+            else:
+                segment.close()
+                segment.unlink()
+        if handed:
+            result["image_segments"] = handed
+        return result
+
+    def release(self) -> None:
+        """删除所有没有交给服务端的段"""
+        self.hand_off({})
+
+@contextmanager
+def open_image(path: str, segments: Dict[str, dict], mode: str):
+    """服务端读取一张图片：有共享内存段时返回段中的缓冲区，用完后删除该段；mmap和shm模式下映射文件；
+    否则读取整个文件。返回的缓冲区只在with块内有效"""
+    segment_info = segments.pop(path, None)
+    if segment_info is not None:
+        from multiprocessing import shared_memory
+
+        try:
+            segment = shared_memory.SharedMemory(name=segment_info["name"])
+        except (FileNotFoundError, OSError):
+            segment = None
+        if segment is not None:
+            view = segment.buf[:segment_info["size"]]
+            try:
+                yield view
+            finally:
+                view.release()
+                segment.close()
+                segment.unlink()
+            return
+    if mode in ("mmap", "shm"):
+        with open(path, "rb") as f:
+            try:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # 空文件无法映射
+                mapped = None
+            if mapped is not None:
+                try:
+                    yield mapped
+                finally:
+                    mapped.close()
+                return
+    with open(path, "rb") as f:
+        yield f.read()
+
+def discard_segments(segments: Dict[str, dict]) -> None:
+    """删除结果中没有被读取的段，例如resource模式下的图片或已被删除的图片"""
+    for segment_info in segments.values():
+        _unlink(segment_info["name"])
+    segments.clear()
+
+def sweep_segments(prefix: str = SEGMENT_PREFIX) -> int:
+    """删除名称以prefix开头的段；使用默认前缀时只删除服务端已不存在的段。返回删除的段数"""
+    try:
+        names = [name for name in os.listdir(_SHM_DIR) if name.startswith(prefix)]
+    except OSError:
+        return 0
+    removed = 0
+    for name in names:
+        if prefix == SEGMENT_PREFIX and _server_alive(name):
+            continue
+        removed += _unlink(name)
+    return removed
+
+def _server_alive(name: str) -> bool:
+    try:
+        server_pid = int(name[len(SEGMENT_PREFIX):].split("_", 1)[0])
+    except ValueError:
+        return False
+    return psutil.pid_exists(server_pid)
@@ -0,0 +1,186 @@
+# Interactive Feedback MCP 图片处理
+# 在把图片返回给AI之前按配置缩小尺寸、重新压缩，控制单张图片和整个响应的大小。
+# Qt的图片编解码模块在首次处理图片时才导入，纯文本反馈不需要加载Qt。
+# 输入可以是bytes，也可以是memoryview、mmap等缓冲区（共享内存段、映射的文件），Qt直接从缓冲区读取，不复制整张图片。
+import os
+import mmap
+from dataclasses import dataclass
+from typing import Optional, Union
+
+SUPPORTED_FORMATS = ("png", "jpeg", "webp")
+
+# 可以作为图片输入的缓冲区类型
+Buffer = Union[bytes, bytearray, memoryview, mmap.mmap]
+
+# 逐步降低JPEG/WebP质量时的下限，再低就改为缩小尺寸
+MIN_QUALITY = 40
+# 缩小到最长边低于此值仍超出预算时放弃该图片
+MIN_DIMENSION = 64
+
+@dataclass
+class ImagePipelineConfig:
+    max_dimension: int = 1920  # 最长边像素上限
+    max_image_bytes: int = 1024 * 1024  # 单张图片编码后的字节上限
+    max_response_bytes: int = 4 * 1024 * 1024  # 一次响应中所有图片编码后的字节上限
+    format: str = "png"  # 输出格式：png、jpeg或webp
+    quality: int = 85  # JPEG/WebP的初始质量
+
+    @classmethod
+    def from_env(cls) -> "ImagePipelineConfig":
+        """从INTERACTIVE_FEEDBACK_IMAGE_*环境变量读取配置，未设置的项使用默认值"""
+        defaults = cls()
+        image_format = os.environ.get("INTERACTIVE_FEEDBACK_IMAGE_FORMAT", defaults.format).lower()
+        if image_format == "jpg":
+            image_format = "jpeg"
+        if image_format not in SUPPORTED_FORMATS:
+            raise ValueError(f"不支持的图片格式: {image_format}")
+        return cls(
+            max_dimension=int(os.environ.get("INTERACTIVE_FEEDBACK_IMAGE_MAX_DIM", defaults.max_dimension)),
+            max_image_bytes=int(os.environ.get("INTERACTIVE_FEEDBACK_IMAGE_MAX_BYTES", defaults.max_image_bytes)),
+            max_response_bytes=int(os.environ.get("INTERACTIVE_FEEDBACK_RESPONSE_MAX_BYTES", defaults.max_response_bytes)),
+            format=image_format,
+            quality=int(os.environ.get("INTERACTIVE_FEEDBACK_IMAGE_QUALITY", defaults.quality)),
+        )
+
+@dataclass
+class EncodedImage:
+    data: Buffer  # 重新编码时是bytes，原样透传时是传入的缓冲区
+    format: str
+    width: int
+    height: int
+    original_size: int
+    original_width: int
+    original_height: int
+
+    @property
+    def encoded_size(self) -> int:
+        return len(self.data)
+
+    @property
+    def mime_type(self) -> str:
+        return f"image/{self.format}"
+
+def detect_format(data: Buffer) -> Optional[str]:
+    """根据文件头识别图片格式，只识别可以原样透传的格式"""
+    data = bytes(data[:12])
+    if data.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if data.startswith(b"\xff\xd8\xff"):
+        return "jpeg"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+def _encode(image, image_format: str, quality: int) -> bytes:
+    from PySide6.QtCore import QBuffer, QIODevice
+
+    buffer = QBuffer()
+    buffer.open(QIODevice.WriteOnly)
+    # PNG是无损格式，使用默认压缩级别；质量参数只作用于JPEG/WebP
+    if not image.save(buffer, image_format.upper(), quality if image_format != "png" else -1):
+        raise ValueError(f"无法编码为{image_format}")
+    return bytes(buffer.data())
+
+_BufferDevice = None
+
+def _open_buffer(data: Buffer):
+    """以只读方式打开一个读取data的QIODevice。QBuffer需要先把数据复制到QByteArray，
+    这里按Qt请求的范围从缓冲区切片，整张图片不会被复制"""
+    global _BufferDevice
+    if _BufferDevice is None:
+        from PySide6.QtCore import QIODevice
+
+        class BufferDevice(QIODevice):
+            def __init__(self, data):
+                super().__init__()
+                self._data = memoryview(data).cast("B")
+
+            def isSequential(self):
+                return False
+
+            def size(self):
+                return len(self._data)
+
+            def readData(self, maxlen):
+                position = self.pos()
+                return bytes(self._data[position:position + maxlen])
+
+            def writeData(self, data):
+                return -1
+
+            def close(self):
+                super().close()
+                # 释放对缓冲区的引用，共享内存段和mmap只有在没有引用时才能关闭
+                self._data.release()
+
+        _BufferDevice = BufferDevice
+    device = _BufferDevice(data)
+    device.open(_BufferDevice.ReadOnly)
+    return device
+
+def _flatten_alpha(image):
+    """JPEG不支持透明通道，把透明区域合成到白色背景上"""
+    from PySide6.QtCore import Qt
+    from PySide6.QtGui import QImage, QPainter
+
+    canvas = QImage(image.size(), QImage.Format_RGB32)
+    canvas.fill(Qt.white)
+    painter = QPainter(canvas)
+    painter.drawImage(0, 0, image)
+    painter.end()
+    return canvas
+
+def process_image(data: Buffer, config: ImagePipelineConfig, budget: Optional[int] = None) -> Optional[EncodedImage]:
+    """按配置处理一张图片，返回不超过budget字节的编码结果；无法压缩到预算内时返回None。
+    data原样透传时结果中的data就是传入的缓冲区，调用方需要在释放缓冲区之前用完结果"""
+    from PySide6.QtGui import QImageReader
+
+    budget = config.max_image_bytes if budget is None else budget
+    source = _open_buffer(data)
+    try:
+        return _process(QImageReader(source), data, config, budget)
+    finally:
+        source.close()
+
+def _process(reader, data: Buffer, config: ImagePipelineConfig, budget: int) -> Optional[EncodedImage]:
+    from PySide6.QtCore import Qt
+
+    # 只读取文件头获取尺寸，不解码像素
+    size = reader.size()
+    width, height = size.width(), size.height()
+
+    # 尺寸、大小和格式都已符合要求时原样返回，避免解码和重新编码
+    source_format = detect_format(data)
+    if (source_format == config.format and width > 0 and height > 0
+            and max(width, height) <= config.max_dimension and len(data) <= budget):
+        return EncodedImage(data, source_format, width, height, len(data), width, height)
+
+    image = reader.read()
+    if image.isNull():
+        raise ValueError(f"无法解码图片: {reader.errorString()}")
+    width, height = image.width(), image.height()
+
+    if config.format == "jpeg" and image.hasAlphaChannel():
+        image = _flatten_alpha(image)
+
+    scale = min(1.0, config.max_dimension / max(width, height))
+    quality = config.quality
+    while True:
+        target_width = max(1, round(width * scale))
+        target_height = max(1, round(height * scale))
+        scaled = image if scale >= 1.0 else image.scaled(
+            target_width, target_height, Qt.KeepAspectRatio, Qt.SmoothTransformation
+        )
+        encoded = _encode(scaled, config.format, quality)
+        if len(encoded) <= budget:
+            return EncodedImage(
+                encoded, config.format, scaled.width(), scaled.height(), len(data), width, height
+            )
+
+        # 先降低有损格式的质量，质量降到下限后再缩小尺寸
+        if config.format != "png" and quality > MIN_QUALITY:
+            quality = max(MIN_QUALITY, quality - 15)
+        else:
+            scale *= 0.75
+            if max(width, height) * scale < MIN_DIMENSION:
+                return None
@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+# Interactive Feedback MCP 图片存储
+# 粘贴的图片按内容的SHA-256哈希命名保存，相同的截图只存一份；
+# 目录总大小和文件存活时间超出上限时按最近使用时间(LRU)淘汰旧图片。
+# 多个UI进程可能同时读写同一目录，写入使用临时文件+原子重命名，淘汰和统计在文件锁内进行。
+#
+# 命令行用法：
+#   python image_store.py stats     查看存储统计
+#   python image_store.py compact   立即执行清理
+import os
+import re
+import sys
+import json
+import time
+import hashlib
+import argparse
+import contextlib
+from typing import Iterator, Optional
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+DEFAULT_IMAGE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "images")
+
+# 只管理由存储写入的文件和旧版本的粘贴图片，目录中的其他文件（例如图标）不会被淘汰
+_MANAGED_FILE = re.compile(r"^([0-9a-f]{64}\.[a-z0-9]+|pasted_image_.+\.png)$")
+
+_STATS_FILE = ".stats.json"
+_LOCK_FILE = ".lock"
+# 缩略图缓存子目录，缩略图随原图一起被淘汰
+_THUMBNAIL_DIR = "thumbs"
+
+# 最近写入或使用过的图片在此时间内不会被淘汰，避免删除尚未返回给服务端的图片
+EVICTION_GRACE_SECONDS = 600
+
+class ImageStore:
+    def __init__(self, root: str = DEFAULT_IMAGE_DIR, max_bytes: int = 200 * 1024 * 1024,
+                 max_age: float = 7 * 24 * 3600):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        os.makedirs(self.root, exist_ok=True)
+
+    @classmethod
+    def from_env(cls) -> "ImageStore":
+        """从INTERACTIVE_FEEDBACK_IMAGE_*环境变量读取存储目录和上限"""
+        return cls(
+            root=os.environ.get("INTERACTIVE_FEEDBACK_IMAGE_DIR", DEFAULT_IMAGE_DIR),
+            max_bytes=int(float(os.environ.get("INTERACTIVE_FEEDBACK_IMAGE_STORE_MAX_MB", "200")) * 1024 * 1024),
+            max_age=float(os.environ.get("INTERACTIVE_FEEDBACK_IMAGE_STORE_MAX_AGE_DAYS", "7")) * 24 * 3600,
+        )
+
+    @contextlib.contextmanager
+    def _locked(self) -> Iterator[None]:
+        """跨进程的互斥锁"""
+        with open(os.path.join(self.root, _LOCK_FILE), "a+b") as lock_file:
+            if os.name == "nt":
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+            else:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if os.name == "nt":
+                    lock_file.seek(0)
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+                else:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _load_stats(self) -> dict:
+        try:
+            with open(os.path.join(self.root, _STATS_FILE), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"hits": 0, "misses": 0, "bytes_deduplicated": 0, "files_evicted": 0, "bytes_reclaimed": 0}
+
+    def _save_stats(self, stats: dict):
+        path = os.path.join(self.root, _STATS_FILE)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(stats, f)
+        os.replace(tmp_path, path)
+
+    def path_for(self, digest: str, extension: str = "png") -> str:
+        return os.path.join(self.root, f"{digest}.{extension}")
+
+    def resolve(self, name: str) -> Optional[str]:
+        """把图片文件名解析为存储中的路径，只接受由存储管理的文件名，防止访问目录外的文件"""
+        if not _MANAGED_FILE.match(name):
+            return None
+        path = os.path.join(self.root, name)
+        return path if os.path.isfile(path) else None
+
+    def thumbnail_path(self, image_path: str, width: int, height: int) -> Optional[str]:
+        """返回存储中某张图片的缩略图缓存路径，图片不在此存储中时返回None"""
+        name = os.path.basename(image_path)
+        if os.path.dirname(os.path.abspath(image_path)) != os.path.abspath(self.root) or not _MANAGED_FILE.match(name):
+            return None
+        stem, _ = os.path.splitext(name)
+        return os.path.join(self.root, _THUMBNAIL_DIR, f"{stem}_{width}x{height}.png")
+
+    def _remove_thumbnails(self, image_path: str):
+        stem, _ = os.path.splitext(os.path.basename(image_path))
+        thumbnail_dir = os.path.join(self.root, _THUMBNAIL_DIR)
+        with contextlib.suppress(OSError), os.scandir(thumbnail_dir) as it:
+            for entry in it:
+                if entry.name.startswith(f"{stem}_"):
+                    with contextlib.suppress(OSError):
+                        os.unlink(entry.path)
+
+    def put(self, data: bytes, extension: str = "png") -> str:
+        """保存图片并返回其路径；内容相同的图片已存在时直接复用"""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path_for(digest, extension)
+        with self._locked():
+            stats = self._load_stats()
+            if os.path.exists(path):
+                # 命中：刷新修改时间作为最近使用时间
+                os.utime(path)
+                stats["hits"] += 1
+                stats["bytes_deduplicated"] += len(data)
+            else:
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+                stats["misses"] += 1
+                self._evict(stats)
+            self._save_stats(stats)
+        return path
+
+    def touch(self, path: str):
+        """标记图片刚被使用，推迟其淘汰"""
+        with contextlib.suppress(OSError):
+            os.utime(path)
+
+    def _entries(self) -> list:
+        entries = []
+        with os.scandir(self.root) as it:
+            for entry in it:
+                if entry.is_file() and _MANAGED_FILE.match(entry.name):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def _evict(self, stats: dict, now: Optional[float] = None) -> tuple:
+        """按存活时间和总大小淘汰最久未使用的图片，需在锁内调用"""
+        now = time.time() if now is None else now
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        removed_files = removed_bytes = 0
+        for mtime, size, path in entries:
+            age = now - mtime
+            if age < EVICTION_GRACE_SECONDS:
+                break
+            if age <= self.max_age and total <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            self._remove_thumbnails(path)
+            total -= size
+            removed_files += 1
+            removed_bytes += size
+        stats["files_evicted"] += removed_files
+        stats["bytes_reclaimed"] += removed_bytes
+        return removed_files, removed_bytes
+
+    def compact(self) -> dict:
+        """立即淘汰超出上限的图片并清理中断写入留下的临时文件"""
+        with self._locked():
+            stats = self._load_stats()
+            removed_files, removed_bytes = self._evict(stats)
+            with os.scandir(self.root) as it:
+                for entry in it:
+                    if entry.name.endswith(".tmp") and time.time() - entry.stat().st_mtime > EVICTION_GRACE_SECONDS:
+                        with contextlib.suppress(OSError):
+                            os.unlink(entry.path)
+            self._save_stats(stats)
+        return {"files_removed": removed_files, "bytes_removed": removed_bytes}
+
+    def stats(self) -> dict:
+        with self._locked():
+            stats = self._load_stats()
+            entries = self._entries()
+        lookups = stats["hits"] + stats["misses"]
+        return {
+            **stats,
+            "hit_rate": round(stats["hits"] / lookups, 3) if lookups else None,
+            "files": len(entries),
+            "total_bytes": sum(size for _, size, _ in entries),
+            "max_bytes": self.max_bytes,
+            "max_age_seconds": self.max_age,
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description="管理粘贴图片的存储目录")
+    parser.add_argument("command", choices=["stats", "compact"], help="stats查看统计，compact立即清理")
+    args = parser.parse_args()
+
+    store = ImageStore.from_env()
+    if args.command == "compact":
+        print(json.dumps(store.compact(), ensure_ascii=False, indent=2))
+    print(json.dumps(store.stats(), ensure_ascii=False, indent=2))
+    sys.exit(0)
+
+if __name__ == "__main__":
+    main()
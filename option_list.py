@@ -0,0 +1,253 @@
+# Interactive Feedback MCP 预定义选项列表
+# 选项较多时（文件列表、测试名等）每个选项一个QCheckBox会让窗口创建变慢、布局难以使用。
+# 这里用QListView+列表模型只绘制可见的行，并提供基于前缀索引和模糊匹配的增量筛选。
+import re
+from bisect import bisect_left
+from typing import List, Optional
+
+from PySide6.QtWidgets import QWidget, QVBoxLayout, QLineEdit, QListView, QAbstractItemView
+from PySide6.QtCore import Qt, QAbstractListModel, QModelIndex, QEvent, QObject
+
+# 选项数超过此值时显示筛选框
+FILTER_THRESHOLD = 10
+# 列表最多显示的行数，超过时滚动
+MAX_VISIBLE_ROWS = 8
+# 列表视图每批布局的行数
+LAYOUT_BATCH_SIZE = 200
+
+# 英文、数字按单词切分；中文等没有空格的文字整段作为一个词，靠子串和模糊匹配查找
+_WORD = re.compile(r"\w+")
+
+class OptionIndex:
+    """选项筛选索引：选项开头匹配 > 单词前缀匹配 > 子串匹配 > 按顺序出现的模糊匹配"""
+
+    def __init__(self, options: List[str]):
+        self._lowered = [option.casefold() for option in options]
+        tokens = sorted(
+            (word, index)
+            for index, text in enumerate(self._lowered)
+            for word in set(_WORD.findall(text))
+        )
+        self._words = [word for word, _ in tokens]
+        self._word_options = [index for _, index in tokens]
+        # 上一次的查询和结果，输入只是在上一次查询后追加字符时在上次的结果中继续筛选
+        self._last_query = ""
+        self._last_matches: Optional[List[int]] = None
+
+    def __len__(self) -> int:
+        return len(self._lowered)
+
+    def _prefix_matches(self, term: str) -> set:
+        matches = set()
+        for position in range(bisect_left(self._words, term), len(self._words)):
+            if not self._words[position].startswith(term):
+                break
+            matches.add(self._word_options[position])
+        return matches
+
+    def search(self, query: str) -> List[int]:
+        """返回匹配查询的选项下标，按匹配程度排序，同一程度内保持原顺序"""
+        query = query.casefold().strip()
+        if not query:
+            self._last_query, self._last_matches = "", None
+            return list(range(len(self._lowered)))
+
+        # 追加字符后能匹配的选项一定也匹配原来的查询
+        if self._last_matches is not None and query.startswith(self._last_query):
+            candidates = self._last_matches
+        else:
+            candidates = range(len(self._lowered))
+
+        terms = query.split()
+        word_matches = set.intersection(*(self._prefix_matches(term) for term in terms))
+        compact = "".join(terms)
+        ranked = []
+        for index in candidates:
+            text = self._lowered[index]
+            if text.startswith(query):
+                tier = 0
+            elif index in word_matches:
+                tier = 1
+            elif query in text:
+                tier = 2
+            else:
+                # 查询中的字符按顺序出现在选项中
+                remaining = iter(text)
+                if not all(char in remaining for char in compact):
+                    continue
+                tier = 3
+            ranked.append((tier, index))
+        ranked.sort()
+
+        matches = [index for _, index in ranked]
+        self._last_query, self._last_matches = query, matches
+        return matches
+
+class OptionListModel(QAbstractListModel):
+    """可勾选的选项列表，筛选时只改变可见的行，勾选状态按原始下标保存"""
+
+    def __init__(self, options: Optional[List[str]] = None, parent=None):
+        super().__init__(parent)
+        self.set_options(options or [])
+
+    def set_options(self, options: List[str], checked: Optional[List[bool]] = None):
+        self.beginResetModel()
+        self._options = list(options)
+        self._checked = list(checked) if checked is not None else [False] * len(self._options)
+        self._visible = list(range(len(self._options)))
+        self._index = None
+        self.endResetModel()
+
+    def add_options(self, options: List[str]):
+        """在末尾追加选项，已有选项的勾选状态不变；筛选中时由调用方重新筛选"""
+        if not options:
+            return
+        start = len(self._options)
+        self._options.extend(options)
+        self._checked.extend([False] * len(options))
+        self._index = None
+        self.beginInsertRows(QModelIndex(), len(self._visible), len(self._visible) + len(options) - 1)
+        self._visible.extend(range(start, start + len(options)))
+        self.endInsertRows()
+
+    def set_filter(self, query: str):
+        if self._index is None:
+            # 第一次筛选时才建立索引，不筛选的窗口不需要
+            self._index = OptionIndex(self._options)
+        visible = self._index.search(query)
+        if visible != self._visible:
+            self.beginResetModel()
+            self._visible = visible
+            self.endResetModel()
+
+    def option_count(self) -> int:
+        return len(self._options)
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._visible)
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        option_index = self._visible[index.row()]
+        if role in (Qt.DisplayRole, Qt.ToolTipRole):
+            return self._options[option_index]
+        if role == Qt.CheckStateRole:
+            return Qt.Checked if self._checked[option_index] else Qt.Unchecked
+        return None
+
+    def setData(self, index: QModelIndex, value, role: int = Qt.EditRole) -> bool:
+        if not index.isValid() or role != Qt.CheckStateRole:
+            return False
+        self._checked[self._visible[index.row()]] = Qt.CheckState(value) == Qt.Checked
+        self.dataChanged.emit(index, index, [Qt.CheckStateRole])
+        return True
+
+    def flags(self, index: QModelIndex):
+        if not index.isValid():
+            return Qt.NoItemFlags
+        # 不设置ItemIsUserCheckable：勾选统一由OptionList处理整行单击和按键，避免点中复选框时重复切换
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable
+
+    def toggle(self, row: int):
+        index = self.index(row)
+        checked = self.data(index, Qt.CheckStateRole) == Qt.Checked
+        self.setData(index, Qt.Unchecked if checked else Qt.Checked, Qt.CheckStateRole)
+
+    def checked_states(self) -> List[bool]:
+        """按原始下标返回勾选状态，可传回set_options恢复"""
+        return list(self._checked)
+
+    def checked_options(self) -> List[str]:
+        """按原始顺序返回勾选的选项，包括当前被筛选隐藏的选项"""
+        return [option for option, checked in zip(self._options, self._checked) if checked]
+
+class OptionList(QWidget):
+    """筛选框+选项列表。在筛选框中可用上下键移动、回车勾选、Esc清空筛选"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 10, 0, 10)
+
+        self.filter_edit = QLineEdit()
+        self.filter_edit.setPlaceholderText("筛选选项…（↑↓选择，回车勾选）")
+        self.filter_edit.setClearButtonEnabled(True)
+        self.filter_edit.textChanged.connect(self._on_filter_changed)
+        self.filter_edit.installEventFilter(self)
+
+        self.model = OptionListModel(parent=self)
+        self.view = QListView()
+        self.view.setModel(self.model)
+        # 所有行高度相同，视图不需要逐行计算尺寸，选项数量不影响创建耗时
+        self.view.setUniformItemSizes(True)
+        # 分批布局：选项很多时视图在后续事件循环中继续布局，不阻塞窗口显示
+        self.view.setLayoutMode(QListView.Batched)
+        self.view.setBatchSize(LAYOUT_BATCH_SIZE)
+        self.view.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.view.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.view.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
+        # 单击一行即可勾选，不必点中复选框
+        self.view.clicked.connect(lambda index: self.model.toggle(index.row()))
+        self.view.installEventFilter(self)
+
+        layout.addWidget(self.filter_edit)
+        layout.addWidget(self.view)
+
+    def set_options(self, options: List[str], checked: Optional[List[bool]] = None):
+        self.filter_edit.blockSignals(True)
+        self.filter_edit.clear()
+        self.filter_edit.blockSignals(False)
+        self.model.set_options(options, checked)
+        self.filter_edit.setVisible(len(options) > FILTER_THRESHOLD)
+        self._update_height()
+        if options:
+            self.view.setCurrentIndex(self.model.index(0))
+
+    def add_options(self, options: List[str]):
+        """追加选项，保留已勾选的选项和筛选框中的输入"""
+        had_options = self.model.option_count() > 0
+        self.model.add_options(options)
+        if self.filter_edit.text():
+            self.model.set_filter(self.filter_edit.text())
+        self.filter_edit.setVisible(self.model.option_count() > FILTER_THRESHOLD)
+        self._update_height()
+        if not had_options and self.model.rowCount():
+            self.view.setCurrentIndex(self.model.index(0))
+
+    def selected_options(self) -> List[str]:
+        return self.model.checked_options()
+
+    def _update_height(self):
+        # 选项少时列表高度贴合内容，多时固定为MAX_VISIBLE_ROWS行并滚动
+        rows = max(1, min(self.model.option_count(), MAX_VISIBLE_ROWS))
+        row_height = self.view.sizeHintForRow(0) if self.model.rowCount() else self.view.fontMetrics().height()
+        self.view.setFixedHeight(rows * row_height + 2 * self.view.frameWidth() + 2)
+
+    def _on_filter_changed(self, text: str):
+        self.model.set_filter(text)
+        if self.model.rowCount():
+            self.view.setCurrentIndex(self.model.index(0))
+            self.view.scrollToTop()
+
+    def eventFilter(self, watched: QObject, event: QEvent) -> bool:
+        if watched is self.view and event.type() == QEvent.KeyPress and event.key() == Qt.Key_Space:
+            current = self.view.currentIndex()
+            if current.isValid():
+                self.model.toggle(current.row())
+            return True
+        if watched is self.filter_edit and event.type() == QEvent.KeyPress:
+            key = event.key()
+            if key in (Qt.Key_Up, Qt.Key_Down, Qt.Key_PageUp, Qt.Key_PageDown):
+                # 焦点留在筛选框中，方向键移动列表中的当前行
+                self.view.keyPressEvent(event)
+                return True
+            if key in (Qt.Key_Return, Qt.Key_Enter) and event.modifiers() == Qt.NoModifier:
+                current = self.view.currentIndex()
+                if current.isValid():
+                    self.model.toggle(current.row())
+                return True
+            if key == Qt.Key_Escape and self.filter_edit.text():
+                self.filter_edit.clear()
+                return True
+        return super().eventFilter(watched, event)
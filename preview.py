@@ -1,68 +1,310 @@
-#!/usr/bin/env python
-# 交互式反馈界面预览脚本
-# 此脚本用于快速预览交互式反馈界面的外观和功能
-
-import sys
-import argparse
-from feedback_ui import feedback_ui
-
-def main():
-    """主函数，用于启动预览界面"""
-    parser = argparse.ArgumentParser(description="预览交互式反馈界面")
-    parser.add_argument("--theme", choices=["light", "dark", "both"], default="both", 
-                        help="选择预览的主题：浅色、深色或两者都显示")
-    parser.add_argument("--options", action="store_true", default=True, help="显示带预定义选项的界面")
-    parser.add_argument("--many-options", action="store_true", default=True, help="显示大量预定义选项")
-    parser.add_argument("--no-options", action="store_true", help="不显示预定义选项")
-    args = parser.parse_args()
-    
-    # 如果指定了no-options，则不显示选项
-    if args.no_options:
-        args.options = False
-        args.many_options = False
-    
-    # 设置示例提示文本
-    prompt = "这是一个示例提示文本。您可以在此处看到修改后的界面效果。\n您可以尝试切换主题、选择预定义选项或输入自定义反馈。"
-    
-    # 设置预定义选项（如果需要）
-    predefined_options = None
-    if args.options:
-        if args.many_options:
-            # 创建大量选项用于测试网格布局和滚动区域
-            predefined_options = [
-                "选项1：我喜欢这个功能",
-                "选项2：需要进一步改进",
-                "选项3：有一些问题需要修复",
-                "选项4：界面设计很好",
-                "选项5：功能非常实用",
-                "选项6：操作简单直观",
-                "选项7：响应速度很快",
-                "选项8：与其他工具集成良好",
-                "选项9：文档清晰易懂",
-                "选项10：安装过程顺利",
-                "选项11：配置选项丰富",
-                "选项12：自定义程度高",
-                "选项13：支持多平台",
-                "选项14：资源占用合理",
-                "选项15：更新频率适中"
-            ]
-        else:
-            predefined_options = [
-                "选项1：我喜欢这个功能",
-                "选项2：需要进一步改进",
-                "选项3：有一些问题需要修复"
-            ]
-    
-    # 启动界面
-    result = feedback_ui(prompt, predefined_options)
-    
-    # 显示结果
-    if result and result["interactive_feedback"]:
-        print(f"\n收到的反馈：\n{result['interactive_feedback']}")
-        if result.get('image_paths'):
-            print(f"\n附带图片：\n{', '.join(result['image_paths'])}")
-    else:
-        print("\n未收到反馈或用户取消了操作")
-
-if __name__ == "__main__":
+#!/usr/bin/env python
+# 交互式反馈界面预览脚本
+# 此脚本用于快速预览交互式反馈界面的外观和功能
+# --bench 在无界面(offscreen)模式下按参数网格（提示长度、选项数、附带图片的数量和分辨率、深色/浅色主题）
+# 构建窗口，测量构建、布局、首次显示、缩略图加载、主题切换和每帧绘制的耗时，结果写入JSON；
+# 指定--golden-dir时把每个场景的窗口截图与基准截图逐像素比较，用于发现界面渲染的回归
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+from feedback_ui import feedback_ui
+
+# 渲染基准的默认参数网格
+BENCH_PROMPT_CHARS = [200, 20000]
+BENCH_OPTION_COUNTS = [0, 15, 500, 3000]
+BENCH_IMAGE_SETS = ["0", "4x1920x1080"]
+BENCH_THEMES = ["dark", "light"]
+# 基准窗口的固定尺寸，截图与用户保存的窗口位置无关
+BENCH_WINDOW_SIZE = (800, 600)
+
+def _bench_prompt(chars: int) -> str:
+    """生成约chars个字符的Markdown提示，包含标题、列表和代码块，接近AI的实际总结"""
+    sections = []
+    total, index = 0, 0
+    while total < chars:
+        section = (
+            f"## 第{index + 1}部分：修改说明\n"
+            f"- 修改了`module_{index}.py`中的**解析逻辑**，处理边界情况\n"
+            f"- 新增了{index + 3}个测试用例\n\n"
+            "```python\n"
+            + "".join(f"def function_{index}_{line}(value):\n    return value * {line}\n" for line in range(6))
+            + "```\n\n"
+        )
+        sections.append(section)
+        total += len(section)
+        index += 1
+    return "".join(sections)[:chars]
+
+def _parse_image_set(spec: str) -> tuple:
+    """解析图片集合：“0”表示无图片，“数量x宽x高”如“4x1920x1080”"""
+    if spec == "0":
+        return 0, 0, 0
+    count, width, height = (int(part) for part in spec.lower().split("x"))
+    return count, width, height
+
+def _bench_scenarios(args) -> list:
+    return [
+        {"prompt_chars": prompt_chars, "options": options, "images": images, "theme": theme}
+        for prompt_chars in args.prompt_chars
+        for options in args.option_counts
+        for images in args.images
+        for theme in args.themes
+    ]
+
+def _scenario_name(params: dict) -> str:
+    return f"p{params['prompt_chars']}_o{params['options']}_i{params['images']}_{params['theme']}"
+
+def _measure_scenario(app, params: dict, image_paths: list, thumbnail_dir: str, runs: int, frames: int):
+    """构建窗口runs次，返回各阶段的耗时样本和最后一次的窗口截图"""
+    import feedback_ui as ui_module
+    from PySide6.QtCore import QEvent, QThreadPool
+
+    prompt = _bench_prompt(params["prompt_chars"])
+    options = [f"选项{i}：tests/test_module_{i}.py::test_case_{i}" for i in range(params["options"])]
+    samples = {name: [] for name in ("construction", "layout", "first_show", "images_ready", "theme_toggle", "frame")}
+    screenshot = None
+    for run in range(runs):
+        # 每次都从冷缓存加载缩略图
+        ui_module._thumbnail_cache.clear()
+        shutil.rmtree(thumbnail_dir, ignore_errors=True)
+
+        started = time.perf_counter()
+        window = ui_module.FeedbackUI(prompt, options)
+        samples["construction"].append(time.perf_counter() - started)
+
+        # 不调用_toggle_theme，避免把主题写入设置
+        window.is_dark_mode = params["theme"] == "dark"
+        window._apply_theme()
+        window.resize(*BENCH_WINDOW_SIZE)
+
+        started = time.perf_counter()
+        window.layout().activate()
+        samples["layout"].append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        window.show()
+        app.processEvents()
+        samples["first_show"].append(time.perf_counter() - started)
+
+        if image_paths:
+            started = time.perf_counter()
+            for path in image_paths:
+                window.uploaded_images.append(path)
+                window._add_image_to_preview(path)
+            QThreadPool.globalInstance().waitForDone()
+            app.processEvents()
+            samples["images_ready"].append(time.perf_counter() - started)
+
+        # 切换到另一个主题再切换回来，每次切换包括调色板变化传播到所有控件
+        for _ in range(2):
+            started = time.perf_counter()
+            window.is_dark_mode = not window.is_dark_mode
+            window._apply_theme()
+            app.processEvents()
+            samples["theme_toggle"].append(time.perf_counter() - started)
+
+        for _ in range(frames):
+            started = time.perf_counter()
+            window.repaint()
+            samples["frame"].append(time.perf_counter() - started)
+
+        if run == runs - 1:
+            screenshot = window.grab().toImage()
+        # 直接隐藏而不是关闭窗口，关闭时会把窗口位置写入设置
+        window.hide()
+        window.deleteLater()
+        app.sendPostedEvents(None, QEvent.DeferredDelete)
+    return samples, screenshot
+
+def _compare_golden(image, golden_path: str, tolerance: float) -> dict:
+    """逐像素比较截图与基准截图，不同像素的比例不超过tolerance时视为一致"""
+    from PySide6.QtGui import QImage
+
+    golden = QImage(golden_path)
+    if golden.isNull():
+        return {"status": "missing"}
+    if golden.size() != image.size():
+        return {"status": "mismatch", "reason": f"尺寸不同：{golden.width()}x{golden.height()}"}
+    actual = image.convertToFormat(QImage.Format_RGB32)
+    expected = golden.convertToFormat(QImage.Format_RGB32)
+    actual_pixels = memoryview(actual.constBits()).cast("B").cast("I")
+    expected_pixels = memoryview(expected.constBits()).cast("B").cast("I")
+    if actual_pixels == expected_pixels:
+        differing = 0
+    else:
+        differing = sum(a != b for a, b in zip(actual_pixels, expected_pixels))
+    ratio = differing / len(actual_pixels)
+    return {"status": "match" if ratio <= tolerance else "mismatch", "differing_ratio": round(ratio, 6)}
+
+def run_render_bench(args) -> int:
+    """运行渲染基准，有截图与基准截图不一致时返回1"""
+    from benchmark import _percentiles, _synthetic_screenshot
+
+    if not args.show:
+        os.environ["QT_QPA_PLATFORM"] = "offscreen"
+    work_dir = tempfile.mkdtemp(prefix="feedback_render_bench_")
+    # 图片存储和设置都放在临时目录中，不影响用户的数据，截图也与用户的主题和窗口位置无关
+    os.environ["INTERACTIVE_FEEDBACK_IMAGE_DIR"] = os.path.join(work_dir, "images")
+
+    from PySide6 import __version__ as pyside_version
+    from PySide6.QtCore import QSettings, qVersion
+    from PySide6.QtWidgets import QApplication
+    from image_store import ImageStore
+
+    QSettings.setPath(QSettings.NativeFormat, QSettings.UserScope, os.path.join(work_dir, "settings"))
+    app = QApplication.instance() or QApplication(sys.argv)
+    # 光标闪烁会让截图随时间变化
+    app.setCursorFlashTime(0)
+
+    store = ImageStore.from_env()
+    image_paths = {}
+    for spec in args.images:
+        count, width, height = _parse_image_set(spec)
+        # 每张图片尺寸略有不同，避免按内容去重为同一个文件
+        image_paths[spec] = [store.put(_synthetic_screenshot(width + i, height)) for i in range(count)]
+    thumbnail_dir = os.path.join(store.root, "thumbs")
+
+    if args.golden_dir:
+        os.makedirs(args.golden_dir, exist_ok=True)
+    results, mismatches = [], 0
+    try:
+        for params in _bench_scenarios(args):
+            name = _scenario_name(params)
+            samples, screenshot = _measure_scenario(
+                app, params, image_paths[params["images"]], thumbnail_dir, args.runs, args.frames
+            )
+            result = {
+                "name": name,
+                "params": params,
+                **{phase: _percentiles(values) if values else None for phase, values in samples.items()},
+            }
+            if args.golden_dir:
+                golden_path = os.path.join(args.golden_dir, f"{name}.png")
+                if args.update_golden or not os.path.exists(golden_path):
+                    screenshot.save(golden_path, "PNG")
+                    result["golden"] = {"status": "updated"}
+                else:
+                    result["golden"] = _compare_golden(screenshot, golden_path, args.tolerance)
+                    if result["golden"]["status"] != "match":
+                        mismatches += 1
+                        # 保存实际截图，便于与基准截图对照
+                        screenshot.save(os.path.join(args.golden_dir, f"{name}.actual.png"), "PNG")
+            results.append(result)
+            _print_render_row(result)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.output:
+        report = {
+            "suite": "render",
+            "runs": args.runs,
+            "frames": args.frames,
+            "window_size": list(BENCH_WINDOW_SIZE),
+            "python": sys.version.split()[0],
+            "platform": sys.platform,
+            "qt": qVersion(),
+            "pyside": pyside_version,
+            "qpa_platform": app.platformName(),
+            "timestamp": time.time(),
+            "results": results,
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if mismatches:
+        print(f"\n{mismatches}个场景的截图与基准截图不一致")
+    return 1 if mismatches else 0
+
+_RENDER_COLUMNS = ("construction", "layout", "first_show", "images_ready", "theme_toggle", "frame")
+
+def _print_render_row(result: dict):
+    """打印一个场景各阶段的p50（帧绘制另加p95），单位毫秒"""
+    if not hasattr(_print_render_row, "header_printed"):
+        print(f"{'场景':<36}{'构建':>8}{'布局':>8}{'显示':>8}{'缩略图':>8}{'主题':>8}{'帧p50':>8}{'帧p95':>8}  截图")
+        _print_render_row.header_printed = True
+    cells = [result[phase]["p50_ms"] if result[phase] else "-" for phase in _RENDER_COLUMNS]
+    cells.append(result["frame"]["p95_ms"] if result["frame"] else "-")
+    golden = result.get("golden", {}).get("status", "-")
+    print(f"{result['name']:<36}" + "".join(f"{cell:>8}" for cell in cells) + f"  {golden}")
+
+def main():
+    """主函数，用于启动预览界面"""
+    parser = argparse.ArgumentParser(description="预览交互式反馈界面")
+    parser.add_argument("--theme", choices=["light", "dark", "both"], default="both", 
+                        help="选择预览的主题：浅色、深色或两者都显示")
+    parser.add_argument("--options", action="store_true", default=True, help="显示带预定义选项的界面")
+    parser.add_argument("--many-options", action="store_true", default=True, help="显示大量预定义选项")
+    parser.add_argument("--no-options", action="store_true", help="不显示预定义选项")
+    bench = parser.add_argument_group("渲染基准（--bench）")
+    bench.add_argument("--bench", action="store_true", help="在offscreen模式下按参数网格测量界面的渲染性能")
+    bench.add_argument("--prompt-chars", type=int, nargs="+", default=BENCH_PROMPT_CHARS, help="提示的字符数")
+    bench.add_argument("--option-counts", type=int, nargs="+", default=BENCH_OPTION_COUNTS, help="预定义选项数")
+    bench.add_argument("--images", nargs="+", default=BENCH_IMAGE_SETS,
+                       help="附带的图片：0或“数量x宽x高”，如4x1920x1080")
+    bench.add_argument("--themes", nargs="+", choices=BENCH_THEMES, default=BENCH_THEMES, help="主题")
+    bench.add_argument("--runs", type=int, default=3, help="每个场景构建窗口的次数")
+    bench.add_argument("--frames", type=int, default=10, help="每次测量的绘制帧数")
+    bench.add_argument("--show", action="store_true", help="在真实显示器上显示窗口（默认使用offscreen）")
+    bench.add_argument("--output", help="把JSON结果（附带运行环境信息）写入文件，便于比较不同版本")
+    bench.add_argument("--golden-dir", help="基准截图目录：没有基准截图的场景保存截图，已有的逐像素比较")
+    bench.add_argument("--update-golden", action="store_true", help="用本次截图覆盖基准截图")
+    bench.add_argument("--tolerance", type=float, default=0.001, help="允许不同的像素比例")
+    args = parser.parse_args()
+
+    if args.bench:
+        sys.exit(run_render_bench(args))
+    
+    # 如果指定了no-options，则不显示选项
+    if args.no_options:
+        args.options = False
+        args.many_options = False
+    
+    # 设置示例提示文本
+    prompt = "这是一个示例提示文本。您可以在此处看到修改后的界面效果。\n您可以尝试切换主题、选择预定义选项或输入自定义反馈。"
+    
+    # 设置预定义选项（如果需要）
+    predefined_options = None
+    if args.options:
+        if args.many_options:
+            # 创建大量选项用于测试网格布局和滚动区域
+            predefined_options = [
+                "选项1：我喜欢这个功能",
+                "选项2：需要进一步改进",
+                "选项3：有一些问题需要修复",
+                "选项4：界面设计很好",
+                "选项5：功能非常实用",
+                "选项6：操作简单直观",
+                "选项7：响应速度很快",
+                "选项8：与其他工具集成良好",
+                "选项9：文档清晰易懂",
+                "选项10：安装过程顺利",
+                "选项11：配置选项丰富",
+                "选项12：自定义程度高",
+                "选项13：支持多平台",
+                "选项14：资源占用合理",
+                "选项15：更新频率适中"
+            ]
+        else:
+            predefined_options = [
+                "选项1：我喜欢这个功能",
+                "选项2：需要进一步改进",
+                "选项3：有一些问题需要修复"
+            ]
+    
+    # 启动界面
+    result = feedback_ui(prompt, predefined_options)
+    
+    # 显示结果
+    if result and result["interactive_feedback"]:
+        print(f"\n收到的反馈：\n{result['interactive_feedback']}")
+        if result.get('image_paths'):
+            print(f"\n附带图片：\n{', '.join(result['image_paths'])}")
+    else:
+        print("\n未收到反馈或用户取消了操作")
+
+if __name__ == "__main__":
     main() 
\ No newline at end of file
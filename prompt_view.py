@@ -0,0 +1,326 @@
+# Interactive Feedback MCP 提示文本视图
+# AI的总结可能有上千行（代码、diff），放在自动换行的QLabel中布局非常慢，还会把输入框挤出屏幕。
+# 这里用只读的QPlainTextEdit显示提示：文档按块布局，只有可见的块才会计算换行；
+# Markdown/代码的格式在块第一次可见时才设置，较长的代码块和章节默认折叠，视图高度有上限。
+import re
+from typing import List, Optional
+
+from PySide6.QtWidgets import QPlainTextEdit, QFrame
+from PySide6.QtCore import Qt, QTimer, QPoint
+from PySide6.QtGui import (
+    QColor, QFont, QFontDatabase, QPainter, QTextCharFormat, QTextCursor, QTextLayout, QTextOption, QMouseEvent
+)
+
+# 提示视图的最大高度（像素），更长的提示在视图内滚动
+MAX_PROMPT_HEIGHT = 320
+# 超过此行数的代码块默认折叠
+CODE_COLLAPSE_LINES = 30
+# 超过此行数的标题章节默认折叠
+SECTION_COLLAPSE_LINES = 200
+# 折叠后仍显示的前几行
+COLLAPSED_PREVIEW_LINES = 8
+# 先载入的行数，其余的行在之后的事件循环中分批追加，窗口不必等待整个提示载入
+INITIAL_LOAD_LINES = 2000
+LOAD_CHUNK_LINES = 20000
+# 单行布局的耗时与行长成正比，超长的行（例如压缩后的JSON）按此长度拆分显示
+MAX_LINE_CHARS = 10000
+
+# 行的类型，在载入提示时一次性计算，只用字符串操作，不涉及布局
+PLAIN, HEADING, FENCE, CODE, DIFF_ADD, DIFF_DEL, QUOTE, LIST = range(8)
+
+_HEADING = re.compile(r"^(#{1,6})\s")
+_LIST = re.compile(r"^\s*(?:[-*+]|\d+[.)])\s")
+_INLINE_CODE = re.compile(r"`[^`]+`")
+_BOLD = re.compile(r"\*\*[^*]+\*\*|__[^_]+__")
+
+class _Region:
+    """可折叠的区域：first是区域第一行（代码块的开始标记或标题），end是区域结束后的下一行"""
+    __slots__ = ("first", "end", "collapsed")
+
+    def __init__(self, first: int, end: int, collapsed: bool):
+        self.first = first
+        self.end = end
+        self.collapsed = collapsed
+
+    @property
+    def hidden_start(self) -> int:
+        return self.first + 1 + COLLAPSED_PREVIEW_LINES
+
+    @property
+    def anchor(self) -> int:
+        """显示折叠标记、点击切换折叠状态的行"""
+        return self.hidden_start - 1
+
+def classify_lines(lines: List[str]) -> tuple[List[int], List[_Region]]:
+    """计算每行的类型和可折叠的区域"""
+    kinds = [PLAIN] * len(lines)
+    regions = []
+    headings = []  # (行号, 级别)
+    fence_start: Optional[int] = None
+    for number, line in enumerate(lines):
+        stripped = line.lstrip()
+        if stripped.startswith("```") or stripped.startswith("~~~"):
+            kinds[number] = FENCE
+            if fence_start is None:
+                fence_start = number
+            else:
+                if number - fence_start > CODE_COLLAPSE_LINES:
+                    regions.append(_Region(fence_start, number + 1, True))
+                fence_start = None
+            continue
+        if fence_start is not None:
+            if line.startswith("+") and not line.startswith("+++"):
+                kinds[number] = DIFF_ADD
+            elif line.startswith("-") and not line.startswith("---"):
+                kinds[number] = DIFF_DEL
+            else:
+                kinds[number] = CODE
+            continue
+        heading = _HEADING.match(line)
+        if heading:
+            kinds[number] = HEADING
+            headings.append((number, len(heading.group(1))))
+        elif stripped.startswith(">"):
+            kinds[number] = QUOTE
+        elif _LIST.match(line):
+            kinds[number] = LIST
+    # 未闭合的代码块一直延续到结尾
+    if fence_start is not None and len(lines) - fence_start > CODE_COLLAPSE_LINES:
+        regions.append(_Region(fence_start, len(lines), True))
+
+    # 标题章节到下一个同级或更高级的标题为止
+    for index, (number, level) in enumerate(headings):
+        end = next((other for other, other_level in headings[index + 1:] if other_level <= level), len(lines))
+        if end - number > SECTION_COLLAPSE_LINES:
+            regions.append(_Region(number, end, True))
+    regions.sort(key=lambda region: region.first)
+    return kinds, regions
+
+class PromptView(QPlainTextEdit):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setReadOnly(True)
+        self.setUndoRedoEnabled(False)
+        self.setFrameShape(QFrame.NoFrame)
+        self.viewport().setAutoFillBackground(False)
+        self.setWordWrapMode(QTextOption.WrapAtWordBoundaryOrAnywhere)
+        self.setTextInteractionFlags(Qt.TextSelectableByMouse | Qt.TextSelectableByKeyboard)
+        # 窗口打开时焦点留给反馈输入框，点击提示后才可以用键盘选择、复制
+        self.setFocusPolicy(Qt.ClickFocus)
+
+        self._kinds: List[int] = []
+        self._regions: List[_Region] = []
+        self._anchors: dict[int, _Region] = {}
+        self._formatted: set[int] = set()
+        self._formats = self._create_formats()
+
+        # 滚动、改变大小后在下一次事件循环中为新出现的块设置格式，多次触发只执行一次
+        self._highlight_timer = QTimer(self)
+        self._highlight_timer.setSingleShot(True)
+        self._highlight_timer.setInterval(0)
+        self._highlight_timer.timeout.connect(self._highlight_visible_blocks)
+        self.verticalScrollBar().valueChanged.connect(self._highlight_timer.start)
+
+        self._lines: List[str] = []
+        self._loaded_lines = 0
+        self._load_timer = QTimer(self)
+        self._load_timer.setSingleShot(True)
+        self._load_timer.setInterval(0)
+        self._load_timer.timeout.connect(self._load_more)
+
+    def _create_formats(self) -> dict:
+        # 颜色选用在深色和浅色主题下都清晰的中间色
+        mono = QFontDatabase.systemFont(QFontDatabase.FixedFont)
+        formats = {}
+        heading = QTextCharFormat()
+        heading.setFontWeight(QFont.Bold)
+        heading.setForeground(QColor(86, 156, 214))
+        formats[HEADING] = heading
+        for kind, color in ((FENCE, QColor(128, 128, 128)), (CODE, None),
+                            (DIFF_ADD, QColor(87, 166, 74)), (DIFF_DEL, QColor(209, 105, 105))):
+            code = QTextCharFormat()
+            code.setFontFamilies([mono.family()])
+            if color is not None:
+                code.setForeground(color)
+            formats[kind] = code
+        quote = QTextCharFormat()
+        quote.setFontItalic(True)
+        quote.setForeground(QColor(128, 128, 128))
+        formats[QUOTE] = quote
+        bullet = QTextCharFormat()
+        bullet.setForeground(QColor(86, 156, 214))
+        formats[LIST] = bullet
+        inline_code = QTextCharFormat()
+        inline_code.setFontFamilies([mono.family()])
+        inline_code.setForeground(QColor(206, 145, 120))
+        formats["inline_code"] = inline_code
+        bold = QTextCharFormat()
+        bold.setFontWeight(QFont.Bold)
+        formats["bold"] = bold
+        return formats
+
+    def set_prompt(self, prompt: str):
+        self._lines = [
+            line[start:start + MAX_LINE_CHARS] if len(line) > MAX_LINE_CHARS else line
+            for line in prompt.split("\n")
+            for start in range(0, max(1, len(line)), MAX_LINE_CHARS)
+        ]
+        self._kinds, self._regions = classify_lines(self._lines)
+        self._anchors = {region.anchor: region for region in self._regions}
+        self._formatted = set()
+        self._loaded_lines = min(len(self._lines), INITIAL_LOAD_LINES)
+        self.setPlainText("\n".join(self._lines[:self._loaded_lines]))
+        # 在第一次布局之前隐藏折叠的行，隐藏的块不参与布局
+        self._apply_visibility(0, self._loaded_lines)
+        self._update_height()
+        self._highlight_timer.start()
+        if self._loaded_lines < len(self._lines):
+            self._load_timer.start()
+        else:
+            self._load_timer.stop()
+
+    def update_prompt(self, prompt: str):
+        """替换提示文本并保持阅读位置；原来已滚动到底部（例如在看追加的进度）时跟随到新的底部"""
+        scroll_bar = self.verticalScrollBar()
+        value = scroll_bar.value()
+        at_end = value >= scroll_bar.maximum()
+        self.set_prompt(prompt)
+        scroll_bar.setValue(scroll_bar.maximum() if at_end else value)
+
+    def _load_more(self):
+        """把下一批行追加到文档末尾"""
+        start = self._loaded_lines
+        self._loaded_lines = min(len(self._lines), start + LOAD_CHUNK_LINES)
+        cursor = QTextCursor(self.document())
+        cursor.movePosition(QTextCursor.End)
+        cursor.insertText("\n" + "\n".join(self._lines[start:self._loaded_lines]))
+        self._apply_visibility(start, self._loaded_lines)
+        if self._loaded_lines < len(self._lines):
+            self._load_timer.start()
+        else:
+            # 全部载入后不再需要保留原始文本
+            self._lines = []
+
+    def _apply_visibility(self, start: int, end: int):
+        """按区域的折叠状态设置start到end之间各行是否显示"""
+        hidden = [0] * (end - start + 1)
+        for region in self._regions:
+            if region.collapsed and region.hidden_start < min(region.end, end) and region.end > start:
+                hidden[max(region.hidden_start, start) - start] += 1
+                hidden[max(min(region.end, end), start) - start] -= 1
+        document = self.document()
+        block = document.findBlockByNumber(start)
+        depth = 0
+        first_changed = last_changed = None
+        for offset in range(end - start):
+            depth += hidden[offset]
+            visible = depth <= 0
+            if block.isVisible() != visible:
+                block.setVisible(visible)
+                if first_changed is None:
+                    first_changed = block
+                last_changed = block
+            block = block.next()
+        if first_changed is not None:
+            changed_from = first_changed.position()
+            document.markContentsDirty(changed_from, last_changed.position() + last_changed.length() - changed_from)
+            self.viewport().update()
+
+    def _update_height(self):
+        # 提示较短时高度贴合内容，较长时固定为MAX_PROMPT_HEIGHT并在视图内滚动
+        line_spacing = self.fontMetrics().lineSpacing()
+        margins = self.contentsMargins().top() + self.contentsMargins().bottom() + 2 * self.document().documentMargin()
+        visible_lines = int(self.document().documentLayout().documentSize().height())
+        content_height = int(max(1, visible_lines) * line_spacing + margins)
+        # 内容能完整显示时不需要滚动条
+        self.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOff if content_height <= MAX_PROMPT_HEIGHT else Qt.ScrollBarAsNeeded)
+        self.setFixedHeight(min(MAX_PROMPT_HEIGHT, content_height))
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self._update_height()
+        self._highlight_timer.start()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self._highlight_timer.start()
+
+    def _visible_blocks(self):
+        block = self.firstVisibleBlock()
+        offset = self.contentOffset()
+        bottom = self.viewport().rect().bottom()
+        while block.isValid():
+            geometry = self.blockBoundingGeometry(block).translated(offset)
+            if geometry.top() > bottom:
+                break
+            if block.isVisible():
+                yield block, geometry
+            block = block.next()
+
+    def _highlight_visible_blocks(self):
+        """只为当前可见、尚未设置格式的块计算Markdown格式"""
+        for block, _ in self._visible_blocks():
+            number = block.blockNumber()
+            if number in self._formatted or number >= len(self._kinds):
+                continue
+            self._formatted.add(number)
+            formats = self._block_formats(block.text(), self._kinds[number])
+            if formats:
+                block.layout().setFormats(formats)
+                self.document().markContentsDirty(block.position(), block.length())
+
+    def _block_formats(self, text: str, kind: int) -> list:
+        def span(start: int, length: int, text_format: QTextCharFormat) -> QTextLayout.FormatRange:
+            format_range = QTextLayout.FormatRange()
+            format_range.start = start
+            format_range.length = length
+            format_range.format = text_format
+            return format_range
+
+        if kind in (HEADING, FENCE, CODE, DIFF_ADD, DIFF_DEL, QUOTE):
+            return [span(0, len(text), self._formats[kind])]
+        formats = []
+        if kind == LIST:
+            marker = _LIST.match(text)
+            formats.append(span(0, marker.end(), self._formats[LIST]))
+        for match in _BOLD.finditer(text):
+            formats.append(span(match.start(), match.end() - match.start(), self._formats["bold"]))
+        for match in _INLINE_CODE.finditer(text):
+            formats.append(span(match.start(), match.end() - match.start(), self._formats["inline_code"]))
+        return formats
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not self._anchors:
+            return
+        # 在可折叠区域的标记行右侧绘制折叠状态
+        painter = QPainter(self.viewport())
+        painter.setPen(self.palette().placeholderText().color())
+        metrics = self.fontMetrics()
+        for block, geometry in self._visible_blocks():
+            region = self._anchors.get(block.blockNumber())
+            if region is None:
+                continue
+            hidden_lines = region.end - region.hidden_start
+            label = f"▶ 已折叠{hidden_lines}行，点击展开" if region.collapsed else "▼ 点击折叠"
+            x = int(self.viewport().width() - metrics.horizontalAdvance(label) - 6)
+            painter.drawText(QPoint(x, int(geometry.top()) + metrics.ascent()), label)
+        painter.end()
+
+    def mouseReleaseEvent(self, event: QMouseEvent):
+        super().mouseReleaseEvent(event)
+        # 单击（没有选中文本时）标记行切换折叠状态
+        if event.button() != Qt.LeftButton or self.textCursor().hasSelection():
+            return
+        region = self._anchors.get(self.cursorForPosition(event.position().toPoint()).blockNumber())
+        if region is not None:
+            self.toggle_region(region)
+
+    def toggle_region(self, region: _Region):
+        region.collapsed = not region.collapsed
+        self._apply_visibility(region.hidden_start, min(region.end, self._loaded_lines))
+        self._update_height()
+        self._highlight_timer.start()
+
+    def collapsible_regions(self) -> List[_Region]:
+        return list(self._regions)
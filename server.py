@@ -5,88 +5,477 @@
 import os
 import sys
 import json
-import tempfile
-import subprocess
+import atexit
+import argparse
+import itertools
+import weakref
+import uuid
+import sqlite3
+import asyncio
 import base64
-from typing import Annotated, Dict, List, Optional
+import dataclasses
+from typing import Awaitable
 
-from fastmcp import FastMCP
+from fastmcp import FastMCP, Context
+from fastmcp.exceptions import ToolError
+from fastmcp.resources.template import FunctionResourceTemplate
+from mcp.types import TextContent, ImageContent
 from pydantic import Field
 
+from feedback_protocol import ATTACHMENT_MAX_BYTES, encode_frame, read_frame_async, make_message, expect_message, read_daemon_state
+from feedback_scheduler import FeedbackScheduler, QueueFullError
+from feedback_cache import AnswerCache
+from feedback_metrics import FeedbackMetrics, NULL_SPAN
+from feedback_history import FeedbackHistory
+from feedback_monitor import ChildMonitor, ResourceLimitError, ResourceLimits, active_usage
+from feedback_sessions import LiveSession, SessionClosedError, SessionRegistry
+from image_handoff import discard_segments, handoff_mode, new_segment_prefix, open_image, sweep_segments
+from image_pipeline import ImagePipelineConfig, process_image
+from image_store import ImageStore
+import feedback_reaper
+
 # The log_level is necessary for Cline to work: https://github.com/jlowin/fastmcp/issues/81
 mcp = FastMCP("交互式反馈 MCP", log_level="ERROR")
 
-def launch_feedback_ui(summary: str, predefinedOptions: list[str] | None = None) -> dict[str, str | list[str]]:
-    # 为反馈结果创建一个临时文件
-    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as tmp:
-        output_file = tmp.name
-
-    try:
-        # 获取相对于此脚本的feedback_ui.py路径
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        feedback_ui_path = os.path.join(script_dir, "feedback_ui.py")
-
-        # 作为单独的进程运行feedback_ui.py
-        # 注意：uv似乎有一个bug，所以我们需要
-        # 传递一堆特殊标志来使其工作
-        args = [
-            sys.executable,
-            "-u",
-            feedback_ui_path,
-            "--prompt", summary,
-            "--output-file", output_file,
-            "--predefined-options", "|||".join(predefinedOptions) if predefinedOptions else ""
-        ]
-        result = subprocess.run(
-            args,
-            check=False,
-            shell=False,
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
-            stdin=subprocess.DEVNULL,
-            close_fds=True
+# 等待用户回答期间发送进度通知的间隔（秒），让客户端知道调用仍在进行
+PROGRESS_INTERVAL = 5.0
+
+# 发送cancel后等待界面交回草稿的时间（秒），超过后直接结束界面进程
+CANCEL_GRACE_SECONDS = 3.0
+
+# 所有调用等待用户回答的最长时间（秒），0表示不限；调用的timeout参数可以设置更短的时间
+DEFAULT_TIMEOUT = float(os.environ.get("INTERACTIVE_FEEDBACK_TIMEOUT", "0"))
+
+# 同一时间最多显示的反馈窗口数，其余请求排队等待；排队的请求数超过上限时直接拒绝
+scheduler = FeedbackScheduler(
+    max_active=int(os.environ.get("INTERACTIVE_FEEDBACK_MAX_WINDOWS", "1")),
+    max_queue=int(os.environ.get("INTERACTIVE_FEEDBACK_MAX_QUEUE", "64")),
+    max_queue_per_client=int(os.environ.get("INTERACTIVE_FEEDBACK_MAX_QUEUE_PER_CLIENT", "0")),
+)
+
+# 回答的本地历史，供search_feedback_history和get_feedback_session查询；INTERACTIVE_FEEDBACK_HISTORY=0时不记录
+history = FeedbackHistory.from_env() if os.environ.get("INTERACTIVE_FEEDBACK_HISTORY", "1") != "0" else None
+
+# 排队中和已打开的反馈窗口，update_feedback_prompt按session_id推送更新
+sessions = SessionRegistry()
+
+# HTTP传输下多个客户端共用一个服务端，每个MCP会话对应一个客户端标识：客户端名称#序号
+_client_ids: "weakref.WeakKeyDictionary[object, str]" = weakref.WeakKeyDictionary()
+_client_seq = itertools.count(1)
+
+def _client_identity(ctx: Context | None) -> str:
+    if ctx is None:
+        return ""
+    try:
+        session = ctx.session
+    except (ValueError, LookupError):
+        # 不在MCP请求中（例如直接调用工具函数）
+        return ""
+    client_id = _client_ids.get(session)
+    if client_id is None:
+        params = getattr(session, "client_params", None)
+        name = params.clientInfo.name if params and params.clientInfo else "client"
+        client_id = _client_ids[session] = f"{name}#{next(_client_seq)}"
+    return client_id
+
+# 相同问题的回答缓存：有效期内再次提问时窗口提供上次的回答，正在等待回答的相同问题共享同一个窗口
+answer_cache = AnswerCache(
+    ttl=float(os.environ.get("INTERACTIVE_FEEDBACK_CACHE_TTL", "600")),
+    max_entries=int(os.environ.get("INTERACTIVE_FEEDBACK_CACHE_MAX_ENTRIES", "128")),
+)
+
+# 每次调用的耗时、响应大小和结果，通过metrics://feedback资源读取
+metrics = FeedbackMetrics.from_env()
+
+# 正在运行的反馈界面子进程的资源占用，读取指标时计算
+for _name, _description in (
+    ("children", "正在运行的反馈界面子进程数"),
+    ("children_rss_bytes", "正在运行的反馈界面子进程的总常驻内存"),
+    ("children_cpu_seconds", "正在运行的反馈界面子进程已消耗的CPU时间"),
+):
+    metrics.add_gauge(_name, _description, lambda name=_name: active_usage()[name])
+
+# 反馈界面后端及其脚本，所有后端都通过--stdio使用feedback_protocol的帧格式收发请求和结果
+FEEDBACK_BACKENDS = {
+    "qt": "feedback_ui.py",  # PySide6窗口
+    "tui": "feedback_tui.py",  # 终端界面，不导入Qt，适用于SSH和无显示器的主机
+}
+
+def _terminal_available() -> bool:
+    """能否打开控制终端；由IDE或无界面的MCP客户端启动的服务端没有控制终端"""
+    try:
+        with open("CONIN$" if os.name == "nt" else "/dev/tty", "r"):
+            return True
+    except OSError:
+        return False
+
+def _feedback_backend() -> str:
+    """读取INTERACTIVE_FEEDBACK_BACKEND（qt、tui或auto），auto在没有可用显示器时选择终端界面，
+    两者都没有或取值无效时抛出ToolError"""
+    backend = os.environ.get("INTERACTIVE_FEEDBACK_BACKEND", "auto").lower()
+    if backend == "auto":
+        # Windows和macOS总有图形界面；其他系统既没有X11/Wayland显示也没有指定Qt平台插件时无法显示窗口
+        has_display = (
+            sys.platform in ("win32", "darwin")
+            or any(os.environ.get(name) for name in ("DISPLAY", "WAYLAND_DISPLAY", "QT_QPA_PLATFORM"))
         )
-        if result.returncode != 0:
-            raise Exception(f"启动反馈UI失败: {result.returncode}")
-
-        # 从临时文件读取结果
-        with open(output_file, 'r') as f:
-            result_data = json.load(f)
-        os.unlink(output_file)
-        
-        # 处理图片路径，将图片转换为base64
-        if 'image_paths' in result_data and result_data['image_paths']:
-            image_data = []
-            for img_path in result_data['image_paths']:
-                if os.path.exists(img_path):
-                    try:
-                        with open(img_path, 'rb') as img_file:
-                            img_content = img_file.read()
-                            img_base64 = base64.b64encode(img_content).decode('utf-8')
-                            img_filename = os.path.basename(img_path)
-                            image_data.append({
-                                'filename': img_filename,
-                                'content': img_base64,
-                                'path': img_path
-                            })
-                    except Exception as e:
-                        print(f"处理图片时出错: {e}")
-            
-            # 添加图片数据到结果中
-            result_data['images'] = image_data
-        
-        return result_data
-    except Exception as e:
-        if os.path.exists(output_file):
-            os.unlink(output_file)
-        raise e
+        if has_display:
+            return "qt"
+        if _terminal_available():
+            return "tui"
+        raise ToolError(
+            "没有可用的显示器（未设置DISPLAY、WAYLAND_DISPLAY或QT_QPA_PLATFORM），也没有可用的控制终端，无法显示反馈界面"
+        )
+    if backend not in FEEDBACK_BACKENDS:
+        raise ToolError(
+            f"不支持的INTERACTIVE_FEEDBACK_BACKEND: {backend}，可选值为{', '.join([*FEEDBACK_BACKENDS, 'auto'])}"
+        )
+    return backend
+
+async def launch_feedback_ui(summary: str, predefinedOptions: list[str] | None = None, pending: int = 0, previous_answer: dict | None = None, deadline: float | None = None, span=NULL_SPAN, client: str = "", questions: list[dict] | None = None, live: LiveSession | None = None) -> dict[str, str | list[str]]:
+    # shm交接方式下界面把图片另外写入以segment_prefix开头的共享内存段
+    segment_prefix = new_segment_prefix() if handoff_mode() == "shm" else ""
+    request = make_message(
+        "request",
+        prompt=summary,
+        predefined_options=predefinedOptions or [],
+        pending=pending,
+        previous_answer=previous_answer,
+        client=client,
+        # 批量提问时的全部问题[{"prompt", "predefined_options"}]，summary和predefinedOptions是第一个问题
+        **({"questions": questions} if questions else {}),
+        # 设置INTERACTIVE_FEEDBACK_STARTUP_TRACE=1时UI进程在结果中附带各启动阶段的耗时
+        startup_trace=os.environ.get("INTERACTIVE_FEEDBACK_STARTUP_TRACE") == "1",
+        **({"segment_prefix": segment_prefix} if segment_prefix else {}),
+    )
+    if live is not None:
+        live.launching()
+    backend = _feedback_backend()
+    span.mark("launched")
+    try:
+        # Qt界面优先交给常驻UI进程显示窗口，不可用时再启动新的UI进程
+        result_data = await _launch_via_daemon(request, deadline, live) if backend == "qt" else None
+        if result_data is not None:
+            span.set(backend="daemon")
+        else:
+            span.set(backend=backend)
+            result_data = await _launch_subprocess(request, backend, deadline, span, live)
+        if live is not None:
+            span.set(updates=live.updates)
+        span.mark("answered")
+        if result_data.get("shown_at"):
+            span.mark("shown", result_data["shown_at"])
+        if result_data.get("painted_at"):
+            span.mark("painted", result_data["painted_at"])
+        # 读取和编码图片是阻塞的文件操作，放到线程中执行
+        return await asyncio.to_thread(_attach_images, result_data)
+    finally:
+        if segment_prefix:
+            # 界面被结束或结果没有交回时遗留的段
+            sweep_segments(segment_prefix)
+
+async def _read_before_deadline(read_task: asyncio.Future, writer, deadline: float | None) -> dict | None:
+    """等待结果帧；到达截止时间(loop.time())时发送cancel，界面在CANCEL_GRACE_SECONDS内交回草稿，
+    仍没有结果时抛出asyncio.TimeoutError，由调用方结束界面"""
+    try:
+        timeout = None if deadline is None else max(0.0, deadline - asyncio.get_running_loop().time())
+        done, _ = await asyncio.wait({read_task}, timeout=timeout)
+        if not done:
+            try:
+                writer.write(encode_frame(make_message("cancel")))
+                await writer.drain()
+            except (OSError, RuntimeError):
+                # 界面已经退出，结果帧（或EOF）马上就会读到
+                pass
+            done, _ = await asyncio.wait({read_task}, timeout=CANCEL_GRACE_SECONDS)
+            if not done:
+                raise asyncio.TimeoutError()
+        return read_task.result()
+    finally:
+        if not read_task.done():
+            read_task.cancel()
+
+async def _launch_via_daemon(request: dict, deadline: float | None = None, live: LiveSession | None = None) -> dict | None:
+    """通过常驻UI进程(feedback_daemon.py)显示反馈窗口，守护进程不可用时返回None"""
+    if os.environ.get("INTERACTIVE_FEEDBACK_DAEMON", "1") == "0":
+        return None
+    state = read_daemon_state()
+    if not state:
+        return None
+    try:
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection("127.0.0.1", state["port"]),
+            timeout=0.5,
+        )
+    except (OSError, asyncio.TimeoutError):
+        # 状态文件残留但守护进程已退出
+        return None
+
+    try:
+        writer.write(encode_frame({**request, "token": state["token"]}))
+        if live is not None:
+            live.attach(writer)
+        await writer.drain()
+        # 调用被取消或超时后没有交回草稿时关闭连接，守护进程会随之关闭窗口
+        response = await _read_before_deadline(asyncio.ensure_future(read_frame_async(reader)), writer, deadline)
+    finally:
+        if live is not None:
+            live.detach()
+        writer.close()
+    return expect_message(response, "result")["result"]
+
+async def _launch_subprocess(request: dict, backend: str = "qt", deadline: float | None = None, span=NULL_SPAN,
+                             live: LiveSession | None = None) -> dict:
+    # 获取相对于此脚本的后端脚本路径
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    feedback_ui_path = os.path.join(script_dir, FEEDBACK_BACKENDS[backend])
+
+    # 作为单独的进程运行后端脚本，请求和结果通过stdin/stdout的长度前缀JSON帧传递，
+    # 提示文本不经过命令行，不受参数长度限制
+    # 注意：uv似乎有一个bug，所以我们需要
+    # 传递一堆特殊标志来使其工作
+    args = [
+        sys.executable,
+        "-u",
+        feedback_ui_path,
+        "--stdio",
+    ]
+    process = await asyncio.create_subprocess_exec(
+        *args,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.DEVNULL,
+        stdin=asyncio.subprocess.PIPE,
+        close_fds=True
+    )
+    # 登记子进程，服务端异常退出后由下一次启动的服务端结束遗留的窗口
+    feedback_reaper.register_child(process.pid)
+    # 定期采样子进程的内存和CPU时间，超出上限时结束子进程
+    monitor = ChildMonitor(process.pid, ResourceLimits.from_env())
+    monitor.start()
+    try:
+        process.stdin.write(encode_frame(request))
+        if live is not None:
+            live.attach(process.stdin)
+        await process.stdin.drain()
+        response = await _read_before_deadline(
+            asyncio.ensure_future(read_frame_async(process.stdout)), process.stdin, deadline
+        )
+        # 界面退出前再采样一次，CPU时间尽量完整
+        monitor.sample()
+        try:
+            returncode = await asyncio.wait_for(process.wait(), timeout=CANCEL_GRACE_SECONDS)
+        except asyncio.TimeoutError:
+            # 已经拿到结果，界面却没有退出
+            process.kill()
+            returncode = await process.wait()
+    except BaseException:
+        # 调用被取消、超时或通信失败，关闭仍在显示的反馈窗口
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+        raise
+    finally:
+        if live is not None:
+            live.detach()
+        feedback_reaper.unregister_child(process.pid)
+        span.set(**monitor.stop())
+    if response is None:
+        if monitor.exceeded is not None:
+            raise ResourceLimitError(monitor.exceeded)
+        raise Exception(f"启动反馈UI失败: {returncode}")
+    return expect_message(response, "result")["result"]
+
+def _image_mode() -> str:
+    """图片返回方式：inline作为MCP图片内容块随结果返回，resource只返回feedback://images/资源URI由客户端按需读取"""
+    image_mode = os.environ.get("INTERACTIVE_FEEDBACK_IMAGE_MODE", "inline").lower()
+    if image_mode not in ("inline", "resource"):
+        raise ValueError(f"不支持的图片返回方式: {image_mode}")
+    return image_mode
+
+def _attach_images(result_data: dict) -> dict:
+    # 处理图片路径，按图片处理配置缩放、压缩后转换为base64；批量提问时逐个处理每个回答的图片，共用响应的大小预算
+    targets = [result_data, *result_data.get('answers', [])]
+    # shm交接方式下界面交回的共享内存段：图片路径 -> {"name", "size"}
+    segments = result_data.pop('image_segments', None) or {}
+    for target in targets:
+        if target.get('file_paths'):
+            target['attachments'] = _read_attachments(target['file_paths'])
+    try:
+        if any(target.get('image_paths') for target in targets):
+            config = ImagePipelineConfig.from_env()
+            image_mode = _image_mode()
+            store = ImageStore.from_env()
+            handoff = handoff_mode()
+            remaining = config.max_response_bytes
+            for target in targets:
+                if target.get('image_paths'):
+                    # 添加图片数据到结果中
+                    target['images'], remaining = _encode_images(
+                        target['image_paths'], config, image_mode, store, remaining, segments, handoff
+                    )
+    finally:
+        discard_segments(segments)
+
+    return result_data
+
+def _encode_images(image_paths: list[str], config: ImagePipelineConfig, image_mode: str, store: ImageStore,
+                   remaining: int, segments: dict | None = None, handoff: str = "file") -> tuple[list[dict], int]:
+    """返回图片说明（inline模式下包含编码后的内容）和剩余的响应预算"""
+    image_data = []
+    for img_path in image_paths:
+        if os.path.exists(img_path):
+            img_filename = os.path.basename(img_path)
+            try:
+                if image_mode == "resource" and store.resolve(img_filename):
+                    # 只返回资源URI，图片在客户端读取资源时才处理和传输
+                    image_data.append({
+                        'filename': img_filename,
+                        'uri': f"feedback://images/{img_filename}",
+                        'path': img_path,
+                        'original_size': os.path.getsize(img_path),
+                    })
+                    continue
+                # 透传的图片直接从共享内存段或映射的文件编码为base64，用完后才释放缓冲区
+                with open_image(img_path, segments if segments is not None else {}, handoff) as img_content:
+                    encoded = process_image(img_content, config, min(config.max_image_bytes, remaining))
+                    if encoded is None:
+                        # 即使缩到最小也放不进剩余的响应预算，只返回说明
+                        image_data.append({
+                            'filename': img_filename,
+                            'path': img_path,
+                            'original_size': len(img_content),
+                            'omitted': '超出图片大小预算',
+                        })
+                        continue
+                    remaining -= encoded.encoded_size
+                    stem, _ = os.path.splitext(img_filename)
+                    image_data.append({
+                        'filename': f"{stem}.{'jpg' if encoded.format == 'jpeg' else encoded.format}",
+                        'content': base64.b64encode(encoded.data).decode('utf-8'),
+                        'mime_type': encoded.mime_type,
+                        'path': img_path,
+                        'width': encoded.width,
+                        'height': encoded.height,
+                        'original_size': encoded.original_size,
+                        'encoded_size': encoded.encoded_size,
+                    })
+            except Exception as e:
+                print(f"处理图片时出错: {e}", file=sys.stderr)
+    return image_data, remaining
+
+def _read_attachments(file_paths: list[str]) -> list[dict]:
+    """读取附加的非图片文件（如日志片段）的文本内容，每个文件最多ATTACHMENT_MAX_BYTES字节，超出部分截断"""
+    attachments = []
+    for file_path in file_paths:
+        try:
+            size = os.path.getsize(file_path)
+            with open(file_path, 'rb') as f:
+                data = f.read(ATTACHMENT_MAX_BYTES)
+        except OSError as e:
+            print(f"读取附件时出错: {e}", file=sys.stderr)
+            continue
+        attachment = {
+            'filename': os.path.basename(file_path),
+            'path': file_path,
+            'size': size,
+            'content': data.decode('utf-8', errors='replace'),
+        }
+        if size > len(data):
+            attachment['truncated'] = True
+        attachments.append(attachment)
+    return attachments
+
+def _split_images(images: list[dict], image_contents: list[ImageContent]) -> list[dict]:
+    """把内联图片的内容取出作为图片内容块追加到image_contents，返回不含内容的图片说明"""
+    metadata = []
+    for image in images:
+        image = dict(image)
+        content = image.pop('content', None)
+        if content is not None:
+            image_contents.append(ImageContent(type="image", data=content, mimeType=image['mime_type']))
+        metadata.append(image)
+    return metadata
+
+def _build_tool_result(result: dict) -> list[TextContent | ImageContent]:
+    """把反馈结果转换为MCP内容：文本块中是反馈和图片说明，图片本身作为图片内容块，不再内嵌在JSON里"""
+    response = {
+        'interactive_feedback': result.get('interactive_feedback', '')
+    }
+    # 记录到历史时附带会话编号；超时结果附带超时时间和用户尚未提交的草稿
+    for key in ('session_id', 'timed_out', 'timeout_seconds', 'draft'):
+        if key in result:
+            response[key] = result[key]
+    image_contents = []
+    if result.get('images'):
+        response['images'] = _split_images(result['images'], image_contents)
+    if result.get('attachments'):
+        response['attachments'] = result['attachments']
+    text = TextContent(type="text", text=json.dumps(response, ensure_ascii=False, indent=2))
+    return [text, *image_contents]
+
+def _build_batch_tool_result(messages: list[str], result: dict) -> list[TextContent | ImageContent]:
+    """批量提问的MCP内容：文本块中按顺序列出每个问题的回答和图片说明，图片内容块按问题顺序排列"""
+    response = {}
+    for key in ('session_id', 'timed_out', 'timeout_seconds'):
+        if key in result:
+            response[key] = result[key]
+    answers = result.get('answers') or []
+    image_contents = []
+    response['answers'] = []
+    for index, message in enumerate(messages):
+        answer = answers[index] if index < len(answers) else {}
+        item = {'message': message, 'interactive_feedback': answer.get('interactive_feedback', '')}
+        if 'draft' in answer:
+            item['draft'] = answer['draft']
+        if answer.get('images'):
+            item['images'] = _split_images(answer['images'], image_contents)
+        if answer.get('attachments'):
+            item['attachments'] = answer['attachments']
+        response['answers'].append(item)
+    text = TextContent(type="text", text=json.dumps(response, ensure_ascii=False, indent=2))
+    return [text, *image_contents]
+
+async def _wait_with_progress(task: asyncio.Task, ctx: Context | None, deadline: float | None = None,
+                              session_id: str = ""):
+    """等待任务完成，期间定期发送MCP进度通知；调用被取消时一并取消任务，
+    超过deadline(loop.time())时取消任务并抛出asyncio.TimeoutError。
+    进度通知中带有session_id，第一条在开始等待时立即发送，AI可以用它调用update_feedback_prompt"""
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    suffix = f"，session_id={session_id}" if session_id else ""
+    try:
+        if ctx is not None and session_id:
+            await ctx.report_progress(0, message=f"等待用户反馈中（session_id={session_id}，可用update_feedback_prompt更新提示）")
+        while True:
+            timeout = PROGRESS_INTERVAL
+            if deadline is not None:
+                if loop.time() >= deadline:
+                    raise asyncio.TimeoutError()
+                timeout = min(timeout, deadline - loop.time())
+            done, _ = await asyncio.wait({task}, timeout=timeout)
+            if done:
+                return task.result()
+            if deadline is not None and loop.time() >= deadline:
+                continue
+            if ctx is not None:
+                elapsed = loop.time() - started
+                await ctx.report_progress(elapsed, message=f"等待用户反馈中（已等待{int(elapsed)}秒{suffix}）")
+    finally:
+        if not task.done():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
 
 @mcp.tool()
-def interactive_feedback(
+async def interactive_feedback(
     message: str = Field(description="向用户提出的具体问题"),
     predefined_options: list = Field(default=None, description="提供给用户选择的预定义选项（可选）"),
-) -> Dict[str, str | List[Dict[str, str]]]:
+    priority: int = Field(default=0, description="优先级（可选），多个问题排队时数值大的先显示，相同优先级先到先显示"),
+    timeout: float = Field(default=0, description="等待用户回答的最长时间（秒，可选），0表示不限；超时后返回timed_out和用户已输入的草稿"),
+    ctx: Context = None,
+) -> list[TextContent | ImageContent]:
     """向用户请求交互式反馈，支持文本和图片"""
+    timeout_seconds, deadline = _call_deadline(timeout)
+
     # 如果没有提供预定义选项，使用默认选项
     predefined_options_list = predefined_options if isinstance(predefined_options, list) else None
     
@@ -100,18 +489,357 @@ def interactive_feedback(
             "没有修复任何错误",
         ]
     
-    result = launch_feedback_ui(message, predefined_options_list)
-    
-    # 构建返回结果
-    response = {
-        'interactive_feedback': result.get('interactive_feedback', '')
-    }
-    
-    # 如果有图片，添加到返回结果中
-    if 'images' in result and result['images']:
-        response['images'] = result['images']
-    
-    return response
+    client = _client_identity(ctx)
+    session_id = uuid.uuid4().hex[:12]
+    span = metrics.span(
+        client=client, prompt_bytes=len(message.encode("utf-8")), options=len(predefined_options_list), priority=priority
+    )
+    live = sessions.open(session_id, client, [{'prompt': message, 'predefined_options': predefined_options_list}])
+    try:
+        outcome, result = await _traced(
+            span, _ask(message, predefined_options_list, priority, timeout_seconds, deadline, ctx, span, client, live)
+        )
+    finally:
+        sessions.close(live)
+    contents = None
+    try:
+        # 历史中记录用户最后看到的提示和选项，包括update_feedback_prompt所做的更新
+        question = live.questions[0]
+        if await _record_history(session_id, client, outcome, [{
+            **result,
+            'prompt': question['prompt'],
+            'predefined_options': question['predefined_options'],
+            'interactive_feedback': result.get('draft', result.get('interactive_feedback', '')),
+        }]):
+            result['session_id'] = session_id
+        contents = _build_tool_result(result)
+        return contents
+    finally:
+        _finish_span(span, outcome, contents, len(result.get('images') or []))
+
+def _call_deadline(timeout: float) -> tuple[float | None, float | None]:
+    """调用的超时和全局超时中较短的一个，从调用开始计时，包括排队等待的时间；返回(超时秒数, loop.time()截止时间)"""
+    timeout_seconds = min((t for t in (timeout, DEFAULT_TIMEOUT) if t and t > 0), default=None)
+    deadline = asyncio.get_running_loop().time() + timeout_seconds if timeout_seconds else None
+    return timeout_seconds, deadline
+
+def _backstop_deadline(deadline: float | None) -> float | None:
+    # 界面收到cancel后需要一点时间交回草稿，这里的截止时间留出余量；
+    # 只有仍在排队或界面没有响应时才由这里结束等待，此时没有草稿
+    return deadline + CANCEL_GRACE_SECONDS + 1.0 if deadline is not None else None
+
+async def _traced(span, ask: Awaitable[tuple[str, dict]]) -> tuple[str, dict]:
+    """等待调用结果，失败时记录span；队列已满和界面超出资源上限转换为工具错误返回给客户端"""
+    try:
+        return await ask
+    except asyncio.CancelledError:
+        span.finish("cancelled")
+        raise
+    except QueueFullError as e:
+        span.finish("rejected")
+        raise ToolError(str(e)) from e
+    except ResourceLimitError as e:
+        span.finish("killed")
+        raise ToolError(str(e)) from e
+    except Exception as e:
+        span.finish("error", error=type(e).__name__)
+        raise
+
+def _finish_span(span, outcome: str, contents: list[TextContent | ImageContent] | None, images: int):
+    """结束span；contents为None表示记录历史或构造结果时出错，此时记为error"""
+    if not metrics.enabled:
+        return
+    if contents is None:
+        error = sys.exc_info()[1]
+        span.finish("error", error=type(error).__name__ if error is not None else None)
+    else:
+        span.finish(
+            outcome,
+            images=images,
+            response_bytes=sum(
+                len(content.text.encode("utf-8")) if isinstance(content, TextContent) else len(content.data)
+                for content in contents
+            ),
+        )
+
+async def _ask(message: str, predefined_options_list: list[str], priority: int, timeout_seconds: float | None,
+               deadline: float | None, ctx: Context | None, span, client: str, live: LiveSession) -> tuple[str, dict]:
+    """查缓存、排队并显示反馈界面，返回(结果类别, 反馈结果)"""
+    cache_key = AnswerCache.key(message, predefined_options_list)
+    previous_answer = answer_cache.get(cache_key)
+    if previous_answer and os.environ.get("INTERACTIVE_FEEDBACK_CACHE_AUTO_REUSE") == "1":
+        # 不打开窗口，直接返回有效期内的上次回答
+        result = await asyncio.to_thread(_attach_images, {
+            'interactive_feedback': previous_answer['interactive_feedback'],
+            'image_paths': previous_answer['image_paths'],
+            'file_paths': previous_answer.get('file_paths') or [],
+        })
+        return "cached", result
+
+    # 并发的请求在调度器中排队，同一时间只显示一个窗口；相同的问题合并为一个请求。
+    # 轮到显示时才读取提示和选项，排队期间的更新随请求一起发送
+    question = live.questions[0]
+    job = lambda: launch_feedback_ui(
+        question['prompt'], question['predefined_options'], scheduler.pending, previous_answer, deadline, span, client,
+        live=live,
+    )
+    # 共享的窗口在发起者的截止时间收回草稿，截止时间更晚（或不限时）的调用不能加入，否则拿不到自己的回答
+    waiting, (_, leader) = answer_cache.coalesce(
+        cache_key, lambda: scheduler.run(job, priority, client), owner=(deadline, live),
+        can_join=lambda owner: owner[0] is None or (deadline is not None and deadline <= owner[0]),
+    )
+    if leader is not live:
+        # 合并到已有的窗口：update_feedback_prompt对本调用session_id的更新推送到该窗口
+        live.join(leader)
+    try:
+        result = await _wait_with_progress(
+            asyncio.create_task(waiting), ctx, _backstop_deadline(deadline), live.session_id,
+        )
+    except asyncio.TimeoutError:
+        result = {'interactive_feedback': '', 'image_paths': [], 'cancelled': True}
+    if result.get('cancelled'):
+        return "timeout", {
+            **result,
+            'interactive_feedback': '',
+            'timed_out': True,
+            'timeout_seconds': timeout_seconds,
+            'draft': result.get('interactive_feedback', ''),
+        }
+    # 关闭窗口未回答时不缓存
+    if not (result.get('interactive_feedback') or result.get('image_paths') or result.get('file_paths')):
+        return "empty", result
+    answer_cache.put(cache_key, {
+        'interactive_feedback': result.get('interactive_feedback', ''),
+        'image_paths': list(result.get('image_paths') or []),
+        'file_paths': list(result.get('file_paths') or []),
+    })
+    return "answered", result
+
+@mcp.tool()
+async def interactive_feedback_batch(
+    questions: list[dict] = Field(description="在同一个窗口中依次提出的问题，每项为{\"message\": 问题, \"predefined_options\": [预定义选项（可选）]}"),
+    priority: int = Field(default=0, description="优先级（可选），多个问题排队时数值大的先显示，相同优先级先到先显示"),
+    timeout: float = Field(default=0, description="等待用户回答全部问题的最长时间（秒，可选），0表示不限；超时后返回timed_out和每个问题已输入的草稿"),
+    ctx: Context = None,
+) -> list[TextContent | ImageContent]:
+    """一次提出多个问题：在同一个反馈窗口中逐个显示，只需一次往返，按顺序返回每个问题的回答（文本和图片）"""
+    items = []
+    for index, question in enumerate(questions or [], 1):
+        message = question.get("message") if isinstance(question, dict) else None
+        if not isinstance(message, str) or not message.strip():
+            raise ToolError(f"第{index}个问题缺少message")
+        options = question.get("predefined_options")
+        items.append({
+            "prompt": message,
+            "predefined_options": [str(option) for option in options] if isinstance(options, list) else [],
+        })
+    if not items:
+        raise ToolError("questions不能为空")
+
+    timeout_seconds, deadline = _call_deadline(timeout)
+    client = _client_identity(ctx)
+    session_id = uuid.uuid4().hex[:12]
+    span = metrics.span(
+        client=client,
+        prompt_bytes=sum(len(item["prompt"].encode("utf-8")) for item in items),
+        options=sum(len(item["predefined_options"]) for item in items),
+        priority=priority,
+        questions=len(items),
+    )
+    live = sessions.open(session_id, client, items)
+    try:
+        outcome, result = await _traced(span, _ask_batch(live, priority, timeout_seconds, deadline, ctx, span, client))
+    finally:
+        sessions.close(live)
+    answers = result.get('answers') or []
+    contents = None
+    try:
+        if await _record_history(session_id, client, outcome, [
+            {**answer, **item, 'interactive_feedback': answer.get('draft', answer.get('interactive_feedback', ''))}
+            for item, answer in zip(live.questions, answers)
+        ]):
+            result['session_id'] = session_id
+        contents = _build_batch_tool_result([item["prompt"] for item in items], result)
+        return contents
+    finally:
+        _finish_span(span, outcome, contents, sum(len(answer.get('images') or []) for answer in answers))
+
+async def _ask_batch(live: LiveSession, priority: int, timeout_seconds: float | None, deadline: float | None,
+                     ctx: Context | None, span, client: str) -> tuple[str, dict]:
+    """排队并在一个反馈界面中显示全部问题，返回(结果类别, 反馈结果)；批量提问不使用回答缓存"""
+    items = live.questions
+    job = lambda: launch_feedback_ui(
+        items[0]["prompt"], items[0]["predefined_options"], scheduler.pending, previous_answer=None, deadline=deadline,
+        span=span, client=client, questions=items, live=live,
+    )
+    try:
+        result = await _wait_with_progress(
+            asyncio.create_task(scheduler.run(job, priority, client)), ctx, _backstop_deadline(deadline), live.session_id
+        )
+    except asyncio.TimeoutError:
+        result = {'interactive_feedback': '', 'image_paths': [], 'answers': [], 'cancelled': True}
+    answers = result.get('answers') or []
+    if result.get('cancelled'):
+        return "timeout", {
+            **result,
+            'timed_out': True,
+            'timeout_seconds': timeout_seconds,
+            'answers': [
+                {**answer, 'interactive_feedback': '', 'draft': answer.get('interactive_feedback', '')}
+                for answer in answers
+            ],
+        }
+    if not any(
+        answer.get('interactive_feedback') or answer.get('image_paths') or answer.get('file_paths') for answer in answers
+    ):
+        return "empty", result
+    return "answered", result
+
+async def _record_history(session_id: str, client: str, outcome: str, items: list[dict]) -> bool:
+    """把回答和超时时的草稿追加到历史记录，返回是否已记录；写入失败不影响工具调用"""
+    if history is None or outcome not in ("answered", "timeout"):
+        return False
+    if not any(item.get('interactive_feedback') or item.get('image_paths') or item.get('file_paths') for item in items):
+        return False
+    try:
+        await asyncio.to_thread(history.record, session_id, client, outcome, items)
+    except (sqlite3.Error, OSError) as e:
+        print(f"写入反馈历史时出错: {e}", file=sys.stderr)
+        return False
+    return True
+
+def _history() -> FeedbackHistory:
+    if history is None:
+        raise ToolError("反馈历史已禁用（INTERACTIVE_FEEDBACK_HISTORY=0）")
+    return history
+
+@mcp.tool()
+async def update_feedback_prompt(
+    session_id: str = Field(default="", description="interactive_feedback或interactive_feedback_batch的session_id（在等待回答时的进度通知和feedback://sessions资源中）；为空时更新本客户端唯一打开的反馈窗口"),
+    append: str = Field(default="", description="追加到提示末尾的文本，例如最新的进度"),
+    summary: str | None = Field(default=None, description="替换整个提示的新文本（可选）"),
+    options: list = Field(default=None, description="追加的预定义选项（可选），已有的选项不会重复添加"),
+    question: int = Field(default=1, description="批量提问时要更新的问题序号，从1开始"),
+    ctx: Context = None,
+) -> str:
+    """更新正在等待回答的反馈窗口：追加进度、替换提示或追加选项，不会重新打开窗口，用户已输入的回答和勾选保持不变。
+    原来的interactive_feedback调用继续等待，用户提交后照常返回回答"""
+    if not append and summary is None and not options:
+        raise ToolError("append、summary和options至少需要提供一个")
+    try:
+        live = sessions.find(session_id, _client_identity(ctx))
+        if not 1 <= question <= len(live.questions):
+            raise ToolError(f"question必须在1到{len(live.questions)}之间")
+        target = await live.update(
+            question - 1, summary, append, [str(option) for option in options] if isinstance(options, list) else None
+        )
+    except SessionClosedError as e:
+        raise ToolError(str(e)) from e
+    return json.dumps({
+        'session_id': live.session_id,
+        'state': (live.shared or live).state,
+        'question': question,
+        'prompt_chars': len(target['prompt']),
+        'predefined_options': len(target['predefined_options']),
+    }, ensure_ascii=False, indent=2)
+
+@mcp.tool()
+async def search_feedback_history(
+    query: str = Field(default="", description="关键词，多个关键词用空格分隔，全部出现才匹配；为空时返回最近的回答"),
+    limit: int = Field(default=10, description="返回的最大记录数（1-100）"),
+    client: str = Field(default="", description="只搜索某个客户端的回答（可选），例如cursor"),
+) -> str:
+    """搜索用户以前的回答（问题、选项、选择和回答文本）。提问之前先搜索，用户已经回答过的问题不要重复提问；
+    结果中的文本会截断，用get_feedback_session读取完整内容"""
+    records = await asyncio.to_thread(_history().search, query, min(100, max(1, limit)), client)
+    return json.dumps({'results': records}, ensure_ascii=False, indent=2)
+
+@mcp.tool()
+async def get_feedback_session(
+    session_id: str = Field(description="interactive_feedback返回的或search_feedback_history结果中的session_id"),
+) -> str:
+    """读取一次提问的完整记录：每个问题的提示、选项、用户的选择、回答文本以及图片和文件路径"""
+    records = await asyncio.to_thread(_history().session, session_id)
+    if not records:
+        raise ToolError(f"没有找到会话: {session_id}")
+    return json.dumps({'session_id': session_id, 'records': records}, ensure_ascii=False, indent=2)
+
+@mcp.resource("feedback://scheduler", mime_type="application/json")
+def scheduler_stats() -> str:
+    """反馈请求调度器的状态：当前排队的请求及其等待时间、最近请求的排队时间统计"""
+    return json.dumps(scheduler.stats(), ensure_ascii=False)
+
+@mcp.resource("feedback://sessions", mime_type="application/json")
+def sessions_stats() -> str:
+    """排队中和已打开的反馈窗口：session_id、客户端、状态（queued、launching、open）、提示开头和已推送的更新数"""
+    return json.dumps(sessions.stats(), ensure_ascii=False)
+
+@mcp.resource("feedback://cache", mime_type="application/json")
+def cache_stats() -> str:
+    """回答缓存的状态：条目数、命中/未命中次数、合并的并发请求数和淘汰次数"""
+    return json.dumps(answer_cache.stats(), ensure_ascii=False)
+
+@mcp.resource("feedback://history", mime_type="application/json")
+async def history_stats() -> str:
+    """反馈历史的状态：记录数、会话数、最早和最新的记录时间、数据库大小和保留上限"""
+    return json.dumps(await asyncio.to_thread(_history().stats), ensure_ascii=False)
+
+@mcp.resource("metrics://feedback", mime_type="application/json")
+def feedback_metrics() -> str:
+    """调用指标（JSON）：按结果统计的调用次数，排队、启动、首次绘制、停留时间和响应大小的直方图，以及最近的调用记录"""
+    return json.dumps(metrics.to_json(), ensure_ascii=False)
+
+@mcp.resource("metrics://feedback/prometheus", mime_type="text/plain")
+def feedback_metrics_prometheus() -> str:
+    """与metrics://feedback相同的指标，Prometheus文本格式"""
+    return metrics.to_prometheus()
+
+def _stored_image_format(name: str) -> str:
+    """图片存储中文件的格式，按扩展名确定"""
+    extension = os.path.splitext(name)[1].lower().lstrip(".")
+    return "jpeg" if extension == "jpg" else extension or "png"
+
+async def feedback_image(name: str) -> bytes:
+    """反馈中附带的图片，保持存储中的格式，按图片处理配置缩放、压缩后返回"""
+    def load() -> bytes:
+        path = ImageStore.from_env().resolve(name)
+        if path is None:
+            raise ValueError(f"图片不存在: {name}")
+        # 返回的格式与扩展名一致，资源的MIME类型才能在读取前按文件名确定
+        config = dataclasses.replace(ImagePipelineConfig.from_env(), format=_stored_image_format(name))
+        with open(path, 'rb') as img_file:
+            encoded = process_image(img_file.read(), config)
+        if encoded is None:
+            raise ValueError(f"图片超出大小预算: {name}")
+        return encoded.data
+    return await asyncio.to_thread(load)
+
+class _ImageResourceTemplate(FunctionResourceTemplate):
+    """feedback://images/{name}：每次读取时按图片的扩展名设置MIME类型"""
+
+    async def create_resource(self, uri, params):
+        resource = await super().create_resource(uri, params)
+        resource.mime_type = f"image/{_stored_image_format(params['name'])}"
+        return resource
+
+mcp.add_template(_ImageResourceTemplate.from_function(feedback_image, "feedback://images/{name}", mime_type="image/png"))
 
 if __name__ == "__main__":
-    mcp.run(transport="stdio")
+    parser = argparse.ArgumentParser(description="运行交互式反馈MCP服务端")
+    parser.add_argument(
+        "--transport", choices=["stdio", "streamable-http", "sse"],
+        default=os.environ.get("INTERACTIVE_FEEDBACK_TRANSPORT", "stdio"),
+        help="stdio为每个客户端启动一个服务端；streamable-http和sse让多个客户端共用一个服务端和一个反馈队列",
+    )
+    parser.add_argument("--host", default=os.environ.get("INTERACTIVE_FEEDBACK_HOST", "127.0.0.1"), help="HTTP传输监听的地址")
+    parser.add_argument("--port", type=int, default=int(os.environ.get("INTERACTIVE_FEEDBACK_PORT", "8765")), help="HTTP传输监听的端口")
+    args = parser.parse_args()
+
+    # 结束之前异常退出的服务端遗留的反馈界面；正常退出时结束自己启动的界面
+    feedback_reaper.reap_orphans()
+    sweep_segments()
+    atexit.register(feedback_reaper.reap_own_children)
+    if args.transport == "stdio":
+        mcp.run(transport="stdio")
+    else:
+        mcp.run(transport=args.transport, host=args.host, port=args.port)
@@ -0,0 +1,5 @@
+# 服务端模块位于仓库根目录，测试直接导入
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,185 @@
+# AnswerCache的单元测试：合并相同请求、取消等待者、有效期和淘汰
+import asyncio
+import types
+
+import pytest
+
+import feedback_cache
+from feedback_cache import AnswerCache
+
+
+def _can_join(deadline):
+    """与server._ask相同的规则：发起者不限时，或加入者的截止时间不晚于发起者"""
+    return lambda leader: leader is None or (deadline is not None and deadline <= leader)
+
+
+def test_joiner_gets_leaders_answer():
+    async def main():
+        cache = AnswerCache()
+        calls = []
+        release = asyncio.Event()
+
+        async def job():
+            calls.append(1)
+            await release.wait()
+            return {"interactive_feedback": "ok"}
+
+        first, first_owner = cache.coalesce("k", job, owner="leader")
+        second, second_owner = cache.coalesce("k", job, owner="joiner")
+        assert first_owner == second_owner == "leader"
+        release.set()
+        results = await asyncio.gather(first, second)
+        assert results == [{"interactive_feedback": "ok"}] * 2
+        assert calls == [1]
+        stats = cache.stats()
+        assert stats["coalesced"] == 1
+        assert stats["in_flight"] == 0
+
+    asyncio.run(main())
+
+
+@pytest.mark.parametrize("leader_deadline, joiner_deadline", [(10.0, 20.0), (10.0, None)])
+def test_later_deadline_does_not_join(leader_deadline, joiner_deadline):
+    async def main():
+        cache = AnswerCache()
+        release = asyncio.Event()
+
+        def job(answer):
+            async def run():
+                await release.wait()
+                return answer
+            return run
+
+        first, first_owner = cache.coalesce(
+            "k", job("leader"), owner=leader_deadline, can_join=_can_join(leader_deadline)
+        )
+        second, second_owner = cache.coalesce(
+            "k", job("own"), owner=joiner_deadline, can_join=_can_join(joiner_deadline)
+        )
+        assert first_owner == leader_deadline
+        assert second_owner == joiner_deadline
+        release.set()
+        assert await asyncio.gather(first, second) == ["leader", "own"]
+        assert cache.stats()["coalesced"] == 0
+
+    asyncio.run(main())
+
+
+def test_earlier_deadline_joins_unlimited_leader():
+    async def main():
+        cache = AnswerCache()
+
+        async def job():
+            return "leader"
+
+        first, _ = cache.coalesce("k", job, owner=None, can_join=_can_join(None))
+        second, owner = cache.coalesce("k", job, owner=5.0, can_join=_can_join(5.0))
+        assert owner is None
+        assert await asyncio.gather(first, second) == ["leader", "leader"]
+
+    asyncio.run(main())
+
+
+def test_cancelling_waiters():
+    async def main():
+        cache = AnswerCache()
+        release = asyncio.Event()
+
+        async def job():
+            await release.wait()
+            return "answer"
+
+        first = asyncio.ensure_future(cache.coalesce("k", job)[0])
+        second = asyncio.ensure_future(cache.coalesce("k", job)[0])
+        third = asyncio.ensure_future(cache.coalesce("k", job)[0])
+        await asyncio.sleep(0)
+        flight = cache._in_flight["k"]
+        assert flight.waiters == 3
+
+        # 还有其他等待者时，共享的请求继续进行
+        first.cancel()
+        await asyncio.gather(first, return_exceptions=True)
+        assert not flight.task.cancelled()
+        assert flight.waiters == 2
+
+        second.cancel()
+        await asyncio.gather(second, return_exceptions=True)
+        assert not flight.task.done()
+
+        # 最后一个等待者取消时取消请求本身
+        third.cancel()
+        await asyncio.gather(third, return_exceptions=True)
+        await asyncio.sleep(0)
+        assert flight.task.cancelled()
+        assert flight.waiters == 0
+        assert cache.stats()["in_flight"] == 0
+
+    asyncio.run(main())
+
+
+def test_remaining_waiter_gets_answer_after_cancel():
+    async def main():
+        cache = AnswerCache()
+        release = asyncio.Event()
+
+        async def job():
+            await release.wait()
+            return "answer"
+
+        first = asyncio.ensure_future(cache.coalesce("k", job)[0])
+        second = asyncio.ensure_future(cache.coalesce("k", job)[0])
+        await asyncio.sleep(0)
+        first.cancel()
+        release.set()
+        assert await second == "answer"
+        with pytest.raises(asyncio.CancelledError):
+            await first
+
+    asyncio.run(main())
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """替换feedback_cache使用的time.time"""
+    now = [1000.0]
+    monkeypatch.setattr(feedback_cache, "time", types.SimpleNamespace(time=lambda: now[0]))
+    return now
+
+
+def test_ttl_expiry(clock):
+    cache = AnswerCache(ttl=60)
+    cache.put("k", {"interactive_feedback": "ok"})
+    assert cache.get("k") == {"interactive_feedback": "ok", "answered_at": 1000.0}
+    clock[0] += 61
+    assert cache.get("k") is None
+    # 已过期的条目被删除，再次查询只计一次未命中
+    assert cache.get("k") is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"], stats["entries"]) == (1, 2, 1, 0)
+    assert stats["hit_rate"] == round(1 / 3, 3)
+
+
+def test_lru_eviction(clock):
+    cache = AnswerCache(max_entries=2)
+    cache.put("a", {"n": 1})
+    cache.put("b", {"n": 2})
+    # 读取a使b成为最久未使用的条目
+    assert cache.get("a")["n"] == 1
+    cache.put("c", {"n": 3})
+    assert cache.get("b") is None
+    assert cache.get("a")["n"] == 1
+    assert cache.get("c")["n"] == 3
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"], stats["entries"]) == (3, 1, 1, 2)
+
+
+def test_zero_ttl_does_not_store():
+    cache = AnswerCache(ttl=0)
+    cache.put("k", {"n": 1})
+    assert cache.get("k") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_key_normalizes_whitespace():
+    assert AnswerCache.key("  hello\n world ", ["a  b"]) == AnswerCache.key("hello world", ["a b"])
+    assert AnswerCache.key("q", ["a", "b"]) != AnswerCache.key("q", ["b", "a"])
@@ -0,0 +1,105 @@
+# FeedbackHistory的单元测试：全文搜索、会话记录和保留上限
+import time
+
+import pytest
+
+import feedback_history
+from feedback_history import SNIPPET_CHARS, FeedbackHistory
+
+
+@pytest.fixture
+def history(tmp_path):
+    history = FeedbackHistory(str(tmp_path / "history.sqlite3"))
+    yield history
+    history.close()
+
+
+def _item(prompt: str, feedback: str = "", **fields) -> dict:
+    return {"prompt": prompt, "interactive_feedback": feedback, **fields}
+
+
+def _prompts(records: list) -> list:
+    return [record["prompt"] for record in records]
+
+
+def test_search_chinese_fragments(history):
+    history.record("s1", "cursor#1", "answered", [_item("是否需要重构数据库访问层", "先不要重构")])
+    history.record("s2", "cursor#1", "answered", [_item("部署到生产环境吗", "明天再部署")])
+    assert _prompts(history.search("数据库")) == ["是否需要重构数据库访问层"]
+    # 关键词同时搜索提示和回答
+    assert _prompts(history.search("明天再")) == ["部署到生产环境吗"]
+    # 所有关键词都须出现
+    assert _prompts(history.search("数据库 生产环境")) == []
+
+
+def test_search_short_terms_and_newest_first(history):
+    for n in range(3):
+        history.record(f"s{n}", "cursor#1", "answered", [_item(f"问题{n}", "UI 50%")])
+    # 少于3个字符的关键词不能使用trigram索引，改为LIKE过滤；%按字面匹配
+    assert _prompts(history.search("UI")) == ["问题2", "问题1", "问题0"]
+    assert _prompts(history.search("0%")) == ["问题2", "问题1", "问题0"]
+    assert _prompts(history.search("问题1 UI")) == ["问题1"]
+    assert _prompts(history.search("", limit=2)) == ["问题2", "问题1"]
+
+
+def test_search_by_client(history):
+    history.record("s1", "cursor#1", "answered", [_item("提交代码吗")])
+    history.record("s2", "cursor#2", "answered", [_item("提交代码吗")])
+    history.record("s3", "claude-code#1", "answered", [_item("提交代码吗")])
+    assert [record["client"] for record in history.search("提交代码", client="cursor")] == ["cursor#2", "cursor#1"]
+    assert [record["client"] for record in history.search("提交代码", client="cursor#1")] == ["cursor#1"]
+
+
+def test_search_quotes_and_operators(history):
+    history.record("s1", "", "answered", [_item('运行 "pytest -q" AND 部署')])
+    assert len(history.search('"pytest')) == 1
+    assert len(history.search("AND 部署")) == 1
+
+
+def test_search_truncates_but_session_keeps_full_text(history):
+    long_feedback = "很长的回答" * 200
+    history.record("s1", "cursor#1", "answered", [
+        _item("第一个问题", long_feedback, predefined_options=["a", "b"], selected_options=["b"], image_paths=["/tmp/1.png"]),
+        _item("第二个问题", "好"),
+    ])
+    (found,) = history.search("很长的回答")
+    assert len(found["interactive_feedback"]) == SNIPPET_CHARS + 1
+    records = history.session("s1")
+    assert [record["position"] for record in records] == [0, 1]
+    assert records[0]["interactive_feedback"] == long_feedback
+    assert records[0]["selected_options"] == ["b"]
+    assert records[0]["image_paths"] == ["/tmp/1.png"]
+    assert history.session("missing") == []
+
+
+def test_retention_by_count(history, monkeypatch):
+    monkeypatch.setattr(feedback_history, "COMPACT_INTERVAL", 5)
+    history.max_records = 3
+    for n in range(4):
+        history.record(f"s{n}", "", "answered", [_item(f"问题{n}")])
+    assert history.stats()["records"] == 4
+    # 第5条记录写入后检查上限，只保留最新的3条
+    history.record("s4", "", "answered", [_item("问题4")])
+    assert history.stats()["records"] == 3
+    assert _prompts(history.search("问题")) == ["问题4", "问题3", "问题2"]
+
+
+def test_retention_by_age(history):
+    history.max_age = 3600
+    now = time.time()
+    history.record("old", "", "answered", [_item("旧的问题")], created_at=now - 7200)
+    history.record("new", "", "answered", [_item("新的问题")], created_at=now)
+    assert history.compact() == {"records_removed": 1}
+    assert history.session("old") == []
+    # 删除的记录也从全文索引中删除
+    assert _prompts(history.search("的问题")) == ["新的问题"]
+    stats = history.stats()
+    assert (stats["records"], stats["sessions"]) == (1, 1)
+
+
+def test_from_env(monkeypatch, tmp_path):
+    monkeypatch.setenv("INTERACTIVE_FEEDBACK_HISTORY_DB", str(tmp_path / "env.sqlite3"))
+    monkeypatch.setenv("INTERACTIVE_FEEDBACK_HISTORY_MAX_RECORDS", "10")
+    monkeypatch.setenv("INTERACTIVE_FEEDBACK_HISTORY_MAX_AGE_DAYS", "0.5")
+    history = FeedbackHistory.from_env()
+    assert (history.path, history.max_records, history.max_age) == (str(tmp_path / "env.sqlite3"), 10, 43200)
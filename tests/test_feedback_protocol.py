@@ -0,0 +1,127 @@
+# 帧格式的单元测试：read_frame、read_frame_async和pop_frame对完整、不完整和无效的帧的处理
+import io
+import json
+import struct
+import asyncio
+
+import pytest
+
+from feedback_protocol import (
+    MAX_FRAME_SIZE, PROTOCOL_VERSION, ProtocolError, encode_frame, expect_message, make_message, new_options,
+    pop_frame, read_frame, read_frame_async, updated_prompt,
+)
+
+
+def _read_sync(data: bytes) -> list:
+    stream = io.BytesIO(data)
+    messages = []
+    while (message := read_frame(stream)) is not None:
+        messages.append(message)
+    return messages
+
+
+def _read_async(data: bytes) -> list:
+    async def main():
+        reader = asyncio.StreamReader()
+        reader.feed_data(data)
+        reader.feed_eof()
+        messages = []
+        while (message := await read_frame_async(reader)) is not None:
+            messages.append(message)
+        return messages
+    return asyncio.run(main())
+
+
+def _read_buffer(data: bytes) -> list:
+    """pop_frame在数据不足时返回None而不是报错，剩余的数据留在缓冲区中"""
+    buffer = bytearray(data)
+    messages = []
+    while (message := pop_frame(buffer)) is not None:
+        messages.append(message)
+    if buffer:
+        raise ProtocolError(f"缓冲区剩余{len(buffer)}字节")
+    return messages
+
+
+READERS = pytest.mark.parametrize("read", [_read_sync, _read_async, _read_buffer], ids=["sync", "async", "buffer"])
+
+
+def _frame(payload: bytes) -> bytes:
+    return struct.pack(">I", len(payload)) + payload
+
+
+@READERS
+def test_round_trip(read):
+    messages = [
+        make_message("request", summary="问题 ✓", predefined_options=["a", "b"]),
+        make_message("update", append=""),
+        make_message("result", result={"interactive_feedback": "x" * 100000}),
+    ]
+    assert read(b"".join(encode_frame(message) for message in messages)) == messages
+
+
+@READERS
+def test_empty_stream(read):
+    assert read(b"") == []
+
+
+@READERS
+def test_partial_header(read):
+    with pytest.raises(ProtocolError):
+        read(encode_frame(make_message("ping")) + b"\x00\x00")
+
+
+@READERS
+def test_truncated_payload(read):
+    frame = encode_frame(make_message("request", summary="问题"))
+    with pytest.raises(ProtocolError):
+        read(frame[:-3])
+
+
+@READERS
+def test_oversized_length_prefix(read):
+    with pytest.raises(ProtocolError, match="消息过大"):
+        read(struct.pack(">I", MAX_FRAME_SIZE + 1) + b"{}")
+
+
+@READERS
+def test_wrong_version(read):
+    with pytest.raises(ProtocolError, match="协议版本"):
+        read(_frame(json.dumps({"version": PROTOCOL_VERSION + 1, "type": "request"}).encode()))
+
+
+@READERS
+@pytest.mark.parametrize("payload", [b"[1, 2]", b'"text"', b"not json"])
+def test_non_object_payload(read, payload):
+    with pytest.raises(ProtocolError):
+        read(_frame(payload))
+
+
+def test_pop_frame_waits_for_complete_frame():
+    frame = encode_frame(make_message("update", append="进度"))
+    buffer = bytearray()
+    for byte in frame[:-1]:
+        buffer.append(byte)
+        assert pop_frame(buffer) is None
+    buffer += frame[-1:] + frame[:2]
+    assert pop_frame(buffer) == make_message("update", append="进度")
+    assert buffer == bytearray(frame[:2])
+
+
+def test_expect_message():
+    assert expect_message(make_message("result"), "result")["type"] == "result"
+    with pytest.raises(ProtocolError, match="连接已关闭"):
+        expect_message(None, "result")
+    with pytest.raises(ProtocolError, match="期望result消息"):
+        expect_message(make_message("ping"), "result")
+
+
+def test_updated_prompt():
+    assert updated_prompt("问题", {"append": "进度"}) == "问题\n进度"
+    assert updated_prompt("问题\n", {"append": "进度"}) == "问题\n进度"
+    assert updated_prompt("问题", {"summary": "新问题", "append": "进度"}) == "新问题\n进度"
+    assert updated_prompt("问题", {"summary": ""}) == ""
+
+
+def test_new_options():
+    assert new_options(["a", "b"], ["b", "c", "c", "d"]) == ["c", "d"]
@@ -0,0 +1,144 @@
+# FeedbackScheduler的单元测试：显示顺序、同时显示的窗口数和排队上限
+import asyncio
+
+import pytest
+
+from feedback_scheduler import FeedbackScheduler, QueueFullError
+
+
+class Jobs:
+    """可以逐个结束的假窗口，记录开始显示的顺序"""
+
+    def __init__(self):
+        self.started = []
+        self._gates = {}
+
+    def job(self, name: str):
+        gate = self._gates[name] = asyncio.Event()
+
+        async def run():
+            self.started.append(name)
+            await gate.wait()
+            return name
+        return run
+
+    def finish(self, name: str):
+        self._gates[name].set()
+
+
+async def _submit(scheduler, jobs, name, priority=0, client=""):
+    """提交一个请求并让它进入队列"""
+    task = asyncio.ensure_future(scheduler.run(jobs.job(name), priority, client))
+    await asyncio.sleep(0)
+    return task
+
+
+async def _drain(jobs, tasks):
+    """依次结束正在显示的窗口，直到所有请求完成"""
+    while not all(task.done() for task in tasks):
+        await asyncio.sleep(0)
+        for name in list(jobs.started):
+            jobs.finish(name)
+        await asyncio.sleep(0)
+
+
+def test_priority_then_fifo():
+    async def main():
+        scheduler, jobs = FeedbackScheduler(), Jobs()
+        tasks = [await _submit(scheduler, jobs, "active")]
+        for name, priority in (("low1", 0), ("high1", 5), ("low2", 0), ("high2", 5), ("mid", 1)):
+            tasks.append(await _submit(scheduler, jobs, name, priority))
+        assert scheduler.pending == 5
+        await _drain(jobs, tasks)
+        assert jobs.started == ["active", "high1", "high2", "mid", "low1", "low2"]
+        assert [task.result() for task in tasks] == ["active", "low1", "high1", "low2", "high2", "mid"]
+
+    asyncio.run(main())
+
+
+def test_max_active():
+    async def main():
+        scheduler, jobs = FeedbackScheduler(max_active=2), Jobs()
+        tasks = [await _submit(scheduler, jobs, name) for name in ("a", "b", "c", "d")]
+        assert jobs.started == ["a", "b"]
+        assert scheduler.stats()["active"] == 2
+        assert scheduler.pending == 2
+
+        jobs.finish("b")
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        assert jobs.started == ["a", "b", "c"]
+        assert scheduler.stats()["active"] == 2
+
+        await _drain(jobs, tasks)
+        assert jobs.started == ["a", "b", "c", "d"]
+        stats = scheduler.stats()
+        assert (stats["active"], stats["served"], scheduler.pending) == (0, 4, 0)
+
+    asyncio.run(main())
+
+
+def test_clients_take_turns_at_equal_priority():
+    async def main():
+        scheduler, jobs = FeedbackScheduler(), Jobs()
+        tasks = [await _submit(scheduler, jobs, "active", client="a")]
+        for name, client in (("a1", "a"), ("a2", "a"), ("a3", "a"), ("b1", "b"), ("b2", "b"), ("c1", "c")):
+            tasks.append(await _submit(scheduler, jobs, name, client=client))
+        # 优先级更高的请求仍然优先于轮流
+        tasks.append(await _submit(scheduler, jobs, "b-urgent", priority=1, client="b"))
+        assert scheduler.stats()["clients"]["a"] == {"active": 1, "queued": 3}
+        await _drain(jobs, tasks)
+        assert jobs.started == ["active", "b-urgent", "a1", "b1", "c1", "a2", "b2", "a3"]
+
+    asyncio.run(main())
+
+
+def test_queue_full_global():
+    async def main():
+        scheduler, jobs = FeedbackScheduler(max_queue=2), Jobs()
+        tasks = [await _submit(scheduler, jobs, name, client=name) for name in ("active", "q1", "q2")]
+        with pytest.raises(QueueFullError):
+            await scheduler.run(jobs.job("rejected"), client="other")
+        assert scheduler.stats()["rejected"] == 1
+        assert "rejected" not in jobs.started
+
+        # 有请求离开队列后可以再次排队
+        jobs.finish("active")
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        tasks.append(await _submit(scheduler, jobs, "q3"))
+        assert scheduler.pending == 2
+        await _drain(jobs, tasks)
+        assert jobs.started == ["active", "q1", "q2", "q3"]
+
+    asyncio.run(main())
+
+
+def test_queue_full_per_client():
+    async def main():
+        scheduler, jobs = FeedbackScheduler(max_queue_per_client=1), Jobs()
+        tasks = [await _submit(scheduler, jobs, "active", client="a"), await _submit(scheduler, jobs, "a1", client="a")]
+        with pytest.raises(QueueFullError):
+            await scheduler.run(jobs.job("a2"), client="a")
+        # 其他客户端不受影响
+        tasks.append(await _submit(scheduler, jobs, "b1", client="b"))
+        assert scheduler.stats()["rejected"] == 1
+        await _drain(jobs, tasks)
+        assert jobs.started == ["active", "a1", "b1"]
+
+    asyncio.run(main())
+
+
+def test_cancelled_while_queued_is_skipped():
+    async def main():
+        scheduler, jobs = FeedbackScheduler(), Jobs()
+        tasks = [await _submit(scheduler, jobs, name) for name in ("active", "cancelled", "next")]
+        tasks[1].cancel()
+        await asyncio.sleep(0)
+        assert scheduler.pending == 1
+        await _drain(jobs, [tasks[0], tasks[2]])
+        assert jobs.started == ["active", "next"]
+        assert tasks[1].cancelled()
+        assert scheduler.stats()["active"] == 0
+
+    asyncio.run(main())
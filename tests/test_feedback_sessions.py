@@ -0,0 +1,165 @@
+# LiveSession和SessionRegistry的单元测试：排队、启动中和已打开时的更新，合并的会话，按客户端查找
+import asyncio
+
+import pytest
+
+from feedback_protocol import pop_frame
+from feedback_sessions import LiveSession, SessionClosedError, SessionRegistry
+
+
+class FakeWriter:
+    """记录写入的帧，代替子进程的stdin或守护进程的连接"""
+
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def write(self, data: bytes):
+        self.buffer += data
+
+    async def drain(self):
+        pass
+
+    def messages(self) -> list:
+        messages = []
+        while (message := pop_frame(self.buffer)) is not None:
+            messages.append(message)
+        return messages
+
+
+def _questions(*prompts):
+    return [{"prompt": prompt, "predefined_options": ["a"]} for prompt in prompts]
+
+
+def test_update_while_queued_changes_request():
+    async def main():
+        session = LiveSession("s1", "cursor#1", _questions("问题"))
+        target = await session.update(append="进度50%", options=["a", "b"])
+        assert target is session.questions[0]
+        assert session.questions[0]["prompt"].endswith("进度50%")
+        assert session.questions[0]["predefined_options"] == ["a", "b"]
+        assert session.updates == 1
+
+        # 之后才打开的界面只收到包含更新的请求，不再收到update消息
+        session.launching()
+        writer = FakeWriter()
+        session.attach(writer)
+        assert writer.messages() == []
+
+    asyncio.run(main())
+
+
+def test_update_while_launching_is_buffered_until_attach():
+    async def main():
+        session = LiveSession("s1", "cursor#1", _questions("问题"))
+        session.launching()
+        await session.update(summary="新的问题")
+        await session.update(options=["c"])
+        writer = FakeWriter()
+        session.attach(writer)
+        messages = writer.messages()
+        assert [message["type"] for message in messages] == ["update", "update"]
+        assert messages[0]["summary"] == "新的问题"
+        assert messages[1]["options"] == ["c"]
+        assert session.questions[0] == {"prompt": "新的问题", "predefined_options": ["a", "c"]}
+
+        # 已打开时直接写入
+        await session.update(append="完成")
+        assert [message.get("append") for message in writer.messages()] == ["完成"]
+
+    asyncio.run(main())
+
+
+def test_existing_options_are_not_sent_again():
+    async def main():
+        session = LiveSession("s1", "cursor#1", _questions("问题"))
+        session.launching()
+        writer = FakeWriter()
+        session.attach(writer)
+        await session.update(append="x", options=["a"])
+        messages = writer.messages()
+        assert "options" not in messages[0]
+        assert session.questions[0]["predefined_options"] == ["a"]
+
+    asyncio.run(main())
+
+
+def test_update_through_joiner_reaches_leader():
+    async def main():
+        registry = SessionRegistry()
+        leader = registry.open("leader", "cursor#1", _questions("问题"))
+        joiner = registry.open("joiner", "cursor#2", _questions("问题"))
+        joiner.join(leader)
+        leader.launching()
+        writer = FakeWriter()
+        leader.attach(writer)
+
+        await registry.find("joiner").update(append="来自第二个调用")
+        messages = writer.messages()
+        assert [message.get("append") for message in messages] == ["来自第二个调用"]
+        assert leader.questions[0]["prompt"].endswith("来自第二个调用")
+        assert joiner.questions is leader.questions
+        assert leader.updates == 1
+        assert joiner.describe()["state"] == "open"
+        assert joiner.describe()["shared_with"] == "leader"
+
+        # 发起者先结束时窗口仍然保留给合并的调用
+        registry.close(leader)
+        assert leader.state == "open"
+        await joiner.update(append="仍然可以更新")
+        assert len(writer.messages()) == 1
+
+        registry.close(joiner)
+        assert leader.state == "closed"
+        with pytest.raises(SessionClosedError):
+            await joiner.update(append="已关闭")
+
+    asyncio.run(main())
+
+
+def test_find_without_session_id():
+    registry = SessionRegistry()
+    with pytest.raises(SessionClosedError, match="没有打开的反馈窗口"):
+        registry.find(client="cursor#1")
+
+    only = registry.open("s1", "cursor#1", _questions("问题"))
+    registry.open("s2", "claude#1", _questions("问题"))
+    assert registry.find(client="cursor#1") is only
+
+    registry.open("s3", "cursor#1", _questions("问题"))
+    with pytest.raises(SessionClosedError, match="s1、s3"):
+        registry.find(client="cursor#1")
+
+
+def test_update_after_close_fails():
+    async def main():
+        registry = SessionRegistry()
+        session = registry.open("s1", "cursor#1", _questions("问题"))
+        session.launching()
+        session.attach(FakeWriter())
+        registry.close(session)
+        with pytest.raises(SessionClosedError):
+            await session.update(append="x")
+        with pytest.raises(SessionClosedError):
+            registry.find("s1")
+
+    asyncio.run(main())
+
+
+def test_update_feedback_prompt_fails_after_close():
+    from fastmcp import Client
+    from fastmcp.exceptions import ToolError
+
+    import server
+
+    async def main():
+        session = server.sessions.open("closedsession", "", _questions("问题"))
+        session.launching()
+        session.attach(FakeWriter())
+        async with Client(server.mcp) as client:
+            result = await client.call_tool("update_feedback_prompt", {"session_id": "closedsession", "append": "x"})
+            assert '"state": "open"' in result[0].text
+            server.sessions.close(session)
+            with pytest.raises(ToolError, match="closedsession"):
+                await client.call_tool("update_feedback_prompt", {"session_id": "closedsession", "append": "y"})
+
+    asyncio.run(main())
@@ -0,0 +1,51 @@
+# OptionIndex的单元测试：匹配程度的排序和增量筛选
+from option_list import OptionIndex
+
+OPTIONS = [
+    "tests/test_server.py",      # 0
+    "server.py",                 # 1
+    "feedback_ui.py",            # 2
+    "Server restart",            # 3
+    "observer",                  # 4
+    "修复服务端的错误",            # 5
+    "s-e-r-v-e-r",               # 6
+    "restart server",            # 7
+]
+
+
+def test_empty_query_returns_all():
+    index = OptionIndex(OPTIONS)
+    assert len(index) == len(OPTIONS)
+    assert index.search("") == list(range(len(OPTIONS)))
+    assert index.search("   ") == list(range(len(OPTIONS)))
+
+
+def test_ranking_tiers():
+    index = OptionIndex(OPTIONS)
+    # 开头匹配（不区分大小写）> 单词前缀 > 子串 > 模糊匹配，同一程度内保持原顺序
+    assert index.search("server") == [1, 3, 7, 0, 4, 6]
+    assert index.search("SERVER.PY") == [1, 0]
+
+
+def test_multiple_terms_match_word_prefixes():
+    index = OptionIndex(OPTIONS)
+    assert index.search("serv rest") == [3, 7]
+    assert index.search("test py") == [0]
+
+
+def test_chinese_substring_and_fuzzy():
+    index = OptionIndex(OPTIONS)
+    assert index.search("服务端") == [5]
+    assert index.search("修错误") == [5]
+    assert index.search("不存在") == []
+
+
+def test_incremental_search_matches_fresh_search():
+    index = OptionIndex(OPTIONS)
+    for query in ("s", "se", "ser", "serv", "serve", "server", "serve", "py", "py "):
+        assert index.search(query) == OptionIndex(OPTIONS).search(query), query
+
+
+def test_duplicate_words_counted_once():
+    index = OptionIndex(["fix fix fix", "fix"])
+    assert index.search("fix") == [0, 1]
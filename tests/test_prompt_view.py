@@ -0,0 +1,99 @@
+# 提示视图的单元测试：行的分类、可折叠区域以及折叠后隐藏的行
+import os
+
+import pytest
+
+from prompt_view import (
+    CODE, CODE_COLLAPSE_LINES, COLLAPSED_PREVIEW_LINES, DIFF_ADD, DIFF_DEL, FENCE, HEADING, LIST, PLAIN, QUOTE,
+    SECTION_COLLAPSE_LINES, classify_lines,
+)
+
+
+def _code_block(lines: int) -> list:
+    return ["```"] + [f"line {n}" for n in range(lines)] + ["```"]
+
+
+def test_line_kinds():
+    lines = [
+        "# 标题",
+        "普通文本",
+        "> 引用",
+        "- 列表",
+        "2) 列表",
+        "#不是标题",
+        "```diff",
+        "+++ b/server.py",
+        "+新增",
+        "-删除",
+        "  上下文",
+        "```",
+        "+不在代码块中",
+    ]
+    kinds, regions = classify_lines(lines)
+    assert kinds == [HEADING, PLAIN, QUOTE, LIST, LIST, PLAIN, FENCE, CODE, DIFF_ADD, DIFF_DEL, CODE, FENCE, PLAIN]
+    assert regions == []
+
+
+def test_short_code_block_is_not_collapsible():
+    _, regions = classify_lines(_code_block(CODE_COLLAPSE_LINES - 1))
+    assert regions == []
+
+
+def test_long_code_block_region():
+    lines = ["前言"] + _code_block(CODE_COLLAPSE_LINES + 5) + ["后记"]
+    _, regions = classify_lines(lines)
+    assert len(regions) == 1
+    region = regions[0]
+    assert (region.first, region.end, region.collapsed) == (1, len(lines) - 1, True)
+    assert region.hidden_start == region.first + 1 + COLLAPSED_PREVIEW_LINES
+    assert region.anchor == region.hidden_start - 1
+
+
+def test_unclosed_code_block_extends_to_end():
+    lines = ["前言", "```"] + ["code"] * (CODE_COLLAPSE_LINES + 1)
+    kinds, regions = classify_lines(lines)
+    assert kinds[2:] == [CODE] * (CODE_COLLAPSE_LINES + 1)
+    assert [(region.first, region.end) for region in regions] == [(1, len(lines))]
+
+
+def test_sections_end_at_same_or_higher_level_heading():
+    body = ["text"] * SECTION_COLLAPSE_LINES
+    lines = ["# 一"] + ["## 一.一"] + body + ["## 一.二", "短章节", "# 二", "结尾"]
+    _, regions = classify_lines(lines)
+    second = lines.index("## 一.二")
+    assert [(region.first, region.end) for region in regions] == [(0, second + 2), (1, second)]
+
+
+def test_headings_inside_code_blocks_are_ignored():
+    lines = ["```"] + ["# 注释"] * (SECTION_COLLAPSE_LINES + 1) + ["```"]
+    kinds, regions = classify_lines(lines)
+    assert HEADING not in kinds
+    assert [(region.first, region.end) for region in regions] == [(0, len(lines))]
+
+
+@pytest.fixture(scope="module")
+def qapp():
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PySide6.QtWidgets import QApplication
+
+    return QApplication.instance() or QApplication([])
+
+
+def test_collapsed_region_hides_lines(qapp):
+    from prompt_view import PromptView
+
+    lines = ["前言"] + _code_block(CODE_COLLAPSE_LINES + 5) + ["后记"]
+    view = PromptView()
+    view.set_prompt("\n".join(lines))
+    (region,) = view.collapsible_regions()
+
+    def visible():
+        document = view.document()
+        return [document.findBlockByNumber(number).isVisible() for number in range(len(lines))]
+
+    expected = [not (region.hidden_start <= number < region.end) for number in range(len(lines))]
+    assert visible() == expected
+    view.toggle_region(region)
+    assert visible() == [True] * len(lines)
+    view.toggle_region(region)
+    assert visible() == expected